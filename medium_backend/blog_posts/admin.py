@@ -1,7 +1,8 @@
 """ Admin panel for the blog posts module """
 from django.contrib import admin
 
-from blog_posts.models import AssignedTag, Comment, Post, Report, Tag, Vote
+from blog_posts.models import (AssignedTag, AuthorStats, Comment, Post, Report,
+                               Tag, Vote)
 
 
 # Register your models here.
@@ -14,3 +15,4 @@ admin.site.register(AssignedTag)
 admin.site.register(Comment)
 admin.site.register(Report)
 admin.site.register(Vote)
+admin.site.register(AuthorStats)
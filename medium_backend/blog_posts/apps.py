@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BlogPostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog_posts'
+
+    def ready(self):
+        """ Connects the signal receivers keeping the denormalized counters. """
+        from blog_posts import signals  # noqa: F401
@@ -0,0 +1,168 @@
+"""
+Tag suggestions for a prefix, ranked by how many posts use the tag.
+
+The process wide ``tag_index`` keeps the tag names sorted by their casefolded form,
+with the usage count of each name (tags sharing a name add up). The names starting
+with a prefix are a contiguous range of the sorted array, found by bisection, and the
+top of a range is cached per prefix. The tag signals update the counts of their own
+process once committed, and move the changed name within its cached prefixes.
+Other processes pick changes up when they reload the index from ``Tag.usage_count``,
+at most TAG_AUTOCOMPLETE_MAX_AGE seconds after their last load. A reload reads and
+sorts the tags without holding the lock, lookups meanwhile are served from the previous
+arrays, then swaps the new ones in with the changes counted during the reload replayed.
+"""
+import bisect
+import heapq
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+
+from blog_posts.models import Tag
+
+# Sorts after every character, the end of the range of a prefix.
+LAST_CHARACTER = '\U0010ffff'
+
+
+class TagIndex:
+    """ Sorted array of the tag names with their usage, and a cache of the top tags per prefix. """
+
+    def __init__(self):
+        """ Nothing loaded until the first lookup. """
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """ Forgets the index, the next lookup loads it again. """
+        self.loaded_at = None
+        self.keys = []
+        self.counts = []
+        self.names = {}
+        self.top = {}
+        # Changes made while a reload runs, None otherwise.
+        self.pending = None
+
+    def is_stale(self):
+        """ Whether the index was never loaded, expired, or is older than TAG_AUTOCOMPLETE_MAX_AGE. """
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= settings.TAG_AUTOCOMPLETE_MAX_AGE
+
+    def load(self):
+        """
+        Reads the name and usage count of every tag without holding the lock, then swaps
+        the new arrays in and replays the changes made meanwhile. A change committed right
+        before the read may then be counted twice, until the next reload.
+        """
+        with self.lock:
+            self.pending = []
+        names, counts = {}, {}
+        for tag_id, name, usage_count in Tag.objects.values_list('id', 'name', 'usage_count').iterator():
+            names[tag_id] = name
+            counts[name] = counts.get(name, 0) + usage_count
+        keys = sorted((name.casefold(), name) for name in counts)
+        with self.lock:
+            pending, self.pending = self.pending, None
+            self.names, self.keys, self.counts, self.top = names, keys, [counts[name] for _, name in keys], {}
+            self.loaded_at = time.monotonic()
+            for change in pending or []:
+                change()
+
+    def refresh(self):
+        """
+        Reloads a stale index, one thread at a time. Other lookups keep using the previous
+        arrays, they only wait when there are none.
+        """
+        if not self.load_lock.acquire(blocking=self.loaded_at is None):
+            return
+        try:
+            if self.is_stale():
+                self.load()
+        finally:
+            self.load_lock.release()
+
+    def suggest(self, prefix, limit):
+        """ Returns up to ``limit`` (name, usage count) of the tags starting with the prefix, most used first. """
+        prefix = prefix.casefold()
+        if self.is_stale():
+            self.refresh()
+        with self.lock:
+            if prefix not in self.top:
+                start = bisect.bisect_left(self.keys, (prefix,))
+                end = bisect.bisect_left(self.keys, (prefix + LAST_CHARACTER,), start)
+                best = heapq.nsmallest(settings.TAG_AUTOCOMPLETE_MAX, range(start, end),
+                                       key=lambda index: (-self.counts[index], self.keys[index]))
+                self.top[prefix] = [(self.keys[index][1], self.counts[index]) for index in best]
+            return self.top[prefix][:limit]
+
+    def expire(self):
+        """ Makes the next lookup reload the index, for the rare renames and deletes of tags. """
+        with self.lock:
+            self.apply(self.expire_now)
+
+    def expire_now(self):
+        """ Marks the index stale, the lock being held. """
+        self.loaded_at = None
+
+    def add_tag(self, tag_id, name):
+        """ Adds a created tag, unused so far. """
+        with self.lock:
+            self.apply(partial(self.add_tag_now, tag_id, name))
+
+    def add_tag_now(self, tag_id, name):
+        """ Adds a created tag, the lock being held. """
+        if self.loaded_at is not None:
+            self.names[tag_id] = name
+            self.count_name(name, 0)
+
+    def count(self, tag_id, delta):
+        """ Adds ``delta`` to the usage of a tag, the next lookup reloads for a tag it doesn't know. """
+        with self.lock:
+            self.apply(partial(self.count_now, tag_id, delta))
+
+    def count_now(self, tag_id, delta):
+        """ Adds ``delta`` to the usage of a tag, the lock being held. """
+        if self.loaded_at is None:
+            return
+        if tag_id not in self.names:
+            self.loaded_at = None
+            return
+        self.count_name(self.names[tag_id], delta)
+
+    def apply(self, change):
+        """ Applies a change to the index, and again to the one being reloaded, if any. """
+        change()
+        if self.pending is not None:
+            self.pending.append(change)
+
+    def count_name(self, name, delta):
+        """ Adds ``delta`` to the usage of a name, inserted when new, and updates its cached prefixes. """
+        key = (name.casefold(), name)
+        index = bisect.bisect_left(self.keys, key)
+        if index == len(self.keys) or self.keys[index] != key:
+            self.keys.insert(index, key)
+            self.counts.insert(index, 0)
+        self.counts[index] = max(self.counts[index] + delta, 0)
+        for end in range(len(key[0]) + 1):
+            self.update_top(key[0][:end], name, self.counts[index], delta)
+
+    def update_top(self, prefix, name, count, delta):
+        """
+        Moves a name within the cached top of a prefix. A full top is only dropped when
+        one of its names lost usage, since a name left out of it may now rank higher.
+        """
+        top = self.top.get(prefix)
+        if top is None:
+            return
+        full = len(top) >= settings.TAG_AUTOCOMPLETE_MAX
+        entries = [entry for entry in top if entry[0] != name]
+        listed = len(entries) < len(top)
+        if full and listed and delta < 0:
+            del self.top[prefix]
+            return
+        entries.append((name, count))
+        entries.sort(key=lambda entry: (-entry[1], entry[0].casefold(), entry[0]))
+        self.top[prefix] = entries[:settings.TAG_AUTOCOMPLETE_MAX]
+
+
+tag_index = TagIndex()
@@ -0,0 +1,61 @@
+""" Bulk creation of posts with their tags """
+from collections import Counter
+from functools import partial
+
+from django.db import transaction
+
+from blog_posts.autocomplete import tag_index
+from blog_posts.changes import log_changes
+from blog_posts.constant import POST_BATCH_CHUNK_SIZE
+from blog_posts.models import AssignedTag, AuthorStats, Post, Tag
+from blog_posts.tasks import check_duplicate_posts
+from blog_posts.utils import in_chunks, increment
+
+
+def get_or_create_tags(names):
+    """
+    Returns a mapping of tag name to tag id, creating the missing tags in bulk.
+
+    Tag names are not unique in the database, the oldest tag wins like the
+    ``Tag.objects.get(name=...)`` lookups would return it.
+    """
+    tag_ids = {}
+    for name, tag_id in Tag.objects.filter(name__in=names).order_by('-id').values_list('name', 'id'):
+        tag_ids[name] = tag_id
+    missing = [name for name in names if name not in tag_ids]
+    if missing:
+        Tag.objects.bulk_create(Tag(name=name) for name in missing)
+        tag_ids.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+    return tag_ids
+
+
+def bulk_create_posts(user, items, chunk_size=POST_BATCH_CHUNK_SIZE):
+    """
+    Creates already validated posts for ``user`` and returns their ids in order.
+
+    Every chunk is written in its own transaction with one INSERT per table: the
+    missing tags, the posts and their ``AssignedTag`` rows, and their change log
+    entries, author post count and tag usage since bulk inserts send no signals. The duplicate
+    check of the posts is queued as a job once the chunk commits.
+    """
+    post_ids = []
+    for chunk in in_chunks(items, chunk_size):
+        with transaction.atomic():
+            tag_ids = get_or_create_tags(sorted({tag for item in chunk for tag in item['tags']}))
+            posts = [Post(posted_by=user, title=item['title'], content=item['content']) for item in chunk]
+            for post in posts:
+                post.refresh_text_stats()
+            Post.objects.bulk_create(posts)
+            assigned_tags = AssignedTag.objects.bulk_create(
+                AssignedTag(post=post, tag_id=tag_ids[tag])
+                for post, item in zip(posts, chunk) for tag in item['tags']
+            )
+            log_changes(Post, [post.pk for post in posts])
+            log_changes(AssignedTag, [assigned_tag.pk for assigned_tag in assigned_tags])
+            increment(AuthorStats, user.pk, 'post_count', len(posts))
+            for tag_id, uses in Counter(assigned_tag.tag_id for assigned_tag in assigned_tags).items():
+                increment(Tag, tag_id, 'usage_count', uses)
+                transaction.on_commit(partial(tag_index.count, tag_id, uses))
+            check_duplicate_posts.enqueue_on_commit(post_ids=[post.pk for post in posts])
+        post_ids.extend(post.pk for post in posts)
+    return post_ids
@@ -0,0 +1,74 @@
+""" Change log of the blog_posts tables and the compacted delta feed read from it """
+import time
+
+from blog_posts.constant import CHANGES_PAGE_SIZE, CHANGES_POLL_INTERVAL
+from blog_posts.exports import EXPORTS
+from blog_posts.models import AssignedTag, ChangeLog, Post
+from blog_posts.utils import in_chunks
+
+CHANGE_FEEDS = {
+    **EXPORTS,
+    'assigned_tags': (AssignedTag, ['id', 'post', 'tag', 'created', 'modified']),
+}
+FEED_NAMES = {model: name for name, (model, _) in CHANGE_FEEDS.items()}
+
+
+def log_changes(model, object_ids, deleted=False):
+    """ Appends a change of each object to the log, for the writes which send no signals. """
+    ChangeLog.objects.bulk_create(
+        ChangeLog(feed=FEED_NAMES[model], object_id=object_id, deleted=deleted) for object_id in object_ids
+    )
+
+
+def get_head():
+    """ Cursor of the latest change, 0 for an empty log. """
+    return ChangeLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def read_changes(since, feeds, limit=CHANGES_PAGE_SIZE):
+    """
+    Returns the changes after the ``since`` cursor, compacted to the last change of
+    each object, with the cursor to continue from and whether more changes follow.
+
+    Upserts carry the current row, objects deleted since then are reported deleted,
+    soft deleted posts and their rows included.
+    """
+    entries = list(
+        ChangeLog.objects.filter(id__gt=since, feed__in=feeds).order_by('id')
+        .values_list('id', 'feed', 'object_id', 'deleted')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    cursor = entries[-1][0] if entries else since
+
+    latest = {}
+    for entry_id, feed, object_id, deleted in entries:
+        latest.pop((feed, object_id), None)
+        latest[(feed, object_id)] = deleted
+
+    rows = {}
+    for feed in {feed for feed, _ in latest}:
+        model, columns = CHANGE_FEEDS[feed]
+        object_ids = [object_id for (name, object_id), deleted in latest.items() if name == feed and not deleted]
+        queryset = model.objects.all() if model is Post else model.objects.of_live_posts()
+        for chunk in in_chunks(object_ids):
+            rows.update(((feed, row['id']), row) for row in queryset.filter(id__in=chunk).values(*columns))
+
+    changes = []
+    for (feed, object_id), deleted in latest.items():
+        row = None if deleted else rows.get((feed, object_id))
+        changes.append({
+            'feed': feed,
+            'id': object_id,
+            'action': 'upsert' if row is not None else 'delete',
+            'data': row,
+        })
+    return {'cursor': cursor, 'has_more': has_more, 'changes': changes}
+
+
+def wait_for_changes(since, feeds, timeout):
+    """ Long poll: returns once changes follow ``since``, or after ``timeout`` seconds. """
+    deadline = time.monotonic() + timeout
+    queryset = ChangeLog.objects.filter(id__gt=since, feed__in=feeds)
+    while not queryset.exists() and time.monotonic() < deadline:
+        time.sleep(min(CHANGES_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
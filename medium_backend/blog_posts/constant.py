@@ -14,3 +14,37 @@ STATUS_CHOICES = [
     ('rejected', 'Rejected'),
 ]
 DEFAULT_POST_SEAERCH_FIELDS = ['posted_by__username','title', 'content', 'assigned_tags__tag__name']
+# Number of ids bound in a single IN (...) clause, kept below SQLite's variable limit.
+IN_CLAUSE_CHUNK_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+# Largest ?chunk_size= of the export api, the rows of a chunk are held in memory.
+EXPORT_MAX_CHUNK_SIZE = 10000
+EXPORT_FORMATS = ['ndjson', 'csv']
+POST_BATCH_MAX_SIZE = 10000
+POST_BATCH_CHUNK_SIZE = 500
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+# Replies embedded in a top-level comment, the rest is paged by comment/<id>/replies/.
+REPLY_PREVIEW_SIZE = 3
+REPLY_PAGE_SIZE = 20
+CHANGES_PAGE_SIZE = 500
+# Longest ?wait= of the changes/ long poll, and how often it checks for new entries, in seconds.
+CHANGES_MAX_WAIT = 30
+CHANGES_POLL_INTERVAL = 0.5
+LIVE_COUNTS_MAX_POSTS = 100
+# Latest posts listed by users/<username>/summary/.
+AUTHOR_RECENT_POSTS = 5
+# Precision of the unique viewers sketch of a post: 2 ** 10 registers, a 3.25% standard error.
+HLL_PRECISION = 10
+# Related posts returned by posts/<id>/related/ without ?limit=.
+RELATED_POSTS_SIZE = 5
+# Near-duplicate detection (blog_posts.minhash): posts are compared as sets of word
+# shingles, by MinHash signatures cut into LSH bands of MINHASH_PERMUTATIONS / LSH_BANDS rows.
+SHINGLE_SIZE = 3
+MINHASH_PERMUTATIONS = 128
+MINHASH_SEED = 48
+LSH_BANDS = 16
+# Tags suggested by tags/autocomplete/ without ?limit=.
+TAG_AUTOCOMPLETE_SIZE = 10
+# Rows of a soft deleted post deleted per transaction by the purge (blog_posts.purge).
+PURGE_CHUNK_SIZE = 500
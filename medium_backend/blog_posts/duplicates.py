@@ -0,0 +1,84 @@
+"""
+Near-duplicate posts, found through the LSH index of their MinHash signatures.
+
+Created and updated posts are indexed: their signature is stored in PostSignature and
+its band keys in LSHBucket. The candidates of a post are the posts sharing one of its
+band keys, a single indexed lookup however many posts there are, and only those are
+compared by signature. Candidates at least DUPLICATE_SIMILARITY_THRESHOLD similar are
+duplicates.
+
+With DUPLICATE_AUTO_REPORT, a post found to duplicate another one is reported as a
+duplicate for the moderators to review. The report is automatic, without a reporter,
+so the author of the original can still report the copy themselves.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from blog_posts.minhash import (compute_signature, estimate_similarity,
+                                get_band_keys, signature_from_bytes)
+from blog_posts.models import LSHBucket, Post, PostSignature, Report
+from blog_posts.utils import in_chunks
+
+
+def get_stored_signature(post_id):
+    """ The indexed signature of a post, None when it is not indexed. """
+    stored = PostSignature.objects.filter(post_id=post_id).values_list('signature', flat=True).first()
+    return None if stored is None else signature_from_bytes(stored)
+
+
+def index_post(post):
+    """
+    Stores the signature and band keys of the post, unless its content is unchanged.
+    Returns the signature, None for a post without words which is left out of the index.
+    """
+    signature = compute_signature(post.content)
+    stored = get_stored_signature(post.pk)
+    if stored is None or signature is None:
+        unchanged = stored is signature
+    else:
+        unchanged = bool((stored == signature).all())
+    if unchanged:
+        return signature
+    with transaction.atomic():
+        PostSignature.objects.filter(post_id=post.pk).delete()
+        LSHBucket.objects.filter(post_id=post.pk).delete()
+        if signature is not None:
+            PostSignature.objects.create(post_id=post.pk, signature=signature.tobytes())
+            LSHBucket.objects.bulk_create(
+                LSHBucket(post_id=post.pk, band=band, key=key) for band, key in get_band_keys(signature)
+            )
+    return signature
+
+
+def find_duplicates(post_id, signature, threshold=None):
+    """ Returns the (post id, similarity) of the duplicates of a post, most similar first. """
+    if signature is None:
+        return []
+    if threshold is None:
+        threshold = settings.DUPLICATE_SIMILARITY_THRESHOLD
+    band_keys = set(get_band_keys(signature))
+    buckets = LSHBucket.objects.filter(key__in=[key for _, key in band_keys]).exclude(post_id=post_id)
+    candidates = sorted({
+        candidate_id for candidate_id, band, key in buckets.values_list('post_id', 'band', 'key')
+        if (band, key) in band_keys
+    })
+    duplicates = []
+    for chunk in in_chunks(candidates):
+        for candidate_id, stored in PostSignature.objects.filter(post_id__in=chunk).values_list('post_id', 'signature'):
+            similarity = estimate_similarity(signature, signature_from_bytes(stored))
+            if similarity >= threshold:
+                duplicates.append((candidate_id, similarity))
+    return sorted(duplicates, key=lambda duplicate: (-duplicate[1], duplicate[0]))
+
+
+def check_duplicates(post):
+    """
+    Indexes a created or updated post and returns its duplicates. With
+    DUPLICATE_AUTO_REPORT the post is reported as a duplicate of the most similar one.
+    """
+    duplicates = find_duplicates(post.pk, index_post(post))
+    if duplicates and settings.DUPLICATE_AUTO_REPORT:
+        original_author_id = Post.objects.values_list('posted_by_id', flat=True).get(pk=duplicates[0][0])
+        if original_author_id != post.posted_by_id:
+            Report.objects.get_or_create(post=post, reported_by=None, type='duplicate')
+    return duplicates
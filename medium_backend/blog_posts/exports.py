@@ -0,0 +1,80 @@
+""" Streaming NDJSON/CSV exports of the blog_posts tables """
+import csv
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from blog_posts.constant import EXPORT_CHUNK_SIZE
+from blog_posts.models import Comment, Post, Report, Vote
+from medium_backend.renderers import JSONEncoder, dumps
+
+EXPORTS = {
+    'posts': (Post, ['id', 'posted_by', 'title', 'content', 'image', 'isBlocked', 'created', 'modified']),
+    'comments': (Comment, ['id', 'post', 'parent', 'owner', 'content', 'created', 'modified']),
+    'votes': (Vote, ['id', 'post', 'user', 'upvote', 'created', 'modified']),
+    'reports': (Report, ['id', 'post', 'reported_by', 'type', 'status', 'created', 'modified']),
+}
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+_encoder = JSONEncoder()
+
+
+class Echo:
+    """ File-like object which returns what is written to it, used to stream the csv writer. """
+    def write(self, value):
+        """ Returns the value instead of buffering it. """
+        return value
+
+
+def parse_since(value):
+    """ Parses the ``since`` filter, naive datetimes are read in the current timezone. """
+    since = parse_datetime(value)
+    if since is None:
+        raise ValueError(f"'{value}' is not a valid ISO 8601 datetime.")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def export_rows(name, since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Returns the columns and a lazy iterator over the rows of an export.
+
+    Rows are read as plain tuples with ``iterator()`` so only one chunk is held in
+    memory at a time, whatever the size of the table.
+    """
+    model, columns = EXPORTS[name]
+    queryset = model.objects.order_by('pk')
+    if model is not Post:
+        queryset = queryset.of_live_posts()
+    if since is not None:
+        queryset = queryset.filter(modified__gte=since)
+    return columns, queryset.values_list(*columns).iterator(chunk_size=chunk_size)
+
+
+def stream_ndjson(columns, rows):
+    """ Yields one JSON document per row. """
+    for row in rows:
+        yield dumps(dict(zip(columns, row))) + b'\n'
+
+
+def stream_csv(columns, rows):
+    """ Yields the csv header, then one csv line per row. """
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(
+            [_encoder.default(value) if isinstance(value, datetime.datetime) else value for value in row]
+        )
+
+
+def stream_export(name, export_format, since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """ Returns a lazy iterator over the serialized export. """
+    columns, rows = export_rows(name, since=since, chunk_size=chunk_size)
+    if export_format == 'csv':
+        return stream_csv(columns, rows)
+    return stream_ndjson(columns, rows)
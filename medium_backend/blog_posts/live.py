@@ -0,0 +1,206 @@
+"""
+Live vote and comment counts of posts, streamed as Server-Sent Events by the ASGI app.
+
+Vote and comment writes mark their post dirty in the process wide ``broker``. While
+anybody listens, the broker reads the counts of the dirty posts once per
+``LIVE_COUNTS_INTERVAL`` and hands them to the subscribers of each post, so a burst
+of votes on a post becomes one event per interval. Pending counts of a slow client
+are coalesced the same way, only the latest counts of a post are sent.
+
+An idle connection is a coroutine waiting on an event, without any thread or
+database connection. The broker is in-process: a post's writes reach the clients
+streamed by the same process.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+from knox.auth import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from blog_posts.constant import LIVE_COUNTS_MAX_POSTS
+from blog_posts.models import Post
+from blog_posts.projections import PostProjection
+from medium_backend.renderers import dumps
+
+LIVE_COUNTS_PATH = '/api/live/counts/'
+
+
+def refresh_connections():
+    """
+    Drops broken connections or the ones past CONN_MAX_AGE, like Django does around
+    requests, since this database work happens outside of them.
+    """
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+def get_counts(post_ids):
+    """ Returns the total votes and comment count of each existing post. """
+    refresh_connections()
+    votes = PostProjection.get_total_votes_by_post(post_ids)
+    return {
+        post_id: {'id': post_id, 'total_votes': votes.get(post_id, 0), 'comment_count': comment_count}
+        for post_id, comment_count in Post.objects.filter(id__in=post_ids).values_list('id', 'comment_count')
+    }
+
+
+class Subscriber:
+    """ A client streaming the counts of ``post_ids``, with its not yet sent counts. """
+
+    def __init__(self, post_ids):
+        """ Nothing pending yet. """
+        self.post_ids = post_ids
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def push(self, counts):
+        """ Queues the counts of a post, replacing the ones not sent yet. """
+        self.pending[counts['id']] = counts
+        self.ready.set()
+
+    def pop(self):
+        """ Returns and clears the pending counts. """
+        pending, self.pending = self.pending, {}
+        self.ready.clear()
+        return list(pending.values())
+
+
+class CountBroker:
+    """
+    In-process pub/sub of post counts. ``publish()`` is called from the sync
+    threads writing votes and comments, everything else runs on the event loop.
+    """
+
+    def __init__(self):
+        """ No subscriber and no flushing task until the first client connects. """
+        self.lock = threading.Lock()
+        self.dirty = set()
+        self.subscribers = defaultdict(set)
+        self.flusher = None
+
+    def publish(self, post_id):
+        """ Marks the counts of a post as changed, if anybody listens to it. """
+        if post_id in self.subscribers:
+            with self.lock:
+                self.dirty.add(post_id)
+
+    def subscribe(self, subscriber):
+        """ Starts delivering the counts of the subscriber's posts. """
+        for post_id in subscriber.post_ids:
+            self.subscribers[post_id].add(subscriber)
+        if self.flusher is None or self.flusher.done():
+            self.flusher = asyncio.get_running_loop().create_task(self.run())
+
+    def unsubscribe(self, subscriber):
+        """ Stops delivering to the subscriber. """
+        for post_id in subscriber.post_ids:
+            self.subscribers[post_id].discard(subscriber)
+            if not self.subscribers[post_id]:
+                del self.subscribers[post_id]
+
+    async def run(self):
+        """ Flushes the dirty posts every interval while anybody listens. """
+        while self.subscribers:
+            await asyncio.sleep(settings.LIVE_COUNTS_INTERVAL)
+            await self.flush()
+
+    async def flush(self):
+        """ Reads the counts of the dirty posts in one go and fans them out. """
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+        post_ids = [post_id for post_id in dirty if post_id in self.subscribers]
+        if not post_ids:
+            return
+        for post_id, counts in (await sync_to_async(get_counts)(post_ids)).items():
+            for subscriber in self.subscribers.get(post_id, ()):
+                subscriber.push(counts)
+
+
+broker = CountBroker()
+
+
+def authenticate(token):
+    """ Returns the active user of a knox token, None for an invalid one. """
+    refresh_connections()
+    try:
+        return TokenAuthentication().authenticate_credentials(token.encode())[0]
+    except AuthenticationFailed:
+        return None
+
+
+def get_token(scope, params):
+    """ Token of the Authorization header, or of ?token= since EventSource can't send headers. """
+    headers = dict(scope['headers'])
+    keyword, _, token = headers.get(b'authorization', b'').decode('latin-1').partition(' ')
+    if keyword == 'Token' and token:
+        return token.strip()
+    return params.get('token', [''])[0]
+
+
+def format_event(counts):
+    """ SSE frame of the counts of a post. """
+    return b'event: counts\ndata: ' + dumps(counts) + b'\n\n'
+
+
+async def send_error(send, status, message):
+    """ Sends a JSON error response. """
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': dumps({'error': message})})
+
+
+async def live_counts(scope, receive, send):
+    """
+    ASGI app streaming the counts of ?ids=1,2,3 as text/event-stream.
+    Starts with the current counts, then sends the changed ones.
+    """
+    if scope['method'] != 'GET':
+        return await send_error(send, 405, 'Method not allowed.')
+    params = parse_qs(scope['query_string'].decode('latin-1'))
+    try:
+        post_ids = sorted({int(post_id) for post_id in params.get('ids', [''])[0].split(',') if post_id})
+    except ValueError:
+        return await send_error(send, 400, 'ids must be a comma separated list of post ids.')
+    if not post_ids or len(post_ids) > LIVE_COUNTS_MAX_POSTS:
+        return await send_error(send, 400, f'Between 1 and {LIVE_COUNTS_MAX_POSTS} post ids are required.')
+    if await sync_to_async(authenticate)(get_token(scope, params)) is None:
+        return await send_error(send, 401, 'Invalid token.')
+
+    subscriber = Subscriber(post_ids)
+    broker.subscribe(subscriber)
+    disconnected = asyncio.ensure_future(receive_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        for counts in (await sync_to_async(get_counts)(post_ids)).values():
+            subscriber.push(counts)
+        while True:
+            ready = asyncio.ensure_future(subscriber.ready.wait())
+            done, _ = await asyncio.wait({ready, disconnected}, timeout=settings.LIVE_COUNTS_KEEPALIVE,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                ready.cancel()
+                break
+            if ready in done:
+                body = b''.join(format_event(counts) for counts in subscriber.pop())
+            else:
+                ready.cancel()
+                body = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        broker.unsubscribe(subscriber)
+        disconnected.cancel()
+
+
+async def receive_disconnect(receive):
+    """ Returns once the client went away. """
+    while (await receive())['type'] != 'http.disconnect':
+        pass
@@ -0,0 +1,65 @@
+""" Helpers shared by the benchmark management commands """
+import time
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from blog_posts.models import AssignedTag, Comment, Post, Tag, Vote
+
+
+class Rollback(Exception):
+    """ Raised to roll back the seeded benchmark data. """
+
+
+def seeded(callback, posts=100, comments=10, votes=10):
+    """
+    Runs ``callback`` against freshly seeded posts, comments and votes.
+
+    Everything is written inside a transaction which is rolled back afterwards, so
+    benchmarks can run against any database without leaving data behind.
+    """
+    result = None
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(username=f'benchmark-{index}', email=f'benchmark-{index}@example.com')
+                for index in range(max(votes, 1))
+            )
+            tags = Tag.objects.bulk_create(Tag(name=f'tag-{index}') for index in range(5))
+            seeded_posts = Post.objects.bulk_create(
+                Post(posted_by=users[index % len(users)], title=f'Benchmark post {index}',
+                     content='Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 40)
+                for index in range(posts)
+            )
+            AssignedTag.objects.bulk_create(
+                AssignedTag(post=post, tag=tag) for post in seeded_posts for tag in tags[:3]
+            )
+            Vote.objects.bulk_create(
+                Vote(post=post, user=user, upvote=index % 3 != 0)
+                for post in seeded_posts for index, user in enumerate(users[:votes])
+            )
+            for post in seeded_posts:
+                parents = Comment.objects.bulk_create(
+                    Comment(post=post, owner=users[0], content=f'Comment {index}')
+                    for index in range(comments)
+                )
+                Comment.objects.bulk_create(
+                    Comment(post=post, owner=users[-1], parent=parent, content='Reply')
+                    for parent in parents
+                )
+            result = callback(seeded_posts)
+            raise Rollback
+    except Rollback:
+        pass
+    return result
+
+
+def best_of(func, repeat=5, number=10):
+    """ Returns the best average duration in seconds of ``number`` calls to ``func``. """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings)
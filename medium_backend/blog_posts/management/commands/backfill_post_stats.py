@@ -0,0 +1,42 @@
+""" Backfills the excerpt, word count and reading time of existing posts """
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog_posts.models import Post
+
+STATS_FIELDS = ['excerpt', 'word_count', 'reading_time']
+
+
+class Command(BaseCommand):
+    """ python manage.py backfill_post_stats --batch-size 500 """
+    help = 'Computes the excerpt, word count and reading time of posts in batches.'
+
+    def add_arguments(self, parser):
+        """ Batch size and which posts to backfill. """
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true',
+                            help='Recompute every post instead of the ones without stats.')
+
+    def handle(self, *args, **options):
+        """ Reads posts in batches and writes their stats with one bulk update per batch. """
+        queryset = Post.objects.only('id', 'content').order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(word_count=0).exclude(content='')
+
+        batch, updated = [], 0
+        for post in queryset.iterator(chunk_size=options['batch_size']):
+            post.refresh_text_stats()
+            batch.append(post)
+            if len(batch) >= options['batch_size']:
+                updated += self.write(batch)
+                batch = []
+        updated += self.write(batch)
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} posts.'))
+
+    def write(self, batch):
+        """ Bulk updates one batch of posts in its own transaction. """
+        if batch:
+            with transaction.atomic():
+                Post.objects.bulk_update(batch, STATS_FIELDS)
+            self.stdout.write(f'  ... up to post {batch[-1].pk}')
+        return len(batch)
@@ -0,0 +1,64 @@
+""" Measures tag suggestions from the prefix index against a LIKE query on the tags """
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from blog_posts.autocomplete import TagIndex
+from blog_posts.management.commands._benchmark import Rollback, best_of
+from blog_posts.models import Tag
+
+
+class Command(BaseCommand):
+    """ python manage.py benchmark_autocomplete --tags 200000 """
+    help = 'Benchmarks tags/autocomplete/ lookups on seeded tags, rolled back afterwards.'
+
+    def add_arguments(self, parser):
+        """ Number of seeded tags and of sampled prefixes. """
+        parser.add_argument('--tags', type=int, default=200000)
+        parser.add_argument('--prefixes', type=int, default=200)
+
+    def handle(self, *args, **options):
+        """ Seeds the tags in a transaction, times the lookups, then rolls back. """
+        random.seed(0)
+        try:
+            with transaction.atomic():
+                names = {''.join(random.choices(string.ascii_lowercase, k=random.randint(3, 12)))
+                         for _ in range(options['tags'])}
+                Tag.objects.bulk_create((Tag(name=name, usage_count=random.paretovariate(1.2) // 1) for name in names),
+                                        batch_size=5000)
+                self.measure(sorted(names), options['prefixes'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, names, count):
+        """ Times cold and cached index lookups and the query the index replaces. """
+        prefixes = [name[:random.randint(1, 3)] for name in random.sample(names, count)]
+        index = TagIndex()
+        start = time.perf_counter()
+        index.load()
+        self.stdout.write(f'{len(names)} tags loaded in {(time.perf_counter() - start) * 1000:.0f} ms')
+
+        def cold():
+            index.top = {}
+            for prefix in prefixes:
+                index.suggest(prefix, 10)
+
+        def cached():
+            for prefix in prefixes:
+                index.suggest(prefix, 10)
+
+        def query():
+            # What a request would run without the index, counting the assignments.
+            for prefix in prefixes[:20]:
+                list(Tag.objects.filter(name__istartswith=prefix).annotate(uses=Count('assigned_tags'))
+                     .order_by('-uses').values_list('name', 'uses')[:10])
+
+        for name, func, number in (('cold', cold, len(prefixes)), ('cached', cached, len(prefixes)),
+                                   ('query', query, 20)):
+            duration = best_of(func, repeat=3, number=1) / number
+            self.stdout.write(f'{name:<7} {duration * 1000:9.3f} ms per lookup')
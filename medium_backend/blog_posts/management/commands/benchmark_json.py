@@ -0,0 +1,52 @@
+""" Compares JSON rendering and parsing throughput of the DRF and fast backends """
+import io
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from blog_posts.management.commands._benchmark import best_of, seeded
+from blog_posts.models import Comment, Post
+from blog_posts.serializer import CommentSerializer, PostSerializer
+from medium_backend.parsers import FastJSONParser
+from medium_backend.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    """ python manage.py benchmark_json --posts 100 --comments 10 """
+    help = 'Benchmarks the JSON renderers and parsers on seeded post and comment pages.'
+
+    def add_arguments(self, parser):
+        """ Size of the seeded pages. """
+        parser.add_argument('--posts', type=int, default=100)
+        parser.add_argument('--comments', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """ Seeds the pages, then times every backend on them. """
+        seeded(lambda posts: self.run(posts, options['repeat']),
+               posts=options['posts'], comments=options['comments'])
+
+    def run(self, posts, repeat):
+        """ Prints the throughput of each backend for both pages. """
+        context = {'request': Request(APIRequestFactory().get('/api/'))}
+        pages = {
+            'posts': PostSerializer(Post.objects.filter(id__in=[post.id for post in posts]),
+                                    many=True, context=context).data,
+            'post_comment': CommentSerializer(Comment.objects.filter(post=posts[0], parent=None),
+                                              many=True, context=context).data,
+        }
+        backends = [('drf', JSONRenderer(), JSONParser()), ('fast', FastJSONRenderer(), FastJSONParser())]
+
+        for page, data in pages.items():
+            for name, renderer, parser in backends:
+                payload = renderer.render(data)
+                render = best_of(lambda: renderer.render(data), repeat=repeat)
+                parse = best_of(lambda: parser.parse(io.BytesIO(payload)), repeat=repeat)
+                self.stdout.write(
+                    f'{page:<13} {name:<5} {len(payload) / 1024:8.1f} KiB  '
+                    f'render {len(payload) / render / 2 ** 20:8.1f} MiB/s  '
+                    f'parse {len(payload) / parse / 2 ** 20:8.1f} MiB/s'
+                )
@@ -0,0 +1,39 @@
+""" Compares the latency of generating the OpenAPI schema per request and serving the cached one """
+from django.core.management.base import BaseCommand
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+from rest_framework.test import APIRequestFactory
+
+from blog_posts.management.commands._benchmark import best_of
+from medium_backend.schema import API_INFO, schema_cache, schema_json
+
+
+class Command(BaseCommand):
+    """ python manage.py benchmark_schema --repeat 5 """
+    help = 'Benchmarks the schema endpoint, generated on every hit versus cached with an ETag.'
+
+    def add_arguments(self, parser):
+        """ Number of timing rounds. """
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """ Times each way of serving the schema. """
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        generated = get_schema_view(API_INFO, public=True, permission_classes=[permissions.AllowAny]).without_ui()
+        etag = schema_cache.get().etag
+
+        def uncached():
+            # The previous behaviour: drf_yasg walks the apis on every hit.
+            return generated(factory.get('/', {'format': 'openapi'})).render()
+
+        cases = [
+            ('generated', uncached),
+            ('cached', lambda: schema_json(factory.get('/swagger.json'))),
+            ('cached 304', lambda: schema_json(factory.get('/swagger.json', HTTP_IF_NONE_MATCH=etag))),
+        ]
+        baseline = None
+        for name, func in cases:
+            status = func().status_code
+            duration = best_of(func, repeat=options['repeat'], number=5)
+            baseline = baseline or duration
+            self.stdout.write(f'{name:<11} {status}  {duration * 1000:9.3f} ms  x{baseline / duration:,.0f}')
@@ -0,0 +1,91 @@
+""" Runs parallel voters against the vote actions to measure write concurrency """
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from blog_posts.models import Post
+from blog_posts.views import PostViewSet
+
+# Settings of the project before the SQLite tuning, used by --baseline.
+BASELINE_PRAGMAS = {'journal_mode': 'delete', 'synchronous': 'full'}
+VOTE_ACTIONS = ['upvote', 'downvote', 'unvote']
+
+
+class Command(BaseCommand):
+    """ python manage.py benchmark_votes --voters 16 --votes 50 [--baseline] """
+    help = 'Benchmarks concurrent voters on posts/<id>/upvote|downvote|unvote/.'
+
+    def add_arguments(self, parser):
+        """ Number of parallel voters and votes per voter. """
+        parser.add_argument('--voters', type=int, default=16)
+        parser.add_argument('--votes', type=int, default=50)
+        parser.add_argument('--baseline', action='store_true',
+                            help='Use the rollback journal settings the project had before tuning.')
+
+    def handle(self, *args, **options):
+        """ Seeds a post and voters, runs the voters in threads, then cleans up. """
+        if options['baseline']:
+            settings.SQLITE_PRAGMAS = BASELINE_PRAGMAS
+        # Reconnect so the journal mode of the database file is switched now.
+        connection.close()
+        journal_mode = '-'
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+
+        owner = User.objects.create_user('benchmark-owner')
+        post = Post.objects.create(posted_by=owner, title='Vote benchmark', content='')
+        voters = [User.objects.create_user(f'benchmark-voter-{index}') for index in range(options['voters'])]
+        latencies, errors = [], []
+        try:
+            threads = [
+                threading.Thread(target=self.vote, args=(voter, post.pk, options['votes'], latencies, errors))
+                for voter in voters
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            User.objects.filter(pk__in=[owner.pk, *[voter.pk for voter in voters]]).delete()
+
+        self.stdout.write(f'journal_mode={journal_mode} voters={len(voters)} requests={len(latencies) + len(errors)}')
+        self.stdout.write(f'throughput {len(latencies) / elapsed:8.1f} votes/s  errors {len(errors)}')
+        if latencies:
+            latencies.sort()
+            self.stdout.write(
+                f'latency p50 {statistics.median(latencies) * 1000:6.1f} ms  '
+                f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:6.1f} ms  '
+                f'max {latencies[-1] * 1000:6.1f} ms'
+            )
+        if errors:
+            self.stdout.write(self.style.WARNING(f'first error: {errors[0]}'))
+
+    def vote(self, user, post_id, votes, latencies, errors):
+        """ Cycles through the vote actions as one voter, on its own connection. """
+        factory = APIRequestFactory()
+        # Measures the database, not the vote throttle.
+        views = {name: PostViewSet.as_view({'get': name}, throttle_classes=[]) for name in VOTE_ACTIONS}
+        try:
+            for index in range(votes):
+                name = VOTE_ACTIONS[index % len(VOTE_ACTIONS)]
+                request = factory.get(f'/api/posts/{post_id}/{name}/')
+                force_authenticate(request, user=user)
+                start = time.perf_counter()
+                try:
+                    views[name](request, pk=post_id)
+                except OperationalError as err:
+                    errors.append(err)
+                else:
+                    latencies.append(time.perf_counter() - start)
+        finally:
+            connection.close()
@@ -0,0 +1,20 @@
+""" Builds the cached OpenAPI schema of the current URLconf """
+from django.core.management.base import BaseCommand
+
+from medium_backend.schema import get_schema_path, schema_cache
+
+
+class Command(BaseCommand):
+    """ python manage.py build_schema [--force] """
+    help = 'Generates the OpenAPI schema served by the docs, unless the URLconf has one already.'
+
+    def add_arguments(self, parser):
+        """ Regenerating an up to date schema is opt-in. """
+        parser.add_argument('--force', action='store_true', help='Regenerate it even if it is up to date.')
+
+    def handle(self, *args, **options):
+        """ Run it on deploy, so the first request doesn't pay for the generation. """
+        schema = schema_cache.get(rebuild=options['force'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Schema {schema.etag} ({len(schema.content) / 1024:.1f} KiB) at {get_schema_path(schema.fingerprint)}'
+        ))
@@ -0,0 +1,39 @@
+""" Streams a blog_posts table to a file or stdout as NDJSON or CSV """
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog_posts.constant import EXPORT_CHUNK_SIZE, EXPORT_FORMATS
+from blog_posts.exports import EXPORTS, parse_since, stream_export
+
+
+class Command(BaseCommand):
+    """ python manage.py export_data posts --output csv --since 2022-09-01 --file posts.csv """
+    help = 'Exports posts, comments, votes or reports with constant memory usage.'
+
+    def add_arguments(self, parser):
+        """ Export name, format and filters. """
+        parser.add_argument('name', choices=list(EXPORTS))
+        parser.add_argument('--output', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--since', help='Only rows modified at or after this ISO 8601 datetime.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument('--file', help='Write to this path instead of stdout.')
+
+    def handle(self, *args, **options):
+        """ Writes the export chunk by chunk. """
+        try:
+            since = parse_since(options['since']) if options['since'] else None
+        except ValueError as err:
+            raise CommandError(err)
+
+        chunks = stream_export(options['name'], options['output'], since=since,
+                               chunk_size=max(options['chunk_size'], 1))
+        stream = open(options['file'], 'wb') if options['file'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                stream.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        finally:
+            if options['file']:
+                stream.close()
+            else:
+                stream.flush()
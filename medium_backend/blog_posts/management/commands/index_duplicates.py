@@ -0,0 +1,30 @@
+""" Indexes the MinHash signatures of existing posts for the duplicate checks """
+from django.core.management.base import BaseCommand
+
+from blog_posts.duplicates import (find_duplicates, get_stored_signature,
+                                   index_post)
+from blog_posts.models import Post
+
+
+class Command(BaseCommand):
+    """ python manage.py index_duplicates [--report] """
+    help = 'Stores the MinHash signature and LSH band keys of every post, unchanged ones are skipped.'
+
+    def add_arguments(self, parser):
+        """ Whether to list the duplicates found. """
+        parser.add_argument('--report', action='store_true',
+                            help='Print the pairs of near-duplicate posts once indexed.')
+
+    def handle(self, *args, **options):
+        """ Indexes the posts in id order, then optionally looks up the duplicates of each. """
+        queryset = Post.objects.only('id', 'content').order_by('pk')
+        indexed = 0
+        for post in queryset.iterator(chunk_size=500):
+            index_post(post)
+            indexed += 1
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} posts.'))
+        if options['report']:
+            for post in queryset.iterator(chunk_size=500):
+                for duplicate_id, similarity in find_duplicates(post.pk, get_stored_signature(post.pk)):
+                    if duplicate_id < post.pk:
+                        self.stdout.write(f'  post {post.pk} duplicates post {duplicate_id} ({similarity:.0%})')
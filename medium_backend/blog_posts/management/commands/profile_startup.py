@@ -0,0 +1,45 @@
+""" Profiles the cold start of a worker and checks it against the startup budget """
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from medium_backend.startup import ENTRYPOINTS, group_by_package, measure_startup, profile_imports
+
+
+class Command(BaseCommand):
+    """ python manage.py profile_startup --entrypoint wsgi --top 20 [--lazy-urlconf 1] [--max-ms 1500] """
+    help = ('Reports the import time of a cold started worker per package and module, '
+            'fails when it is over the budget.')
+
+    def add_arguments(self, parser):
+        """ What to start, how often, and the budget. """
+        parser.add_argument('--entrypoint', choices=ENTRYPOINTS, default='wsgi')
+        parser.add_argument('--path', default='/api/posts/', help='Resolved like the first request.')
+        parser.add_argument('--lazy-urlconf', choices=['0', '1'],
+                            help='Overrides MEDIUM_LAZY_URLCONF of the profiled worker.')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--max-ms', type=float, default=settings.STARTUP_TIME_BUDGET_MS,
+                            help='Startup budget, 0 disables the check.')
+
+    def handle(self, *args, **options):
+        """ Times the cold starts, prints the breakdown, then applies the budget. """
+        environ = {} if options['lazy_urlconf'] is None else {'MEDIUM_LAZY_URLCONF': options['lazy_urlconf']}
+        try:
+            duration = measure_startup(options['entrypoint'], options['path'], environ, options['repeat'])
+            imports = profile_imports(options['entrypoint'], options['path'], environ)
+        except RuntimeError as error:
+            raise CommandError(error)
+
+        top = options['top']
+        self.stdout.write(f'Packages by own import time ({len(imports)} modules):')
+        for package, self_us in group_by_package(imports)[:top]:
+            self.stdout.write(f'  {self_us / 1000:9.1f} ms  {package}')
+        self.stdout.write('Modules by cumulative import time:')
+        for entry in sorted(imports, key=lambda entry: entry.cumulative_us, reverse=True)[:top]:
+            self.stdout.write(f'  {entry.cumulative_us / 1000:9.1f} ms  {entry.self_us / 1000:9.1f} ms  '
+                              f'{"  " * entry.depth}{entry.module}')
+
+        summary = f'{options["entrypoint"]} startup: {duration * 1000:.1f} ms (best of {options["repeat"]})'
+        if options['max_ms'] and duration * 1000 > options['max_ms']:
+            raise CommandError(f'{summary}, over the budget of {options["max_ms"]:.0f} ms.')
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,31 @@
+""" Purges the rows of soft deleted posts """
+from django.core.management.base import BaseCommand
+
+from blog_posts.constant import PURGE_CHUNK_SIZE
+from blog_posts.models import Post
+from blog_posts.purge import purge_post
+
+
+class Command(BaseCommand):
+    """ python manage.py purge_deleted_posts [--post <id> ...] [--chunk-size 500] """
+    help = ('Deletes the soft deleted posts with their comments, votes and other rows in chunks, '
+            'for the purges which did not run or were interrupted.')
+
+    def add_arguments(self, parser):
+        """ Posts to purge, every soft deleted one by default, and the rows per transaction. """
+        parser.add_argument('--post', type=int, nargs='+', dest='post_ids')
+        parser.add_argument('--chunk-size', type=int, default=PURGE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        """ Purges the posts one by one, reporting each chunk. """
+        post_ids = options['post_ids'] or list(
+            Post.all_objects.filter(deleted_at__isnull=False).order_by('deleted_at').values_list('pk', flat=True)
+        )
+        deleted = 0
+        for post_id in post_ids:
+            deleted += purge_post(post_id, options['chunk_size'], progress=self.report)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} rows of {len(post_ids)} posts.'))
+
+    def report(self, post_id, model, purged, total):
+        """ Writes the progress of a purge. """
+        self.stdout.write(f'  post {post_id}: {purged}/{total} {model._meta.verbose_name_plural}')
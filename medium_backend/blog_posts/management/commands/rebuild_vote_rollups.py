@@ -0,0 +1,20 @@
+""" Rebuilds the hourly vote rollups from the votes """
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog_posts.summaries import rebuild_rollups
+
+
+class Command(BaseCommand):
+    """ python manage.py rebuild_vote_rollups [--post <id> ...] """
+    help = 'Recreates the hourly vote rollups serving votes/summary/, of every post or the given ones.'
+
+    def add_arguments(self, parser):
+        """ Posts to rebuild, all of them by default. """
+        parser.add_argument('--post', type=int, nargs='+', dest='post_ids')
+
+    def handle(self, *args, **options):
+        """ Replaces the rollups in one transaction, so the summaries never see them half built. """
+        with transaction.atomic():
+            created = rebuild_rollups(options['post_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Created {created} hourly rollups.'))
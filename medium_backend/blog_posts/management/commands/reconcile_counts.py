@@ -0,0 +1,60 @@
+""" Fixes drift of the denormalized counters and author stats """
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+
+from blog_posts.models import (AssignedTag, AuthorStats, Comment, Post, Tag,
+                               Vote)
+from blog_posts.utils import in_chunks
+
+VOTE_VALUE = Sum(Case(When(upvote=True, then=1), default=-1))
+
+# (model, counter column, (counted rows, their field pointing at the model, aggregate))
+# The author stats leave out soft deleted posts, uncounted when they were deleted. Tag
+# usage is only given back by the purge.
+COUNTERS = [
+    (Post, 'comment_count', (Comment.objects.all(), 'post', Count('pk'))),
+    (Comment, 'reply_count', (Comment.objects.all(), 'parent', Count('pk'))),
+    (AuthorStats, 'post_count', (Post.objects.all(), 'posted_by', Count('pk'))),
+    (AuthorStats, 'total_votes', (Vote.objects.of_live_posts(), 'post__posted_by', VOTE_VALUE)),
+    (AuthorStats, 'comment_count', (Comment.objects.of_live_posts(), 'post__posted_by', Count('pk'))),
+    (Tag, 'usage_count', (AssignedTag.objects.all(), 'tag', Count('pk'))),
+]
+
+
+def actual_count(rows, field, aggregate):
+    """ Aggregate of the ``rows`` pointing at the outer row through ``field``. """
+    totals = rows.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=aggregate)
+    return Coalesce(Subquery(totals.values('total'), output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    """ python manage.py reconcile_counts [--dry-run] """
+    help = ('Recounts comment_count of posts, reply_count of comments, usage_count of tags and '
+            'the author stats where they drifted.')
+
+    def add_arguments(self, parser):
+        """ Report only, without fixing. """
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted rows.')
+
+    def handle(self, *args, **options):
+        """ Finds the drifted rows of each counter and recounts them in SQL. """
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        missing = list(User.objects.filter(author_stats=None).values_list('pk', flat=True))
+        if not options['dry_run']:
+            AuthorStats.objects.bulk_create([AuthorStats(user_id=pk) for pk in missing], ignore_conflicts=True)
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(missing)} users without AuthorStats.'))
+
+        for model, counter, source in COUNTERS:
+            drifted = list(
+                model.objects.annotate(actual=actual_count(*source)).exclude(**{counter: F('actual')})
+                .order_by('pk').values_list('pk', counter, 'actual')
+            )
+            for pk, stored, actual in drifted:
+                self.stdout.write(f'  {model.__name__} {pk}: {counter} {stored} -> {actual}')
+            if not options['dry_run']:
+                # Recomputed by the UPDATE itself, so rows written meanwhile are counted.
+                for chunk in in_chunks([pk for pk, _, _ in drifted]):
+                    model.objects.filter(pk__in=chunk).update(**{counter: actual_count(*source)})
+            self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} drifted {model.__name__}.{counter}.'))
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.10 on 2026-10-19 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_posts', '0002_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['modified'], name='blog_posts__modifie_6810f7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['modified'], name='blog_posts__modifie_ebad9f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['modified'], name='blog_posts__modifie_8b85ff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['modified'], name='blog_posts__modifie_9ad17b_idx'),
+        ),
+    ]
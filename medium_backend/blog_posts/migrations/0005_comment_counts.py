@@ -0,0 +1,40 @@
+# Generated by Django 4.1.10 on 2026-10-19 16:03
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    """ Number of rows of ``model`` pointing at the outer row through ``field``. """
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(counts.values('total'), output_field=IntegerField()), 0)
+
+
+def backfill_counts(apps, schema_editor):
+    """ Counts the existing comments and replies. """
+    Post = apps.get_model('blog_posts', 'Post')
+    Comment = apps.get_model('blog_posts', 'Comment')
+    Post.objects.update(comment_count=count_subquery(Comment, 'post'))
+    Comment.objects.update(reply_count=count_subquery(Comment, 'parent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_posts', '0004_post_text_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, help_text='kept by signals'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, help_text='comments and replies, kept by signals'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.1.10 on 2026-10-19 16:07
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncHour
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    """ Rolls up the existing votes per post and hour. """
+    Vote = apps.get_model('blog_posts', 'Vote')
+    VoteRollup = apps.get_model('blog_posts', 'VoteRollup')
+    hours = Vote.objects.annotate(period=TruncHour('created')).values('post_id', 'period').annotate(
+        upvotes=Count('id', filter=Q(upvote=True)),
+        downvotes=Count('id', filter=Q(upvote=False)),
+    ).order_by()
+    VoteRollup.objects.bulk_create([
+        VoteRollup(post_id=hour['post_id'], bucket=hour['period'], upvotes=hour['upvotes'],
+                   downvotes=hour['downvotes'])
+        for hour in hours.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_posts', '0005_comment_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='start of the hour')),
+                ('upvotes', models.PositiveIntegerField(default=0)),
+                ('downvotes', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['post', 'created'], name='blog_posts__post_id_402635_idx'),
+        ),
+        migrations.AddField(
+            model_name='voterollup',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_rollups', to='blog_posts.post'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='voterollup',
+            unique_together={('post', 'bucket')},
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
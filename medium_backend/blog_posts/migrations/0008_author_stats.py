@@ -0,0 +1,56 @@
+# Generated by Django 4.1.10 on 2026-10-19 16:22
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def total_subquery(model, field, aggregate):
+    """ Aggregate of the rows of ``model`` pointing at the outer row through ``field``. """
+    totals = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=aggregate)
+    return Coalesce(Subquery(totals.values('total'), output_field=IntegerField()), 0)
+
+
+def backfill_author_stats(apps, schema_editor):
+    """ Creates the stats of the existing users from their posts. """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    AuthorStats = apps.get_model('blog_posts', 'AuthorStats')
+    Post = apps.get_model('blog_posts', 'Post')
+    Vote = apps.get_model('blog_posts', 'Vote')
+    Comment = apps.get_model('blog_posts', 'Comment')
+    AuthorStats.objects.bulk_create(AuthorStats(user_id=pk) for pk in User.objects.values_list('pk', flat=True))
+    AuthorStats.objects.update(
+        post_count=total_subquery(Post, 'posted_by', Count('pk')),
+        total_votes=total_subquery(Vote, 'post__posted_by', Sum(Case(When(upvote=True, then=1), default=-1))),
+        comment_count=total_subquery(Comment, 'post__posted_by', Count('pk')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog_posts', '0007_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('total_votes', models.IntegerField(default=0, help_text='upvotes minus downvotes received on the posts')),
+                ('comment_count', models.PositiveIntegerField(default=0, help_text='comments and replies received on the posts')),
+            ],
+            options={
+                'verbose_name_plural': 'author stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['posted_by', '-created'], name='blog_posts__posted__96afbb_idx'),
+        ),
+        migrations.RunPython(backfill_author_stats, migrations.RunPython.noop),
+    ]
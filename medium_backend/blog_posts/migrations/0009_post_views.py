@@ -0,0 +1,28 @@
+# Generated by Django 4.1.10 on 2026-10-19 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_posts', '0008_author_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='unique_viewers',
+            field=models.PositiveIntegerField(default=0, help_text='estimated from viewers_sketch'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='view_count',
+            field=models.PositiveBigIntegerField(default=0, help_text='flushed by blog_posts.tracking'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='viewers_sketch',
+            field=models.BinaryField(default=b'', help_text='HyperLogLog sketch of the viewers'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.10 on 2026-10-19 16:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_posts', '0009_post_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSignature',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='blog_posts.post')),
+                ('signature', models.BinaryField(help_text='MinHash values, uint32 each')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('key', models.BigIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='blog_posts.post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='lshbucket',
+            index=models.Index(fields=['key'], name='blog_posts__key_03bfcd_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='lshbucket',
+            unique_together={('post', 'band')},
+        ),
+    ]
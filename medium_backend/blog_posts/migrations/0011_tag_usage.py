@@ -0,0 +1,29 @@
+# Generated by Django 4.1.10 on 2026-10-19 16:33
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_usage(apps, schema_editor):
+    """ Counts the existing assignments of each tag. """
+    Tag = apps.get_model('blog_posts', 'Tag')
+    AssignedTag = apps.get_model('blog_posts', 'AssignedTag')
+    counts = AssignedTag.objects.filter(tag=OuterRef('pk')).order_by().values('tag').annotate(total=Count('pk'))
+    Tag.objects.update(usage_count=Coalesce(Subquery(counts.values('total'), output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_posts', '0010_post_signatures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0, help_text='assigned tags, kept by signals'),
+        ),
+        migrations.RunPython(backfill_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.10 on 2026-10-19 16:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog_posts', '0012_post_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='report',
+            name='reported_by',
+            field=models.ForeignKey(blank=True, help_text='empty for the reports filed automatically, e.g. of duplicates', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reports', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,78 @@
+"""
+MinHash signatures of texts and their LSH band keys, for near-duplicate detection.
+
+A text is reduced to the set of its SHINGLE_SIZE word shingles. Each of the
+MINHASH_PERMUTATIONS hash functions h(x) = (a * x + b) mod (2 ** 61 - 1) keeps its
+lowest value over the shingles, and two signatures agree on a position with a
+probability equal to the Jaccard similarity of the shingle sets.
+
+The signature is cut into LSH_BANDS bands, each hashed to a key. Texts sharing a band
+key are candidates: a pair of similarity s shares one of b bands of r rows with a
+probability of 1 - (1 - s ** r) ** b, about 95% at s = 0.8 and 6% at s = 0.5 with 16
+bands of 8 rows.
+
+NumPy is only imported once a signature is first computed.
+"""
+import functools
+import hashlib
+import re
+
+from blog_posts.constant import (LSH_BANDS, MINHASH_PERMUTATIONS, MINHASH_SEED,
+                                 SHINGLE_SIZE)
+
+MERSENNE_PRIME = (1 << 61) - 1
+WORD_RE = re.compile(r'\w+')
+
+
+def get_shingles(text, size=SHINGLE_SIZE):
+    """ The set of runs of ``size`` consecutive words of the text, the whole text when shorter. """
+    words = WORD_RE.findall(text.lower())
+    return {' '.join(words[start:start + size]) for start in range(max(len(words) - size + 1, 1))} if words else set()
+
+
+@functools.lru_cache(maxsize=None)
+def get_permutations(count=MINHASH_PERMUTATIONS):
+    """
+    The (a, b) coefficients of the hash functions, fixed by MINHASH_SEED so stored
+    signatures stay comparable. Below 2 ** 32 so a * x + b fits in 64 bits.
+    """
+    import numpy as np
+
+    generator = np.random.default_rng(MINHASH_SEED)
+    return (generator.integers(1, 1 << 32, count, dtype=np.uint64),
+            generator.integers(0, 1 << 32, count, dtype=np.uint64))
+
+
+def compute_signature(text):
+    """ MinHash signature of the text as an array of uint32, None for a text without words. """
+    import numpy as np
+
+    shingles = get_shingles(text)
+    if not shingles:
+        return None
+    hashes = np.fromiter((int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), 'big')
+                          for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    a, b = get_permutations()
+    return ((np.outer(a, hashes) + b[:, np.newaxis]) % MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+
+def signature_from_bytes(data):
+    """ Restores a signature stored as its raw bytes. """
+    import numpy as np
+
+    return np.frombuffer(bytes(data), dtype=np.uint32)
+
+
+def get_band_keys(signature, bands=LSH_BANDS):
+    """ (band, key) of each band of the signature, keys being signed 64-bit hashes of the rows. """
+    rows = len(signature) // bands
+    return [
+        (band, int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                              digest_size=8).digest(), 'big', signed=True))
+        for band in range(bands)
+    ]
+
+
+def estimate_similarity(signature, other):
+    """ Estimated Jaccard similarity of the shingles of two signatures. """
+    return float((signature == other).mean())
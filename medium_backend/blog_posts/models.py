@@ -1,23 +1,117 @@
 """ Models declaration for the blog_posts api """
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import BooleanField, F, OuterRef, Subquery, Value, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 from django_extensions.db.models import TimeStampedModel
 
-from blog_posts.constant import REPORT_CHOICES, STATUS_CHOICES
+from blog_posts.constant import EXCERPT_LENGTH, REPORT_CHOICES, STATUS_CHOICES
+from blog_posts.utils import get_text_stats
+
+# Positional parameters of Model.save(), named by the overrides which read them.
+SAVE_PARAMETERS = ('force_insert', 'force_update', 'using', 'update_fields')
+
+
+class AtomicSaveMixin:
+    """
+    Saves the model in a transaction, so the change log written by its post_save
+    receiver commits or rolls back together with the row. Deletes already run in one.
+    """
+    def save(self, *args, **kwargs):
+        """ Saves the row and sends post_save inside the same transaction. """
+        kwargs.update(zip(SAVE_PARAMETERS, args))
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(**kwargs)
+
+
+class LivePostManager(models.Manager):
+    """ Leaves out the soft deleted posts, ``Post.all_objects`` still has them. """
+    def get_queryset(self):
+        """ Only the posts without ``deleted_at``. """
+        return super().get_queryset().filter(deleted_at=None)
+
+
+class PostRowQuerySet(models.QuerySet):
+    """ QuerySet of the rows belonging to a post, which stay until the post is purged. """
+    def of_live_posts(self):
+        """ Leaves out the rows of soft deleted posts. """
+        return self.filter(post__deleted_at=None)
+
 
 # Create your models here.
-class Post(TimeStampedModel):
+class Post(AtomicSaveMixin, TimeStampedModel):
     """ Blog Post Model """
     posted_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     title = models.CharField(max_length=100)
     content = models.TextField()
     image = models.ImageField(upload_to='images/posts/', blank=True)
     isBlocked = models.BooleanField(default=False)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, default='')
+    word_count = models.PositiveIntegerField(default=0)
+    reading_time = models.PositiveIntegerField(default=0, help_text='estimated reading time in minutes')
+    comment_count = models.PositiveIntegerField(default=0, help_text='comments and replies, kept by signals')
+    view_count = models.PositiveBigIntegerField(default=0, help_text='flushed by blog_posts.tracking')
+    unique_viewers = models.PositiveIntegerField(default=0, help_text='estimated from viewers_sketch')
+    viewers_sketch = models.BinaryField(default=b'', editable=False, help_text='HyperLogLog sketch of the viewers')
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                      help_text='soft deleted, purged in the background by blog_posts.purge')
+
+    objects = LivePostManager()
+    all_objects = models.Manager()
+
+    COUNTER_FIELDS = ('comment_count', 'view_count', 'unique_viewers', 'viewers_sketch')
+
+    class Meta(TimeStampedModel.Meta):
+        """
+        Meta class for the indexes used by incremental exports, the author summaries
+        and the purge of the soft deleted posts.
+        """
+        indexes = [
+            models.Index(fields=['modified']),
+            models.Index(fields=['posted_by', '-created']),
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name='post_deleted_idx'),
+        ]
 
     def __str__(self):
         """ Overrides the str method to return the title of the post """
         return f'{self.title}'
 
+    def save(self, *args, **kwargs):
+        """
+        Keeps the excerpt, word count and reading time in sync with the content, recomputed
+        only when the content is saved. Updates leave out the counters maintained in SQL and
+        ``deleted_at``, so a stale instance never overwrites them nor brings back a soft
+        deleted post.
+        """
+        kwargs.update(zip(SAVE_PARAMETERS, args))
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped = {*self.COUNTER_FIELDS, 'deleted_at', *self.get_deferred_fields()}
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.attname not in skipped]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.refresh_text_stats()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'excerpt', 'word_count', 'reading_time'}
+        super().save(**kwargs)
+
+    def refresh_text_stats(self):
+        """ Computes the excerpt, word count and reading time from the content. """
+        self.excerpt, self.word_count, self.reading_time = get_text_stats(self.content)
+
+    @classmethod
+    def annotate_my_vote(cls, queryset, user):
+        """
+        Annotates the posts with ``viewer_upvote``, the upvote flag of the vote of ``user``
+        on each of them, None when they have not voted. A single subquery for the page.
+        """
+        if user is None or not user.is_authenticated:
+            return queryset.annotate(viewer_upvote=Value(None, output_field=BooleanField()))
+        votes = Vote.objects.filter(post=OuterRef('pk'), user=user).values('upvote')[:1]
+        return queryset.annotate(viewer_upvote=Subquery(votes, output_field=BooleanField()))
+
     @property
     def total_votes(self):
         """
@@ -63,22 +157,25 @@ class Post(TimeStampedModel):
 class Tag(TimeStampedModel):
     """ Model to store the tags """
     name = models.CharField(max_length=20)
+    usage_count = models.PositiveIntegerField(default=0, help_text='assigned tags, kept by signals')
 
     def __str__(self):
         """ display the name of the tag """
         return f'{self.name}'
 
 
-class AssignedTag(TimeStampedModel):
+class AssignedTag(AtomicSaveMixin, TimeStampedModel):
     """ Model to store the tags associated with the post """
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='assigned_tags')
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='assigned_tags')
 
+    objects = PostRowQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.post.title} - {self.tag.name}'
 
 
-class Comment(TimeStampedModel):
+class Comment(AtomicSaveMixin, TimeStampedModel):
     """ Model to save data of Comments on Blog Posts."""
     parent = models.ForeignKey('self', blank=True, null=True, related_name='reply', on_delete=models.CASCADE)
     post = models.ForeignKey(Post, related_name='comment', on_delete=models.CASCADE)
@@ -87,6 +184,15 @@ class Comment(TimeStampedModel):
         User, related_name='comment',
         on_delete=models.CASCADE, null=True
     )
+    reply_count = models.PositiveIntegerField(default=0, help_text='kept by signals')
+
+    objects = PostRowQuerySet.as_manager()
+
+    class Meta(TimeStampedModel.Meta):
+        """
+        Meta class for the index used by incremental exports.
+        """
+        indexes = [models.Index(fields=['modified'])]
 
     def __str__(self):
         """ Overrides the str method to return the content of the comment """
@@ -98,40 +204,146 @@ class Comment(TimeStampedModel):
         """
         return Comment.objects.filter(parent=self)
 
+    @classmethod
+    def reply_previews(cls, parent_ids, size):
+        """
+        Returns the first ``size`` replies of each parent comment, in a single query.
+
+        The replies are ranked per parent by a window function, which can't be filtered
+        on directly, so the ranking query is wrapped as a subquery on the rank.
+        """
+        ranked = cls.objects.filter(parent_id__in=parent_ids).annotate(
+            reply_rank=Window(RowNumber(), partition_by=F('parent_id'), order_by=F('id').asc())
+        ).values('id', 'reply_rank')
+        sql, params = ranked.query.sql_with_params()
+        first_replies = RawSQL(f'SELECT ranked.id FROM ({sql}) ranked WHERE ranked.reply_rank <= %s', (*params, size))
+        return cls.objects.filter(id__in=first_replies).order_by('parent_id', 'id')
+
     @property
     def is_parent(self):
         """ Checks whether a Comment is a Parent Comment. """
         return False if self.parent else True
 
 
-class Report(TimeStampedModel):
+class Report(AtomicSaveMixin, TimeStampedModel):
     """ Model to store complaints/reports on posts. """
     type = models.CharField(max_length=50, choices=REPORT_CHOICES, default='spam')
     post = models.ForeignKey(Post, related_name='reports', on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    reported_by = models.ForeignKey(User, related_name='reports', on_delete=models.CASCADE)
+    reported_by = models.ForeignKey(User, related_name='reports', on_delete=models.CASCADE, null=True, blank=True,
+                                    help_text='empty for the reports filed automatically, e.g. of duplicates')
+
+    objects = PostRowQuerySet.as_manager()
 
     def __str__(self):
-        return f'Report Type: {self.type}, Post: {self.post.title}, Reported by: {self.reported_by.username}'
+        reporter = self.reported_by.username if self.reported_by_id else 'automatic'
+        return f'Report Type: {self.type}, Post: {self.post.title}, Reported by: {reporter}'
 
     class Meta:
         """
         Meta class for unique_together relationship.
         """
         unique_together = ('post', 'reported_by')
+        indexes = [models.Index(fields=['modified'])]
 
 
-class Vote(TimeStampedModel):
+class Vote(AtomicSaveMixin, TimeStampedModel):
     """ Model to save data of Votes on Blog Posts. """
     upvote = models.BooleanField(default=False)
     user = models.ForeignKey(User, related_name='user_votes', on_delete=models.CASCADE)
     post = models.ForeignKey(Post, related_name='post_votes', on_delete=models.CASCADE)
 
+    objects = PostRowQuerySet.as_manager()
+
     class Meta:
         """
         Meta class for unique_together relationship.
         """
         unique_together = ('user', 'post')
+        indexes = [models.Index(fields=['modified']), models.Index(fields=['post', 'created'])]
 
     def __str__(self):
         return f'vote: {self.user.username} - {self.post.title}'
+
+
+class VoteRollup(models.Model):
+    """
+    Up and down votes of a post per hour of vote creation, kept by signals.
+    Serves the vote summaries without scanning the votes.
+    """
+    post = models.ForeignKey(Post, related_name='vote_rollups', on_delete=models.CASCADE)
+    bucket = models.DateTimeField(help_text='start of the hour')
+    upvotes = models.PositiveIntegerField(default=0)
+    downvotes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        """
+        Meta class for unique_together relationship.
+        """
+        unique_together = ('post', 'bucket')
+
+    def __str__(self):
+        return f'{self.post_id} @ {self.bucket}: +{self.upvotes} -{self.downvotes}'
+
+
+class AuthorStats(models.Model):
+    """
+    Aggregates of the posts of a user, kept by signals and the bulk writes.
+    Serves users/<username>/summary/ without counting the posts, votes and comments.
+    """
+    user = models.OneToOneField(User, primary_key=True, related_name='author_stats', on_delete=models.CASCADE)
+    post_count = models.PositiveIntegerField(default=0)
+    total_votes = models.IntegerField(default=0, help_text='upvotes minus downvotes received on the posts')
+    comment_count = models.PositiveIntegerField(default=0, help_text='comments and replies received on the posts')
+
+    class Meta:
+        """
+        Meta class for the plural name.
+        """
+        verbose_name_plural = 'author stats'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_count} posts, {self.total_votes} votes, {self.comment_count} comments'
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only log of the writes to posts, comments, votes, reports and assigned tags.
+    Its id is the cursor of the changes/ delta feed.
+    """
+    feed = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.id}: {"delete" if self.deleted else "upsert"} {self.feed} {self.object_id}'
+
+
+class PostSignature(models.Model):
+    """
+    MinHash signature of the content of a post, see blog_posts.minhash. Its band keys
+    are indexed in LSHBucket to find the near-duplicates of a post.
+    """
+    post = models.OneToOneField(Post, primary_key=True, related_name='signature', on_delete=models.CASCADE)
+    signature = models.BinaryField(help_text='MinHash values, uint32 each')
+
+    def __str__(self):
+        return f'Signature of post {self.post_id}'
+
+
+class LSHBucket(models.Model):
+    """ Band key of a post signature. Posts sharing a key of the same band are duplicate candidates. """
+    post = models.ForeignKey(Post, related_name='lsh_buckets', on_delete=models.CASCADE)
+    band = models.PositiveSmallIntegerField()
+    key = models.BigIntegerField()
+
+    class Meta:
+        """
+        Meta class for unique_together relationship and the index of the candidate lookups.
+        """
+        unique_together = ('post', 'band')
+        indexes = [models.Index(fields=['key'])]
+
+    def __str__(self):
+        return f'{self.post_id} band {self.band}: {self.key}'
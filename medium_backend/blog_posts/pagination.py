@@ -0,0 +1,22 @@
+""" Pagination classes of the blog_posts api """
+from base64 import b64encode
+from urllib import parse
+
+from rest_framework.pagination import CursorPagination
+
+from blog_posts.constant import REPLY_PAGE_SIZE
+
+
+class ReplyCursorPagination(CursorPagination):
+    """ Keyset pagination of the replies of a comment, oldest first. """
+    page_size = REPLY_PAGE_SIZE
+    ordering = 'id'
+
+    @staticmethod
+    def encode_position(position):
+        """
+        Returns the cursor continuing after ``position``, in the format read by
+        ``decode_cursor()``. Used to hand out the cursor of the inline reply previews.
+        """
+        querystring = parse.urlencode({'p': position})
+        return b64encode(querystring.encode('ascii')).decode('ascii')
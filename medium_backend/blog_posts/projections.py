@@ -0,0 +1,280 @@
+""" Model-free projections used to serve the list endpoints of the blog_posts api """
+from collections import defaultdict
+
+from django.db.models import Count, Q
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from blog_posts.constant import REPLY_PREVIEW_SIZE
+from blog_posts.models import AssignedTag, Comment, Post, Vote
+from blog_posts.pagination import ReplyCursorPagination
+from blog_posts.serializer import (CommentSerializer, PostSerializer,
+                                   VoteSerializer)
+from blog_posts.utils import get_vote_state, in_chunks
+
+URL_LOOKUP_PLACEHOLDER = '__pk__'
+
+
+class BaseProjection:
+    """
+    Builds the same representation as a serializer, from plain ``values()`` rows.
+
+    The serializers stay the source of truth for the response shape: the projected
+    fields are the ones the ``serializer_class`` keeps for the request. Each field is
+    read from the row columns listed in ``field_columns``, through ``get_<field>()``
+    when it needs formatting.
+    """
+    serializer_class = None
+    field_columns = {}
+
+    def __init__(self, context=None):
+        """ Keeps the serializer context, the request is needed for absolute urls. """
+        self.context = context or {}
+        self.request = self.context.get('request')
+        self.fields = list(self.serializer_class(context=self.context).fields)
+        self.datetime_field = serializers.DateTimeField()
+
+    def get_columns(self):
+        """ Returns the columns to select for the projected fields. """
+        columns = {'id'}
+        for name in self.fields:
+            columns.update(self.field_columns.get(name, ()))
+        return sorted(columns)
+
+    def represent(self, rows):
+        """ Represents every row with the projected fields, in the serializer order. """
+        getters = [
+            (name, getattr(self, f'get_{name}', None) or (lambda row, name=name: row[name]))
+            for name in self.fields
+        ]
+        return [{name: getter(row) for name, getter in getters} for row in rows]
+
+    def project(self, queryset):
+        """ Returns the list representation of the queryset. """
+        return self.represent(queryset.values(*self.get_columns()))
+
+    def datetime(self, value):
+        """ Formats a datetime exactly like the serializers DateTimeField. """
+        return self.datetime_field.to_representation(value)
+
+    def get_created(self, row):
+        """ Creation datetime of the row. """
+        return self.datetime(row['created'])
+
+    def get_modified(self, row):
+        """ Modification datetime of the row. """
+        return self.datetime(row['modified'])
+
+    def file_url(self, model, field_name, name):
+        """ Formats a stored file name exactly like the serializers FileField. """
+        if not name:
+            return None
+        url = model._meta.get_field(field_name).storage.url(name)
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    @staticmethod
+    def user(row, prefix):
+        """ Nested user representation matching the UserSerializer. """
+        if row[f'{prefix}_id'] is None:
+            return None
+        return {
+            'id': row[f'{prefix}_id'],
+            'username': row[f'{prefix}__username'],
+            'email': row[f'{prefix}__email'],
+        }
+
+
+class PostProjection(BaseProjection):
+    """ Projection matching the output of the PostSerializer. """
+    serializer_class = PostSerializer
+    field_columns = {
+        'title': ('title',),
+        'image': ('image',),
+        'content': ('content',),
+        'excerpt': ('excerpt',),
+        'word_count': ('word_count',),
+        'reading_time': ('reading_time',),
+        'posted_by': ('posted_by_id', 'posted_by__username', 'posted_by__email'),
+        'my_vote': ('viewer_upvote',),
+        'comment_count': ('comment_count',),
+        'view_count': ('view_count',),
+        'unique_viewers': ('unique_viewers',),
+        'created': ('created',),
+        'modified': ('modified',),
+    }
+
+    def project(self, queryset):
+        """ Returns the list representation of the posts queryset. """
+        if 'my_vote' in self.fields and 'viewer_upvote' not in queryset.query.annotations:
+            queryset = Post.annotate_my_vote(queryset, getattr(self.request, 'user', None))
+        rows = list(queryset.values(*self.get_columns()))
+        post_ids = [row['id'] for row in rows]
+        self.tags = self.get_assigned_tags_by_post(post_ids) if 'assigned_tags' in self.fields else {}
+        self.votes = self.get_total_votes_by_post(post_ids) if 'total_votes' in self.fields else {}
+        return self.represent(rows)
+
+    def get_image(self, row):
+        """ Absolute url of the post image. """
+        return self.file_url(Post, 'image', row['image'])
+
+    def get_posted_by(self, row):
+        """ Author of the post. """
+        return {
+            'id': row['posted_by_id'],
+            'username': row['posted_by__username'],
+            'email': row['posted_by__email'],
+        }
+
+    def get_my_vote(self, row):
+        """ Vote of the current user on the post. """
+        return get_vote_state(row['viewer_upvote'])
+
+    def get_assigned_tags(self, row):
+        """ Tags of the post. """
+        return self.tags.get(row['id'], [])
+
+    def get_total_votes(self, row):
+        """ Upvotes minus downvotes of the post. """
+        return self.votes.get(row['id'], 0)
+
+    @staticmethod
+    def get_assigned_tags_by_post(post_ids):
+        """ Returns the assigned tags of each post, with the tag names already joined. """
+        tags = defaultdict(list)
+        for chunk in in_chunks(post_ids):
+            assigned_tags = AssignedTag.objects.filter(post_id__in=chunk).order_by('post_id', 'id')
+            for post_id, tag_id, name in assigned_tags.values_list('post_id', 'tag_id', 'tag__name'):
+                tags[post_id].append({'id': tag_id, 'name': name})
+        return tags
+
+    @staticmethod
+    def get_total_votes_by_post(post_ids):
+        """ Returns upvotes minus downvotes of each post, aggregated in SQL. """
+        votes = {}
+        for chunk in in_chunks(post_ids):
+            totals = Vote.objects.filter(post_id__in=chunk).order_by().values('post_id').annotate(
+                total=Count('id', filter=Q(upvote=True)) - Count('id', filter=Q(upvote=False))
+            )
+            votes.update((total['post_id'], total['total']) for total in totals)
+        return votes
+
+
+class CommentProjection(BaseProjection):
+    """ Projection matching the output of the CommentSerializer. """
+    serializer_class = CommentSerializer
+    field_columns = {
+        'parent': ('parent_id',),
+        'post': ('post_id', 'post__title'),
+        'content': ('content',),
+        'created': ('created',),
+        'modified': ('modified',),
+        'owner': ('owner_id', 'owner__username', 'owner__email'),
+        'reply_count': ('reply_count',),
+        'reply': ('parent_id',),
+        'reply_cursor': ('parent_id',),
+    }
+    reply_columns = ('id', 'parent_id', 'content', 'owner_id', 'owner__username', 'owner__email',
+                     'created', 'modified')
+
+    def project(self, queryset):
+        """ Returns the list representation of the comments queryset. """
+        rows = list(queryset.values(*self.get_columns()))
+        self.replies = {}
+        if 'reply' in self.fields or 'reply_cursor' in self.fields:
+            self.replies = self.get_replies_by_parent([row['id'] for row in rows if row['parent_id'] is None])
+        return self.represent(rows)
+
+    def get_parent(self, row):
+        """ Id of the parent comment. """
+        return row['parent_id']
+
+    def get_post(self, row):
+        """ Post the comment belongs to. """
+        return {'id': row['post_id'], 'title': row['post__title']}
+
+    def get_owner(self, row):
+        """ Author of the comment. """
+        return self.user(row, 'owner')
+
+    def get_reply(self, row):
+        """ First replies of a parent comment, None for a reply. """
+        return self.replies.get(row['id'], [])[:REPLY_PREVIEW_SIZE] if row['parent_id'] is None else None
+
+    def get_reply_cursor(self, row):
+        """ Cursor of the replies after the inline ones, None when they are all inline. """
+        replies = self.replies.get(row['id'], [])
+        if row['parent_id'] is None and len(replies) > REPLY_PREVIEW_SIZE:
+            return ReplyCursorPagination.encode_position(replies[REPLY_PREVIEW_SIZE - 1]['id'])
+        return None
+
+    def get_replies_by_parent(self, parent_ids):
+        """
+        Returns the first replies of each parent comment, matching the ReplySerializer,
+        plus one telling whether more follow. One window-function query per chunk.
+        """
+        replies = defaultdict(list)
+        for chunk in in_chunks(parent_ids):
+            rows = Comment.reply_previews(chunk, REPLY_PREVIEW_SIZE + 1)
+            for row in rows.values(*self.reply_columns):
+                replies[row['parent_id']].append(self.represent_reply(row))
+        return replies
+
+    def represent_reply(self, row):
+        """ Representation of a single reply row. """
+        return {
+            'parent': row['parent_id'],
+            'id': row['id'],
+            'content': row['content'],
+            'owner': self.user(row, 'owner'),
+            'created': self.datetime(row['created']),
+            'modified': self.datetime(row['modified']),
+        }
+
+
+class VoteProjection(BaseProjection):
+    """ Projection matching the output of the VoteSerializer. """
+    serializer_class = VoteSerializer
+    field_columns = {
+        'user': ('user_id', 'user__username'),
+        'post': ('post_id', 'post__title'),
+        'upvote': ('upvote',),
+        'created': ('created',),
+        'modified': ('modified',),
+    }
+
+    def project(self, queryset):
+        """ Returns the list representation of the votes queryset. """
+        self.url = reverse('vote-detail', kwargs={'pk': URL_LOOKUP_PLACEHOLDER},
+                           request=self.request, format=self.context.get('format'))
+        return super().project(queryset)
+
+    def get_url(self, row):
+        """ Hyperlink to the vote. """
+        return self.url.replace(URL_LOOKUP_PLACEHOLDER, str(row['id']))
+
+    def get_user(self, row):
+        """ Voter. """
+        return {'id': row['user_id'], 'username': row['user__username']}
+
+    def get_post(self, row):
+        """ Voted post. """
+        return {'id': row['post_id'], 'title': row['post__title']}
+
+
+class ProjectedListModelMixin:
+    """
+    List a queryset through the view's ``projection_class`` instead of its serializer.
+    """
+    projection_class = None
+
+    def list(self, request, *args, **kwargs):
+        """ Serves the list action from the projection, paginated like the ListModelMixin. """
+        queryset = self.filter_queryset(self.get_queryset())
+        projection = self.projection_class(context=self.get_serializer_context())
+
+        page = self.paginate_queryset(queryset.values_list('pk', flat=True))
+        if page is not None:
+            return self.get_paginated_response(projection.project(queryset.filter(pk__in=list(page))))
+
+        return Response(projection.project(queryset))
@@ -0,0 +1,124 @@
+"""
+Soft deletion of posts and the background purge of their rows.
+
+Deleting a post through the api only stamps its ``deleted_at``: the default manager
+and ``of_live_posts()`` leave it and its rows out of every read path right away, and
+the author stats are uncounted then. The purge_deleted_post job deletes the rows
+afterwards, table by table, in chunks of PURGE_CHUNK_SIZE committed one by one so
+no transaction holds the write lock for long.
+
+Each chunk is a plain DELETE of the selected ids. Django's collector, which loads
+every vote, report and comment tree of the post into Python to cascade and send
+signals, is bypassed, so the purge writes the change log and tag usage the signals
+would. Comments go newest first, replies before the comments they answer, and the
+replies left on other posts are deleted with the comments they answer. An interrupted
+purge carries on from where it stopped when run again.
+"""
+import logging
+from collections import Counter
+from functools import partial
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from blog_posts.autocomplete import tag_index
+from blog_posts.changes import FEED_NAMES, log_changes
+from blog_posts.constant import PURGE_CHUNK_SIZE
+from blog_posts.models import (AssignedTag, AuthorStats, Comment, LSHBucket,
+                               Post, PostSignature, Tag, Vote)
+from blog_posts.related import related_index
+from blog_posts.utils import increment
+
+logger = logging.getLogger(__name__)
+
+
+def soft_delete_post(post):
+    """
+    Hides the post and uncounts it from the stats of its author, returns whether it
+    was live. Its tag assignments are logged deleted, for the related posts indexes of
+    every process to drop them. Its rows are left to purge_post.
+    """
+    with transaction.atomic():
+        if not Post.objects.filter(pk=post.pk).update(deleted_at=timezone.now()):
+            return False
+        author_id, comment_count = Post.all_objects.filter(pk=post.pk).values_list('posted_by_id', 'comment_count').get()
+        votes = Vote.objects.filter(post_id=post.pk).aggregate(
+            upvotes=Count('pk', filter=Q(upvote=True)), downvotes=Count('pk', filter=Q(upvote=False))
+        )
+        increment(AuthorStats, author_id, 'post_count', -1)
+        increment(AuthorStats, author_id, 'total_votes', votes['downvotes'] - votes['upvotes'], floor=None)
+        increment(AuthorStats, author_id, 'comment_count', -comment_count)
+        # Out of the duplicate candidates right away, the index is cheap to drop.
+        PostSignature.objects.filter(post_id=post.pk).delete()
+        LSHBucket.objects.filter(post_id=post.pk).delete()
+        log_changes(Post, [post.pk], deleted=True)
+        log_changes(AssignedTag, list(AssignedTag.objects.filter(post_id=post.pk).values_list('pk', flat=True)),
+                    deleted=True)
+        transaction.on_commit(related_index.expire)
+    return True
+
+
+def delete_rows(model, ids):
+    """ Deletes rows by primary key in a single statement, without collecting or signals. """
+    quote_name = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {quote_name(model._meta.db_table)} '
+                       f'WHERE {quote_name(model._meta.pk.column)} IN ({placeholders})', ids)
+
+
+def uncount_rows(model, ids):
+    """ What the delete signals would do for the rows: log them, and give back the tag usage. """
+    if model in FEED_NAMES:
+        log_changes(model, ids, deleted=True)
+    if model is AssignedTag:
+        uses = Counter(AssignedTag.objects.filter(pk__in=ids).values_list('tag_id', flat=True))
+        for tag_id, count in uses.items():
+            increment(Tag, tag_id, 'usage_count', -count)
+            transaction.on_commit(partial(tag_index.count, tag_id, -count))
+
+
+def delete_foreign_replies(post_id, comment_ids):
+    """
+    Deletes the replies made on other posts to the comments about to be purged, which
+    older versions of the api accepted. Their own posts are live, so they go through
+    the ORM: the collector follows their replies and the signals uncount them.
+    """
+    Comment.objects.filter(parent_id__in=comment_ids).exclude(post_id=post_id).delete()
+
+
+def log_progress(post_id, model, purged, total):
+    """ Default progress report of purge_post. """
+    logger.info('Purged %s/%s %s of post %s', purged, total, model._meta.verbose_name_plural, post_id)
+
+
+def purge_post(post_id, chunk_size=PURGE_CHUNK_SIZE, progress=log_progress):
+    """
+    Deletes the rows of a soft deleted post, then the post itself, in chunks of at most
+    ``chunk_size`` rows per transaction. Calls ``progress(post_id, model, purged, total)``
+    after each chunk and returns the number of rows deleted, 0 for a live post.
+    """
+    if not Post.all_objects.filter(pk=post_id, deleted_at__isnull=False).exists():
+        return 0
+    deleted = 0
+    for relation in Post._meta.related_objects:
+        model = relation.related_model
+        queryset = model._base_manager.filter(**{relation.field.name: post_id}).order_by('-pk')
+        total, purged = queryset.count(), 0
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+                if not ids:
+                    break
+                if model is Comment:
+                    delete_foreign_replies(post_id, ids)
+                uncount_rows(model, ids)
+                delete_rows(model, ids)
+            purged += len(ids)
+            progress(post_id, model, purged, total)
+        deleted += purged
+    with transaction.atomic():
+        delete_rows(Post, [post_id])
+    progress(post_id, Post, 1, 1)
+    return deleted + 1
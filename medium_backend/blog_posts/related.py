@@ -0,0 +1,124 @@
+"""
+Related posts, scored by the tags they share weighted by how rare each tag is.
+
+The process wide ``related_index`` keeps the post-tag matrix in memory as a SciPy
+sparse matrix, each row holding the TF-IDF weights of a post's tags, normalized to
+unit length. The relatedness of two posts is the cosine of their rows, so one sparse
+product scores a post against all the others. The top scores of a post are kept
+until the tags change.
+
+The index is loaded from AssignedTag on first use, then follows the assigned_tags
+feed of the change log: at most every RELATED_POSTS_SYNC_INTERVAL seconds it applies
+the logged assignments and removals, at once for the writes of its own process, and
+rebuilds the matrix from memory without reading AssignedTag again.
+
+NumPy and SciPy are only imported once related posts are first requested.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from blog_posts.changes import get_head, read_changes
+from blog_posts.models import AssignedTag
+
+
+class RelatedPostsIndex:
+    """ In-memory TF-IDF matrix of the post tags with a cache of the top related posts. """
+
+    def __init__(self):
+        """ Nothing loaded until the first lookup. """
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """ Forgets the index, the next lookup loads it again. """
+        self.cursor = None
+        self.synced_at = 0
+        self.assignments = {}
+        self.matrix = None
+        self.post_ids = None
+        self.rows = {}
+        self.top = {}
+
+    def expire(self):
+        """ Makes the next lookup apply the latest tag changes. """
+        self.synced_at = 0
+
+    def get_related(self, post_id, limit):
+        """ Returns up to ``limit`` (post id, score) of the posts related to the post, best first. """
+        with self.lock:
+            if self.cursor is None:
+                self.load()
+            elif time.monotonic() - self.synced_at >= settings.RELATED_POSTS_SYNC_INTERVAL:
+                self.sync()
+            if post_id not in self.top:
+                self.top[post_id] = self.score(post_id, settings.RELATED_POSTS_MAX)
+            return self.top[post_id][:limit]
+
+    def load(self):
+        """ Reads the tag assignments of the live posts, from the current change log cursor on. """
+        # Read the cursor first: changes logged meanwhile are applied again, never missed.
+        cursor = get_head()
+        self.assignments = {
+            assignment_id: (post_id, tag_id)
+            for assignment_id, post_id, tag_id in AssignedTag.objects.of_live_posts().values_list('id', 'post_id', 'tag_id').iterator()
+        }
+        self.cursor, self.synced_at = cursor, time.monotonic()
+        self.rebuild()
+
+    def sync(self):
+        """ Applies the tag assignments and removals logged since the last sync. """
+        changed = False
+        while True:
+            page = read_changes(self.cursor, ['assigned_tags'])
+            for change in page['changes']:
+                if change['action'] == 'delete':
+                    changed |= self.assignments.pop(change['id'], None) is not None
+                else:
+                    self.assignments[change['id']] = (change['data']['post'], change['data']['tag'])
+                    changed = True
+            self.cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.synced_at = time.monotonic()
+        if changed:
+            self.rebuild()
+
+    def rebuild(self):
+        """ Builds the normalized TF-IDF matrix of the assignments and drops the cached scores. """
+        import numpy as np
+        from scipy import sparse
+
+        self.top = {}
+        pairs = np.array(sorted(set(self.assignments.values())), dtype=np.int64).reshape(-1, 2)
+        if not len(pairs):
+            self.matrix, self.post_ids, self.rows = None, None, {}
+            return
+        self.post_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+        tag_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+        tags = sparse.csr_matrix((np.ones(len(pairs)), (rows, columns)), shape=(len(self.post_ids), len(tag_ids)))
+        # Smoothed IDF: a tag on every post still counts, a rare one counts the most.
+        idf = np.log((1 + len(self.post_ids)) / (1 + np.bincount(columns))) + 1
+        weights = sparse.csr_matrix(tags.multiply(idf[np.newaxis, :]))
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        self.matrix = sparse.csr_matrix(sparse.diags(1 / norms) @ weights)
+        self.rows = {int(post_id): row for row, post_id in enumerate(self.post_ids)}
+
+    def score(self, post_id, limit):
+        """ The ``limit`` best (post id, cosine) of the post, ties going to the newer post. """
+        import numpy as np
+
+        row = self.rows.get(post_id)
+        if row is None:
+            return []
+        scores = (self.matrix @ self.matrix[row].T).toarray().ravel()
+        scores[row] = 0
+        candidates = np.flatnonzero(scores > 1e-9)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        order = candidates[np.lexsort((-self.post_ids[candidates], -scores[candidates]))]
+        return [(int(self.post_ids[index]), round(float(scores[index]), 6)) for index in order]
+
+
+related_index = RelatedPostsIndex()
@@ -1,9 +1,13 @@
 """ Serializer declaration for blog posts app """
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
-from user_accounts.serializer import UserSerializer
+from user_accounts.serializer import ProfileSerializer, UserSerializer
 
-from blog_posts.models import Comment, Post, Report, Vote
+from blog_posts.constant import REPLY_PREVIEW_SIZE
+from blog_posts.models import AuthorStats, Comment, Post, Report, Vote
+from blog_posts.pagination import ReplyCursorPagination
+from blog_posts.utils import get_vote_state
+from medium_backend.fieldsets import SparseFieldsetMixin
 
 
 class ReplySerializer(serializers.ModelSerializer):
@@ -22,9 +26,16 @@ class ReplySerializer(serializers.ModelSerializer):
 class CommentSerializer(serializers.ModelSerializer):
     """
     Serializes the data of a comment.
+
+    A top-level comment embeds its first replies only, ``reply_cursor`` continues
+    from the last of them on the comment/<id>/replies/ endpoint.
     """
     owner = UserSerializer(read_only=True)
+    post = serializers.PrimaryKeyRelatedField(queryset=Post.objects.all())
+    parent = serializers.PrimaryKeyRelatedField(queryset=Comment.objects.of_live_posts(), required=False,
+                                                allow_null=True)
     reply = SerializerMethodField()
+    reply_cursor = SerializerMethodField()
 
     class Meta:
         """
@@ -32,8 +43,32 @@ class CommentSerializer(serializers.ModelSerializer):
         """
         model = Comment
         fields = [
-            'parent', 'id', 'post', 'content', 'created', 'modified', 'owner', 'reply'
+            'parent', 'id', 'post', 'content', 'created', 'modified', 'owner', 'reply_count', 'reply',
+            'reply_cursor',
         ]
+        read_only_fields = ('reply_count',)
+
+    def validate(self, attrs):
+        """ A reply belongs to the post of the comment it answers. """
+        post = attrs.get('post', getattr(self.instance, 'post', None))
+        parent = attrs.get('parent', getattr(self.instance, 'parent', None))
+        if parent is not None and parent.post_id != post.pk:
+            raise serializers.ValidationError({'parent': 'The parent comment belongs to another post.'})
+        return attrs
+
+    def __init__(self, *args, **kwargs):
+        """ Keeps the reply previews read by both the reply and reply_cursor fields. """
+        super().__init__(*args, **kwargs)
+        self.reply_previews = {}
+
+    def get_reply_preview(self, obj):
+        """
+        Returns the first replies of the comment, plus one telling whether more follow.
+        """
+        if obj.pk not in self.reply_previews:
+            replies = obj.children().select_related('owner').order_by('id')
+            self.reply_previews[obj.pk] = list(replies[:REPLY_PREVIEW_SIZE + 1])
+        return self.reply_previews[obj.pk]
 
     def get_reply(self, obj):
         """
@@ -41,12 +76,20 @@ class CommentSerializer(serializers.ModelSerializer):
         """
         if obj.is_parent:
             return ReplySerializer(
-                obj.children(), many=True,
+                self.get_reply_preview(obj)[:REPLY_PREVIEW_SIZE], many=True,
                 context={'request': self.context['request']}
             ).data
 
         return None
 
+    def get_reply_cursor(self, obj):
+        """
+        Cursor of the replies after the inline ones, None when they are all inline.
+        """
+        if obj.is_parent and len(self.get_reply_preview(obj)) > REPLY_PREVIEW_SIZE:
+            return ReplyCursorPagination.encode_position(self.get_reply_preview(obj)[REPLY_PREVIEW_SIZE - 1].id)
+        return None
+
     def update(self, instance, validated_data):
         """" Allow to update only the content of a comment. """
         instance.content = validated_data.get('content', instance.content)
@@ -65,33 +108,72 @@ class CommentSerializer(serializers.ModelSerializer):
         return representation
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """ Serializes the data of a posts """
+    my_vote = SerializerMethodField()
+
     class Meta:
         """ Meta subclass to define fields. """
         model = Post
-        fields = ['id', 'title', 'image', 'content', 'posted_by', 'assigned_tags',
-                    'total_votes' ,'created', 'modified']
-        read_only_fields = ('posted_by', 'assigned_tags', 'total_votes', 'created', 'modified')
+        fields = ['id', 'title', 'image', 'content', 'excerpt', 'word_count', 'reading_time', 'posted_by',
+                    'assigned_tags', 'total_votes', 'my_vote', 'comment_count', 'view_count', 'unique_viewers',
+                    'created', 'modified']
+        read_only_fields = ('excerpt', 'word_count', 'reading_time', 'posted_by', 'assigned_tags', 'total_votes',
+                            'comment_count', 'view_count', 'unique_viewers', 'created', 'modified')
         extra_kwargs = {
             'created_at': {'read_only': True},
             'updated_at': {'read_only': True},
         }
+        sparse_columns = {
+            'posted_by': ('posted_by__id', 'posted_by__username', 'posted_by__email'),
+        }
+
+    def get_my_vote(self, obj):
+        """
+        Vote of the current user on the post: 'up', 'down' or 'none'.
+        Read from the viewer_upvote annotation of the viewset queryset when present.
+        """
+        if hasattr(obj, 'viewer_upvote'):
+            return get_vote_state(obj.viewer_upvote)
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return get_vote_state(None)
+        return get_vote_state(obj.post_votes.filter(user=request.user).values_list('upvote', flat=True).first())
 
     def to_representation(self, instance):
         ''' Overrides the default representation of a model instance. '''
         representation = super().to_representation(instance)
-        representation['posted_by'] = {
-            'id': instance.posted_by.id,
-            'username': instance.posted_by.username,
-            'email': instance.posted_by.email,
-        }
-        representation['assigned_tags'] = [
-            {'id': tag.tag.id, 'name': tag.tag.name} for tag in instance.assigned_tags.all()
-        ]
+        if 'posted_by' in self.fields:
+            representation['posted_by'] = {
+                'id': instance.posted_by.id,
+                'username': instance.posted_by.username,
+                'email': instance.posted_by.email,
+            }
+        if 'assigned_tags' in self.fields:
+            representation['assigned_tags'] = [
+                {'id': tag.tag.id, 'name': tag.tag.name} for tag in instance.assigned_tags.all()
+            ]
         return representation
     
 
+class TagListField(serializers.ListField):
+    """ List of tag names, also accepting the comma separated string used by the post form. """
+    child = serializers.CharField(max_length=20)
+
+    def to_internal_value(self, data):
+        """ Splits a comma separated string and drops duplicated tags. """
+        if isinstance(data, str):
+            data = [tag for tag in data.split(',') if tag]
+        return list(dict.fromkeys(super().to_internal_value(data)))
+
+
+class PostBatchItemSerializer(serializers.Serializer):
+    """ Validates a single post of a batch creation request. """
+    title = serializers.CharField(max_length=100)
+    content = serializers.CharField(allow_blank=True, trim_whitespace=False)
+    tags = TagListField(required=False, default=list)
+
+
 class ReportSerializer(serializers.ModelSerializer):
     """ Serializes the data of a reports associated with a post. """
     class Meta:
@@ -112,7 +194,8 @@ class ReportSerializer(serializers.ModelSerializer):
             'id': instance.post.id,
             'title': instance.post.title,
         }
-        representation['reported_by'] = {
+        # None for the automatic reports.
+        representation['reported_by'] = instance.reported_by_id and {
             'id': instance.reported_by.id,
             'username': instance.reported_by.username,
             'email': instance.reported_by.email,
@@ -153,3 +236,23 @@ class VoteSerializer(serializers.ModelSerializer):
             'username': instance.user.username,
         }
         return representation
+
+
+class AuthorSummarySerializer(serializers.ModelSerializer):
+    """
+    Serializes the profile and the post aggregates of an author.
+    """
+    user = UserSerializer(read_only=True)
+    profile = SerializerMethodField()
+
+    class Meta:
+        """
+        Meta subclass to define fields.
+        """
+        model = AuthorStats
+        fields = ['user', 'profile', 'post_count', 'total_votes', 'comment_count']
+
+    def get_profile(self, stats):
+        """ Profile of the author, None when they have not created one. """
+        profile = getattr(stats.user, 'profile', None)
+        return ProfileSerializer(profile, context=self.context).data if profile is not None else None
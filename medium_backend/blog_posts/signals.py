@@ -0,0 +1,170 @@
+""" Signal receivers keeping the change log, denormalized counters and rollups of the blog_posts models """
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Subquery
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from blog_posts.autocomplete import tag_index
+from blog_posts.changes import FEED_NAMES
+from blog_posts.live import broker
+from blog_posts.models import (AssignedTag, AuthorStats, ChangeLog, Comment,
+                               Post, Tag, Vote)
+from blog_posts.related import related_index
+from blog_posts.summaries import record_vote
+from blog_posts.utils import increment
+
+
+def get_author(post_id):
+    """ Subquery of the author of a post, to update their stats in the same statement. """
+    return Subquery(Post.objects.filter(pk=post_id).values('posted_by_id'))
+
+
+def get_vote_value(upvote):
+    """ What a vote adds to the total votes. """
+    return 1 if upvote else -1
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    """ Counts a new comment on its post, and on its parent for a reply. """
+    if not created or raw:
+        return
+    increment(Post, instance.post_id, 'comment_count', 1)
+    increment(AuthorStats, get_author(instance.post_id), 'comment_count', 1)
+    if instance.parent_id is not None:
+        increment(Comment, instance.parent_id, 'reply_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    """
+    Uncounts a deleted comment. Deleting a parent sends this signal for each of
+    its cascaded replies as well, so they are uncounted from the post one by one.
+    """
+    increment(Post, instance.post_id, 'comment_count', -1)
+    increment(AuthorStats, get_author(instance.post_id), 'comment_count', -1)
+    if instance.parent_id is not None:
+        increment(Comment, instance.parent_id, 'reply_count', -1)
+
+
+@receiver(post_init, sender=Vote)
+def remember_vote_state(sender, instance, **kwargs):
+    """ Remembers the stored upvote flag, to move the vote between rollups when it flips. """
+    instance.stored_upvote = instance.__dict__.get('upvote')
+
+
+@receiver(post_save, sender=Vote)
+def roll_up_saved_vote(sender, instance, created, raw=False, **kwargs):
+    """
+    Counts a new vote in its hourly rollup and the total votes of the author, or moves
+    a flipped one from down to up.
+    """
+    if raw:
+        return
+    if created:
+        record_vote(instance, instance.upvote, 1)
+        delta = get_vote_value(instance.upvote)
+    elif instance.stored_upvote is not None and instance.stored_upvote != instance.upvote:
+        record_vote(instance, instance.stored_upvote, -1)
+        record_vote(instance, instance.upvote, 1)
+        delta = 2 * get_vote_value(instance.upvote)
+    else:
+        delta = 0
+    if delta:
+        increment(AuthorStats, get_author(instance.post_id), 'total_votes', delta, floor=None)
+    instance.stored_upvote = instance.upvote
+
+
+@receiver(post_delete, sender=Vote)
+def roll_up_deleted_vote(sender, instance, **kwargs):
+    """ Uncounts a deleted vote from its hourly rollup and the total votes of the author. """
+    record_vote(instance, instance.upvote, -1)
+    increment(AuthorStats, get_author(instance.post_id), 'total_votes', -get_vote_value(instance.upvote), floor=None)
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    """ Every user gets the stats row the post, vote and comment writes update. """
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    """ Counts a new post of its author. """
+    if created and not raw:
+        increment(AuthorStats, instance.posted_by_id, 'post_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    """
+    Uncounts a deleted post. Its votes and comments are deleted first by the cascade,
+    their own receivers have uncounted them already.
+    """
+    increment(AuthorStats, instance.posted_by_id, 'post_count', -1)
+
+
+def log_saved_change(sender, instance, raw=False, **kwargs):
+    """ Logs the upsert, in the transaction of the save (see AtomicSaveMixin). """
+    if not raw:
+        ChangeLog.objects.create(feed=FEED_NAMES[sender], object_id=instance.pk)
+
+
+def log_deleted_change(sender, instance, **kwargs):
+    """ Logs the delete, cascaded ones included, in the transaction of the delete. """
+    ChangeLog.objects.create(feed=FEED_NAMES[sender], object_id=instance.pk, deleted=True)
+
+
+for feed_model in FEED_NAMES:
+    post_save.connect(log_saved_change, sender=feed_model)
+    post_delete.connect(log_deleted_change, sender=feed_model)
+
+
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def publish_live_counts(sender, instance, raw=False, **kwargs):
+    """ Tells the live counts broker about the post once the write is committed. """
+    if not raw:
+        transaction.on_commit(partial(broker.publish, instance.post_id))
+
+
+@receiver(post_save, sender=AssignedTag)
+@receiver(post_delete, sender=AssignedTag)
+def expire_related_posts(sender, instance, raw=False, **kwargs):
+    """ Makes the related posts of this process follow its own tag changes right away. """
+    if not raw:
+        transaction.on_commit(related_index.expire)
+
+
+@receiver(post_save, sender=AssignedTag)
+def count_assigned_tag(sender, instance, created, raw=False, **kwargs):
+    """ Counts a new use of the tag, in the database and in the autocomplete index once committed. """
+    if created and not raw:
+        increment(Tag, instance.tag_id, 'usage_count', 1)
+        transaction.on_commit(partial(tag_index.count, instance.tag_id, 1))
+
+
+@receiver(post_delete, sender=AssignedTag)
+def count_removed_tag(sender, instance, **kwargs):
+    """ Uncounts a removed use of the tag. """
+    increment(Tag, instance.tag_id, 'usage_count', -1)
+    transaction.on_commit(partial(tag_index.count, instance.tag_id, -1))
+
+
+@receiver(post_save, sender=Tag)
+def index_saved_tag(sender, instance, created, raw=False, **kwargs):
+    """ Adds a created tag to the autocomplete index, a renamed one makes it reload. """
+    if not raw:
+        transaction.on_commit(partial(tag_index.add_tag, instance.pk, instance.name) if created else tag_index.expire)
+
+
+@receiver(post_delete, sender=Tag)
+def index_deleted_tag(sender, instance, **kwargs):
+    """ Makes the autocomplete index reload without the deleted tag. """
+    transaction.on_commit(tag_index.expire)
@@ -0,0 +1,62 @@
+""" Time-bucketed vote summaries, from the votes or from the hourly rollups """
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest, TruncDay, TruncHour
+from django.utils import timezone
+
+from blog_posts.models import Vote, VoteRollup
+
+VOTE_SUMMARY_BUCKETS = {'hour': TruncHour, 'day': TruncDay}
+
+
+def summarize_votes(post_id, bucket):
+    """ Up and down votes of the post per bucket, counted in SQL over the votes. """
+    return Vote.objects.filter(post_id=post_id).annotate(period=VOTE_SUMMARY_BUCKETS[bucket]('created')).values(
+        'period'
+    ).annotate(
+        upvotes=Count('id', filter=Q(upvote=True)),
+        downvotes=Count('id', filter=Q(upvote=False)),
+    ).order_by('period')
+
+
+def summarize_rollups(post_id, bucket):
+    """ Same summary as summarize_votes(), summed from the hourly rollups. """
+    rollups = VoteRollup.objects.filter(post_id=post_id).exclude(upvotes=0, downvotes=0)
+    return rollups.annotate(period=VOTE_SUMMARY_BUCKETS[bucket]('bucket')).values('period').annotate(
+        upvotes=Sum('upvotes'),
+        downvotes=Sum('downvotes'),
+    ).order_by('period')
+
+
+def rebuild_rollups(post_ids=None, batch_size=1000):
+    """ Recreates the hourly rollups of the posts, of every post by default, from their votes. """
+    votes, rollups = Vote.objects.all(), VoteRollup.objects.all()
+    if post_ids is not None:
+        votes, rollups = votes.filter(post_id__in=post_ids), rollups.filter(post_id__in=post_ids)
+    hours = votes.annotate(period=TruncHour('created')).values('post_id', 'period').annotate(
+        upvotes=Count('id', filter=Q(upvote=True)),
+        downvotes=Count('id', filter=Q(upvote=False)),
+    ).order_by()
+    rollups.delete()
+    return len(VoteRollup.objects.bulk_create([
+        VoteRollup(post_id=hour['post_id'], bucket=hour['period'], upvotes=hour['upvotes'],
+                   downvotes=hour['downvotes'])
+        for hour in hours.iterator()
+    ], batch_size=batch_size))
+
+
+def get_rollup_bucket(created):
+    """ Start of the hour of a vote creation, in the current time zone like TruncHour. """
+    return timezone.localtime(created).replace(minute=0, second=0, microsecond=0)
+
+
+def record_vote(vote, upvote, delta):
+    """
+    Adds ``delta`` up or down votes to the rollup of the vote's post and hour. Removals
+    only update an existing rollup: the ones of a post being deleted are gone already.
+    """
+    rollups = VoteRollup.objects.filter(post_id=vote.post_id, bucket=get_rollup_bucket(vote.created))
+    if delta > 0:
+        rollup, _ = VoteRollup.objects.get_or_create(post_id=vote.post_id, bucket=get_rollup_bucket(vote.created))
+        rollups = VoteRollup.objects.filter(pk=rollup.pk)
+    field = 'upvotes' if upvote else 'downvotes'
+    rollups.update(**{field: Greatest(F(field) + delta, 0)})
@@ -0,0 +1,27 @@
+""" Background jobs of the blog_posts app """
+from django.core.management import call_command
+
+from blog_posts.duplicates import check_duplicates
+from blog_posts.models import Post
+from blog_posts.purge import purge_post
+
+from jobs.queue import task
+
+
+@task
+def reconcile_counts():
+    """ Fixes drift of the comment and reply counters and author stats, see the reconcile_counts command. """
+    call_command('reconcile_counts')
+
+
+@task
+def check_duplicate_posts(post_ids):
+    """ Indexes posts created in bulk and reports their duplicates, like the single creates do. """
+    for post in Post.objects.filter(pk__in=post_ids).only('id', 'posted_by_id', 'content').order_by('id'):
+        check_duplicates(post)
+
+
+@task
+def purge_deleted_post(post_id):
+    """ Deletes the rows of a soft deleted post in chunks, see blog_posts.purge. """
+    purge_post(post_id)
@@ -1,3 +1,1194 @@
-from django.test import TestCase
+""" Tests for the blog_posts api """
+import asyncio
+import csv
+import datetime
+import importlib.util
+import json
+import os
+import random
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from knox.models import AuthToken
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from blog_posts.autocomplete import tag_index
+from blog_posts.bulk import bulk_create_posts
+from blog_posts.constant import (EXCERPT_LENGTH, EXPORT_MAX_CHUNK_SIZE,
+                                 REPLY_PREVIEW_SIZE, WORDS_PER_MINUTE)
+from blog_posts.duplicates import check_duplicates
+from blog_posts.hyperloglog import HyperLogLog
+from blog_posts.live import LIVE_COUNTS_PATH, format_event
+from blog_posts.minhash import (compute_signature, estimate_similarity,
+                                get_shingles)
+from blog_posts.models import (AssignedTag, AuthorStats, ChangeLog, Comment,
+                               Post, Report, Tag, Vote)
+from blog_posts.projections import (CommentProjection, PostProjection,
+                                    VoteProjection)
+from blog_posts.purge import purge_post
+from blog_posts.related import related_index
+from blog_posts.serializer import (CommentSerializer, PostSerializer,
+                                   ReportSerializer, VoteSerializer)
+from blog_posts.tasks import check_duplicate_posts, purge_deleted_post
+from blog_posts.tracking import view_buffer
+from blog_posts.utils import get_text_stats
+from jobs.models import Job
+from medium_backend.asgi import application
+from medium_backend.renderers import JSONEncoder
+from medium_backend.throttling import ScopedTokenBucketThrottle
+
+
+def create_user(username, **extra):
+    """ A user with an example.com email and 'password' as password. """
+    return User.objects.create_user(username, f'{username}@example.com', 'password', **extra)
+
+
+def create_posts(author, count, content=''):
+    """ Posts of the author titled 'Post 0', 'Post 1'... """
+    return [Post.objects.create(posted_by=author, title=f'Post {index}', content=content) for index in range(count)]
+
+
+class ProjectionParityTests(TestCase):
+    """ The list projections must render byte-identical output to the serializers. """
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Seeds posts with tags, votes and a comment tree. """
+        cls.alice = create_user('alice')
+        cls.bob = create_user('bob')
+        python, django = Tag.objects.create(name='python'), Tag.objects.create(name='django')
+
+        cls.post = Post.objects.create(posted_by=cls.alice, title='First', content='Ünïcode body  ')
+        cls.other_post = Post.objects.create(posted_by=cls.bob, title='Second', content='Body',
+                                             image='images/posts/cover.png')
+        Post.objects.create(posted_by=cls.bob, title='Empty', content='')
+        AssignedTag.objects.create(post=cls.post, tag=django)
+        AssignedTag.objects.create(post=cls.post, tag=python)
+        AssignedTag.objects.create(post=cls.other_post, tag=python)
+
+        Vote.objects.create(post=cls.post, user=cls.alice, upvote=True)
+        Vote.objects.create(post=cls.post, user=cls.bob, upvote=False)
+        Vote.objects.create(post=cls.other_post, user=cls.alice, upvote=True)
+
+        parent = Comment.objects.create(post=cls.post, owner=cls.alice, content='Parent')
+        Comment.objects.create(post=cls.post, owner=cls.bob, content='Reply', parent=parent)
+        Comment.objects.create(post=cls.post, owner=None, content='Orphan reply', parent=parent)
+        Comment.objects.create(post=cls.other_post, owner=None, content='Anonymous')
+
+    def setUp(self):
+        """ Serializer context with a request, as built by the viewsets. """
+        request = Request(APIRequestFactory().get('/api/'))
+        self.context = {'request': request, 'format': None, 'view': None}
+
+    def assertSameJSON(self, serializer_data, projected_data):
+        """ Compares the rendered bytes of both representations. """
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(serializer_data), renderer.render(projected_data))
+
+    def test_post_projection(self):
+        """ PostProjection matches PostSerializer. """
+        queryset = Post.objects.all()
+        self.assertSameJSON(
+            PostSerializer(queryset, many=True, context=self.context).data,
+            PostProjection(self.context).project(queryset),
+        )
+
+    def test_comment_projection(self):
+        """ CommentProjection matches CommentSerializer, including nested replies. """
+        queryset = Comment.objects.all()
+        self.assertSameJSON(
+            CommentSerializer(queryset, many=True, context=self.context).data,
+            CommentProjection(self.context).project(queryset),
+        )
+
+    def test_vote_projection(self):
+        """ VoteProjection matches VoteSerializer, including the hyperlinked url. """
+        queryset = Vote.objects.all()
+        self.assertSameJSON(
+            VoteSerializer(queryset, many=True, context=self.context).data,
+            VoteProjection(self.context).project(queryset),
+        )
+
+    def test_list_endpoints(self):
+        """ The list endpoints render the same bytes as their serializers. """
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        endpoints = [
+            ('/api/posts/', PostSerializer, Post.objects.all()),
+            ('/api/posts/?search=python', PostSerializer, Post.objects.filter(id__in=[self.post.id, self.other_post.id])),
+            ('/api/posts/?fields=id,title,posted_by,assigned_tags', PostSerializer, Post.objects.all()),
+            ('/api/posts/?exclude=content,image,total_votes', PostSerializer, Post.objects.all()),
+            ('/api/comment/', CommentSerializer, Comment.objects.all()),
+            (f'/api/post_comment/?post={self.post.id}', CommentSerializer,
+             Comment.objects.filter(post=self.post, parent=None)),
+            (f'/api/votes/?post={self.post.id}', VoteSerializer, Vote.objects.filter(post=self.post)),
+        ]
+        for url, serializer_class, queryset in endpoints:
+            with self.subTest(url=url):
+                response = client.get(url, HTTP_ACCEPT='application/json')
+                context = {'request': Request(response.wsgi_request), 'format': None, 'view': None}
+                expected = serializer_class(queryset, many=True, context=context).data
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, JSONRenderer().render(expected))
+
+
+@override_settings(VIEW_TRACKING_FLUSH_INTERVAL=0)
+class SparseFieldsetTests(TestCase):
+    """ ?fields= / ?exclude= leave the columns of the dropped fields out of the SQL. """
+
+    def setUp(self):
+        """ A post with a large body. """
+        self.author = create_user('author')
+        self.post = Post.objects.create(posted_by=self.author, title='Sparse', content='word ' * 1000)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.addCleanup(view_buffer.flush)
+
+    def get(self, url):
+        """ Gets the url, returns the response data and the SQL of the posts query. """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        post_queries = [query['sql'] for query in queries if 'FROM "blog_posts_post"' in query['sql']]
+        self.assertEqual(len(post_queries), 1)
+        return response.json(), post_queries[0]
+
+    def test_list_and_detail(self):
+        """ The list and the detail only read the columns of the requested fields. """
+        for url in ['/api/posts/?fields=id,title,word_count', f'/api/posts/{self.post.id}/?fields=id,title,word_count']:
+            with self.subTest(url=url):
+                data, sql = self.get(url)
+                post = data[0] if isinstance(data, list) else data
+                self.assertEqual(post, {'id': self.post.id, 'title': 'Sparse', 'word_count': 1000})
+                self.assertIn('"blog_posts_post"."title"', sql)
+                for column in ('content', 'excerpt', 'image', 'viewers_sketch'):
+                    self.assertNotIn(f'"blog_posts_post"."{column}"', sql)
+                self.assertNotIn('"blog_posts_vote"', sql)
+
+    def test_exclude(self):
+        """ Excluded columns are deferred, the others still read. """
+        data, sql = self.get('/api/posts/?exclude=content,my_vote')
+        self.assertNotIn('content', data[0])
+        self.assertEqual(data[0]['excerpt'], self.post.excerpt)
+        self.assertNotIn('"blog_posts_post"."content"', sql)
+        self.assertIn('"blog_posts_post"."excerpt"', sql)
+        self.assertIn('"auth_user"."username"', sql)
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                   'DEFAULT_THROTTLE_RATES': {'vote': '3/min'}})
+class VoteThrottleTests(TestCase):
+    """ The vote actions share one token bucket per user. """
+
+    def setUp(self):
+        """ A fresh cache, a post and an authenticated client. """
+        cache.clear()
+        self.user = create_user('voter')
+        self.post = Post.objects.create(posted_by=self.user, title='Voted', content='')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bucket_is_shared_by_the_vote_actions(self):
+        """ The burst is allowed, the next vote is throttled with a Retry-After. """
+        for name in ['upvote', 'downvote', 'unvote']:
+            self.assertEqual(self.client.get(f'/api/posts/{self.post.id}/{name}/').status_code, 200)
+        response = self.client.get(f'/api/posts/{self.post.id}/upvote/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+
+    def test_bucket_refills(self):
+        """ A token comes back every period / rate, denied requests do not delay it. """
+        with mock.patch.object(ScopedTokenBucketThrottle, 'timer', return_value=1000.0) as timer:
+            for _ in range(5):
+                self.client.get(f'/api/posts/{self.post.id}/upvote/')
+            timer.return_value = 1020.0
+            self.assertEqual(self.client.get(f'/api/posts/{self.post.id}/upvote/').status_code, 200)
+            self.assertEqual(self.client.get(f'/api/posts/{self.post.id}/upvote/').status_code, 429)
+            timer.return_value = 2000.0
+            for _ in range(3):
+                self.assertEqual(self.client.get(f'/api/posts/{self.post.id}/upvote/').status_code, 200)
+
+
+class CommentCountTests(TestCase):
+    """ comment_count and reply_count follow comment creations and deletions. """
+
+    def setUp(self):
+        """ A post with a comment thread. """
+        self.user = create_user('author')
+        self.post = Post.objects.create(posted_by=self.user, title='Counted', content='')
+        self.parent = Comment.objects.create(post=self.post, owner=self.user, content='Parent')
+        self.replies = [Comment.objects.create(post=self.post, owner=self.user, content='Reply', parent=self.parent)
+                        for _ in range(2)]
+
+    def assertCounts(self, comment_count, reply_count=None):
+        """ Checks the stored counters against the expected ones. """
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, comment_count)
+        if reply_count is not None:
+            self.parent.refresh_from_db()
+            self.assertEqual(self.parent.reply_count, reply_count)
+
+    def test_create_and_delete(self):
+        """ Replies count on both the post and their parent. """
+        self.assertCounts(3, 2)
+        self.replies[0].delete()
+        self.assertCounts(2, 1)
+
+    def test_cascade(self):
+        """ Deleting a parent uncounts its cascaded replies too. """
+        self.parent.delete()
+        self.assertCounts(0)
+
+    def test_reconcile(self):
+        """ The reconcile command fixes drifted counters. """
+        Post.objects.filter(pk=self.post.pk).update(comment_count=10)
+        Comment.objects.filter(pk=self.parent.pk).update(reply_count=0)
+        call_command('reconcile_counts', stdout=StringIO())
+        self.assertCounts(3, 2)
+
+
+class AuthorStatsTests(TestCase):
+    """ The author stats follow the post, vote and comment writes and serve the author summary. """
+
+    def setUp(self):
+        """ An author with two posts, voted and commented on by a reader. """
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+        self.posts = create_posts(self.author, 2)
+        self.posts[0].upvote(self.reader)
+        self.posts[1].upvote(self.author)
+        self.posts[1].downvote(self.reader)
+        parent = Comment.objects.create(post=self.posts[0], owner=self.reader, content='Parent')
+        Comment.objects.create(post=self.posts[1], owner=self.reader, content='Comment')
+        Comment.objects.create(post=self.posts[0], owner=self.author, content='Reply', parent=parent)
+
+    def assertStats(self, post_count, total_votes, comment_count):
+        """ Checks the stored stats of the author, and that they match a recount. """
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual((stats.post_count, stats.total_votes, stats.comment_count),
+                         (post_count, total_votes, comment_count))
+        output = StringIO()
+        call_command('reconcile_counts', '--dry-run', stdout=output)
+        self.assertNotIn('AuthorStats ', output.getvalue())
+
+    def test_incremental_updates(self):
+        """ Votes flipping and going away, and a deleted post with its votes and comments. """
+        self.assertStats(2, 1, 3)
+        self.posts[0].downvote(self.reader)
+        self.assertStats(2, -1, 3)
+        self.posts[1].unvote(self.reader)
+        self.assertStats(2, 0, 3)
+        self.posts[0].delete()
+        self.assertStats(1, 1, 1)
+        self.assertEqual(AuthorStats.objects.get(user=self.reader).post_count, 0)
+
+    def test_batch_and_reconcile(self):
+        """ Bulk created posts are counted, drifted and missing stats are fixed. """
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.post('/api/posts/batch/', [{'title': 'Batched', 'content': 'Text'}] * 3, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertStats(5, 1, 3)
+        AuthorStats.objects.filter(user=self.author).update(post_count=0, total_votes=7)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counts', stdout=StringIO())
+        self.assertStats(5, 1, 3)
+        self.assertTrue(AuthorStats.objects.filter(user=self.reader).exists())
+
+    def test_summary_endpoint(self):
+        """ The profile, stats and latest posts in a handful of queries. """
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        with self.assertNumQueries(4):
+            response = client.get(f'/api/users/{self.author.username}/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['username'], 'author')
+        self.assertEqual(response.data['profile']['user']['username'], 'author')
+        self.assertEqual((response.data['post_count'], response.data['total_votes'], response.data['comment_count']),
+                         (2, 1, 3))
+        self.assertEqual([post['id'] for post in response.data['recent_posts']],
+                         [self.posts[1].id, self.posts[0].id])
+        self.assertEqual(response.data['recent_posts'][1]['my_vote'], 'up')
+        self.assertEqual(client.get('/api/users/nobody/summary/').status_code, 404)
+
+    def test_positional_save_arguments(self):
+        """ The save overrides accept Model.save()'s positional arguments. """
+        vote = Vote.objects.get(post=self.posts[0], user=self.reader)
+        vote.upvote = False
+        vote.save(False, False, 'default', ['upvote'])
+        self.assertStats(2, -1, 3)
+
+    def test_summary_without_stats(self):
+        """ Users without a stats row, e.g. loaded by loaddata, get one on their first summary. """
+        AuthorStats.objects.filter(user=self.author).delete()
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        response = client.get(f'/api/users/{self.author.username}/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['post_count'], response.data['total_votes']), (0, 0))
+        self.assertEqual(len(response.data['recent_posts']), 2)
+        self.assertTrue(AuthorStats.objects.filter(user=self.author).exists())
+
+
+class TextStatsTests(TestCase):
+    """ The excerpt, word count and reading time follow the content of the posts. """
+
+    def setUp(self):
+        """ An author. """
+        self.author = create_user('author')
+
+    def test_get_text_stats(self):
+        """ Whitespace is collapsed, long excerpts are cut on a word, reading time rounds up. """
+        self.assertEqual(get_text_stats(''), ('', 0, 0))
+        self.assertEqual(get_text_stats('  One\n\ttwo   three '), ('One two three', 3, 1))
+        excerpt, word_count, reading_time = get_text_stats(' '.join(['word'] * (WORDS_PER_MINUTE + 1)))
+        self.assertEqual((word_count, reading_time), (WORDS_PER_MINUTE + 1, 2))
+        self.assertLessEqual(len(excerpt), EXCERPT_LENGTH)
+        self.assertTrue(excerpt.endswith(' word…'))
+        self.assertEqual(get_text_stats('x' * (EXCERPT_LENGTH + 1))[0], 'x' * (EXCERPT_LENGTH - 1) + '…')
+
+    def test_recomputed_when_the_content_is_saved(self):
+        """ Saving the content updates the stats, saves without it don't load nor recompute it. """
+        post = Post.objects.create(posted_by=self.author, title='Post', content='One two')
+        self.assertEqual((post.excerpt, post.word_count, post.reading_time), ('One two', 2, 1))
+        post.content = 'One two three'
+        post.save()
+        self.assertEqual(Post.objects.values_list('word_count', flat=True).get(pk=post.pk), 3)
+
+        Post.objects.filter(pk=post.pk).update(word_count=7)
+        post = Post.objects.defer('content').get(pk=post.pk)
+        post.title = 'Renamed'
+        # The update and its change log entry, the deferred content isn't loaded.
+        with mock.patch.object(Post, 'refresh_text_stats') as refresh, self.assertNumQueries(2):
+            post.save()
+        refresh.assert_not_called()
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual((post.title, post.word_count), ('Renamed', 7))
+        post.save(update_fields=['title'])
+        self.assertEqual(Post.objects.values_list('word_count', flat=True).get(pk=post.pk), 7)
+        post.save(update_fields=['content'])
+        self.assertEqual(Post.objects.values_list('word_count', flat=True).get(pk=post.pk), 3)
+        post.content = 'One'
+        post.save(False, False, 'default', ['content'])
+        self.assertEqual(Post.objects.values_list('word_count', flat=True).get(pk=post.pk), 1)
+
+    def test_backfill_post_stats(self):
+        """ Posts without stats are backfilled in batches, --all recomputes every post. """
+        posts = [Post.objects.create(posted_by=self.author, title=f'Post {index}', content=' '.join(['word'] * index))
+                 for index in range(4)]
+        Post.objects.filter(pk__in=[posts[1].pk, posts[2].pk]).update(excerpt='', word_count=0, reading_time=0)
+        Post.objects.filter(pk=posts[3].pk).update(word_count=9)
+        output = StringIO()
+        call_command('backfill_post_stats', '--batch-size', '1', stdout=output)
+        self.assertIn('Updated 2 posts.', output.getvalue())
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('excerpt', 'word_count', 'reading_time')),
+                         [('', 0, 0), ('word', 1, 1), ('word word', 2, 1), ('word word word', 9, 1)])
+
+        output = StringIO()
+        call_command('backfill_post_stats', '--all', stdout=output)
+        self.assertIn('Updated 4 posts.', output.getvalue())
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('word_count', flat=True)), [0, 1, 2, 3])
+
+
+@override_settings(VIEW_TRACKING_FLUSH_INTERVAL=0)
+class MyVoteTests(TestCase):
+    """ my_vote is the vote of the current user, read with one subquery for the whole list. """
+
+    def setUp(self):
+        """ Posts upvoted, downvoted and not voted by the reader. """
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+        self.posts = create_posts(self.author, 3)
+        self.posts[0].upvote(self.reader)
+        self.posts[1].downvote(self.reader)
+        self.posts[2].upvote(self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        self.addCleanup(view_buffer.flush)
+
+    def my_votes(self):
+        """ my_vote of each listed post. """
+        response = self.client.get('/api/posts/?fields=id,my_vote', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return {post['id']: post['my_vote'] for post in response.json()}
+
+    def test_list_and_detail(self):
+        """ 'up', 'down' and 'none' in the list and the detail, following the vote actions. """
+        self.assertEqual(self.my_votes(), dict(zip([post.id for post in self.posts], ['up', 'down', 'none'])))
+        self.assertEqual(self.client.get(f'/api/posts/{self.posts[1].id}/').data['my_vote'], 'down')
+        self.client.get(f'/api/posts/{self.posts[0].id}/unvote/')
+        self.client.get(f'/api/posts/{self.posts[2].id}/downvote/')
+        self.assertEqual(self.my_votes(), dict(zip([post.id for post in self.posts], ['none', 'down', 'down'])))
+
+    def test_anonymous(self):
+        """ Nobody voted for an anonymous user, whether annotated or not. """
+        context = {'request': Request(APIRequestFactory().get('/api/posts/')), 'format': None, 'view': None}
+        annotated = Post.annotate_my_vote(Post.objects.order_by('pk'), context['request'].user)
+        self.assertEqual([post['my_vote'] for post in PostSerializer(annotated, many=True, context=context).data],
+                         ['none'] * 3)
+        self.assertEqual([post['my_vote'] for post in PostProjection(context).project(Post.objects.order_by('pk'))],
+                         ['none'] * 3)
+        self.assertEqual(PostSerializer(self.posts[0], context=context).data['my_vote'], 'none')
+
+    def test_single_query(self):
+        """ The votes are read by a subquery of the page query, not once per post. """
+        with CaptureQueriesContext(connection) as queries:
+            self.my_votes()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"blog_posts_vote"', queries[0]['sql'])
+        for index in range(10):
+            Post.objects.create(posted_by=self.author, title=f'More {index}', content='').upvote(self.reader)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.my_votes().values()).count('up'), 11)
+
+
+class PostBatchTests(TestCase):
+    """ posts/batch/ validates every item, then bulk creates the valid ones chunk by chunk. """
+
+    def setUp(self):
+        """ An author and an existing tag. """
+        self.author = create_user('author')
+        self.python = Tag.objects.create(name='python')
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        tag_index.clear()
+        self.addCleanup(tag_index.clear)
+
+    def batch(self, items):
+        """ Posts a batch, returns the response. """
+        return self.client.post('/api/posts/batch/', {'posts': items}, format='json')
+
+    def test_created_with_bookkeeping(self):
+        """ The posts and their tags are created, logged and counted as the signals would. """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.batch([
+                {'title': 'First', 'content': 'One two three', 'tags': 'python,django'},
+                {'title': 'Second', 'content': '', 'tags': ['python', 'python']},
+                {'title': 'Third', 'content': 'Text'},
+            ])
+        self.assertEqual(response.status_code, 201)
+        post_ids = [result['id'] for result in response.data['results']]
+        self.assertEqual((response.data['created'], response.data['failed']), (3, 0))
+        self.assertEqual([result['index'] for result in response.data['results']], [0, 1, 2])
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('pk', 'title', 'word_count')),
+                         [(post_ids[0], 'First', 3), (post_ids[1], 'Second', 0), (post_ids[2], 'Third', 1)])
+
+        django = Tag.objects.get(name='django')
+        self.assertEqual(Tag.objects.filter(name='python').count(), 1)
+        self.assertEqual(sorted(AssignedTag.objects.values_list('post_id', 'tag_id')),
+                         sorted([(post_ids[0], self.python.id), (post_ids[0], django.id), (post_ids[1], self.python.id)]))
+        self.assertEqual((Tag.objects.get(pk=self.python.pk).usage_count, django.usage_count), (2, 1))
+        self.assertEqual(tag_index.suggest('py', 10), [('python', 2)])
+        self.assertEqual(AuthorStats.objects.get(user=self.author).post_count, 3)
+        self.assertEqual(sorted(ChangeLog.objects.filter(feed='posts').values_list('object_id', flat=True)), post_ids)
+        self.assertEqual(ChangeLog.objects.filter(feed='assigned_tags').count(), 3)
+        self.assertEqual(Job.objects.get().kwargs, {'post_ids': post_ids})
+        self.assertEqual(Job.objects.get().name, check_duplicate_posts.task_name)
+
+    def test_item_errors(self):
+        """ Invalid items are reported by index next to the created ones, with a 207. """
+        response = self.batch([
+            {'title': 'Valid', 'content': 'Text'},
+            {'content': 'No title'},
+            {'title': 'T' * 101, 'content': 'Text'},
+            {'title': 'Long tag', 'content': 'Text', 'tags': ['t' * 21]},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 3))
+        results = response.data['results']
+        self.assertEqual(results[0], {'index': 0, 'id': Post.objects.get().pk})
+        self.assertEqual([(result['index'], list(result['errors'])) for result in results[1:]],
+                         [(1, ['title']), (2, ['title']), (3, ['tags'])])
+        self.assertEqual(AuthorStats.objects.get(user=self.author).post_count, 1)
+
+        response = self.batch([{'content': 'No title'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data['created'], response.data['failed']), (0, 1))
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_malformed_batches(self):
+        """ Empty, non list and oversized batches are refused as a whole. """
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.client.post('/api/posts/batch/', {'posts': 'First'}, format='json').status_code, 400)
+        with mock.patch('blog_posts.views.POST_BATCH_MAX_SIZE', 2):
+            response = self.batch([{'title': 'Post', 'content': 'Text'}] * 3)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {'posts': 'At most 2 posts per batch.'})
+            self.assertEqual(self.batch([{'title': 'Post', 'content': 'Text'}] * 2).status_code, 201)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_chunks_are_atomic(self):
+        """ A failing chunk is rolled back entirely, the chunks before it stay committed. """
+        items = [{'title': f'Post {index}', 'content': 'Text', 'tags': [f'tag{index}']} for index in range(4)]
+        with mock.patch.object(check_duplicate_posts, 'enqueue_on_commit', side_effect=[None, RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                bulk_create_posts(self.author, items, chunk_size=2)
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('title', flat=True)), ['Post 0', 'Post 1'])
+        self.assertEqual(sorted(Tag.objects.values_list('name', 'usage_count')),
+                         [('python', 0), ('tag0', 1), ('tag1', 1)])
+        self.assertEqual(AssignedTag.objects.count(), 2)
+        self.assertEqual(AuthorStats.objects.get(user=self.author).post_count, 2)
+        self.assertEqual(ChangeLog.objects.filter(feed='posts').count(), 2)
+
+
+class ExportTests(TestCase):
+    """ The export api and the export_data command stream whole tables as NDJSON or CSV. """
+
+    def setUp(self):
+        """ Two old posts and a recent one, an admin. """
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.posts = create_posts(self.admin, 3, content='Text, "quoted"')
+        self.since = timezone.now() - datetime.timedelta(days=1)
+        Post.objects.filter(pk__in=[self.posts[0].pk, self.posts[1].pk]).update(
+            modified=self.since - datetime.timedelta(days=1)
+        )
+        for post in self.posts:
+            post.refresh_from_db()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, query=''):
+        """ Streams the posts export through the api, returns the response and its body. """
+        response = self.client.get(f'/api/export/posts/{query}')
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def expected_row(self, post):
+        """ The exported values of a post, datetimes formatted like the api renders them. """
+        encode = JSONEncoder().default
+        return {'id': post.id, 'posted_by': self.admin.id, 'title': post.title, 'content': post.content,
+                'image': '', 'isBlocked': False, 'created': encode(post.created), 'modified': encode(post.modified)}
+
+    def test_ndjson(self):
+        """ One JSON document per row, in primary key order, filtered on modified. """
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="posts.ndjson"')
+        self.assertEqual([json.loads(line) for line in body.splitlines()],
+                         [self.expected_row(post) for post in self.posts])
+
+        _, body = self.export(f'?since={self.since.isoformat()}'.replace('+', '%2B'))
+        self.assertEqual([json.loads(line) for line in body.splitlines()], [self.expected_row(self.posts[2])])
+
+    def test_csv(self):
+        """ A header, then one quoted line per row. """
+        response, body = self.export('?output=csv&chunk_size=1')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(body.splitlines()))
+        self.assertEqual(rows[0], ['id', 'posted_by', 'title', 'content', 'image', 'isBlocked', 'created', 'modified'])
+        self.assertEqual(rows[1:], [[str(value) for value in self.expected_row(post).values()] for post in self.posts])
+
+    def test_invalid_parameters(self):
+        """ Unknown exports and formats, bad filters; admins only; the chunk size is clamped. """
+        self.assertEqual(self.client.get('/api/export/users/').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/posts/?output=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/export/posts/?since=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/api/export/posts/?chunk_size=many').status_code, 400)
+        with mock.patch('blog_posts.views.stream_export', return_value=iter([])) as stream:
+            self.client.get('/api/export/posts/?chunk_size=1000000000')
+            self.client.get('/api/export/posts/?chunk_size=-5')
+        self.assertEqual([call.kwargs['chunk_size'] for call in stream.call_args_list], [EXPORT_MAX_CHUNK_SIZE, 1])
+        self.client.force_authenticate(create_user('reader'))
+        self.assertEqual(self.client.get('/api/export/posts/').status_code, 403)
+
+    def test_command(self):
+        """ export_data writes the same streams as the api to a file. """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'posts')
+        since = self.since.isoformat()
+        for arguments, query in [([], ''), (['--since', since], f'?since={since}'),
+                                 (['--output', 'csv'], '?output=csv'),
+                                 (['--output', 'csv', '--since', since], f'?output=csv&since={since}')]:
+            with self.subTest(arguments=arguments):
+                call_command('export_data', 'posts', '--file', path, '--chunk-size', '2', *arguments)
+                with open(path, 'rb') as export_file:
+                    self.assertEqual(export_file.read().decode(), self.export(query.replace('+', '%2B'))[1])
+        with open(path, 'rb') as export_file:
+            self.assertEqual(len(export_file.read().splitlines()), 2)
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'posts', '--since', 'yesterday')
+
+
+@override_settings(VIEW_TRACKING_FLUSH_INTERVAL=0)
+class ViewTrackingTests(TestCase):
+    """ Post views are buffered in memory and flushed with a sketch of the unique viewers. """
+
+    def setUp(self):
+        """ A post and a few readers, with an empty buffer. """
+        self.author = create_user('author')
+        self.readers = [create_user(f'reader{index}') for index in range(3)]
+        self.post = Post.objects.create(posted_by=self.author, title='Viewed', content='')
+        view_buffer.flush()
+
+    def view(self, user):
+        """ Retrieves the post as ``user``. """
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(f'/api/posts/{self.post.id}/')
+
+    def test_views_are_buffered_then_flushed(self):
+        """ Reads don't write, the flush adds every view and estimates the distinct viewers. """
+        with self.assertNumQueries(0):
+            view_buffer.record(self.post.id, 'user-0')
+        for reader in self.readers + self.readers[:1]:
+            self.assertEqual(self.view(reader).status_code, 200)
+        self.assertEqual(view_buffer.flush(), 1)
+        response = self.view(self.author)
+        self.assertEqual((response.data['view_count'], response.data['unique_viewers']), (5, 4))
+        self.assertEqual(view_buffer.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.view_count, self.post.unique_viewers), (6, 5))
+
+    def test_saving_a_stale_post_keeps_the_counters(self):
+        """ Updates of the post never write back the view counters. """
+        post = Post.objects.get(pk=self.post.pk)
+        self.view(self.readers[0])
+        view_buffer.flush()
+        post.title = 'Renamed'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual((post.title, post.view_count, post.unique_viewers), ('Renamed', 1, 1))
+
+    def test_sketch_accuracy(self):
+        """ The estimate stays within a few standard errors, merged sketches too. """
+        first, second = HyperLogLog(), HyperLogLog()
+        for index in range(20000):
+            (first if index % 2 else second).add(f'user-{index}')
+        first.merge(second)
+        self.assertAlmostEqual(HyperLogLog.from_bytes(first.to_bytes()).count(), 20000, delta=20000 * 0.1)
+        self.assertEqual(len(first.to_bytes()), 1024)
+
+
+@skipUnless(importlib.util.find_spec('scipy'), 'Related posts need numpy and scipy.')
+class RelatedPostsTests(TestCase):
+    """ Related posts are ranked by shared tags, the rare ones weighing the most. """
+
+    def setUp(self):
+        """ Posts all tagged python, a couple of them sharing rarer tags too. """
+        self.author = create_user('author')
+        self.tags = {name: Tag.objects.create(name=name) for name in ('python', 'django', 'hyperloglog')}
+        self.posts = create_posts(self.author, 5)
+        for post in self.posts:
+            self.tag(post, 'python')
+        self.tag(self.posts[0], 'django')
+        self.tag(self.posts[0], 'hyperloglog')
+        self.tag(self.posts[1], 'django')
+        self.tag(self.posts[2], 'hyperloglog')
+        related_index.clear()
+        self.addCleanup(related_index.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def tag(self, post, name):
+        """ Assigns the tag to the post. """
+        return AssignedTag.objects.create(post=post, tag=self.tags[name])
+
+    def related(self, post, **params):
+        """ Ids of the posts related to ``post``, best first. """
+        response = self.client.get(f'/api/posts/{post.id}/related/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data]
+
+    def test_ranking(self):
+        """ Posts sharing rarer tags come first, ties go to the newer post. """
+        first, second, third, fourth, fifth = self.posts
+        self.assertEqual(self.related(first), [third.id, second.id, fifth.id, fourth.id])
+        self.assertEqual(self.related(first, limit=2), [third.id, second.id])
+        response = self.client.get(f'/api/posts/{second.id}/related/')
+        self.assertEqual(response.data[0]['id'], first.id)
+        self.assertGreater(response.data[0]['score'], response.data[1]['score'])
+        untagged = Post.objects.create(posted_by=self.author, title='Untagged', content='')
+        self.assertEqual(self.related(untagged), [])
+        self.assertEqual(self.client.get(f'/api/posts/{first.id}/related/', {'limit': 'x'}).status_code, 400)
+
+    def test_tag_changes_are_applied(self):
+        """ Assigned and removed tags are read back from the change log, not from AssignedTag. """
+        first, second, third, fourth, _ = self.posts
+        self.related(first)
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = self.tag(fourth, 'hyperloglog')
+            self.tag(fourth, 'django')
+        self.assertEqual(self.related(first)[0], fourth.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.delete()
+        self.assertEqual(self.related(first)[:3], [third.id, fourth.id, second.id])
+        # A warm index answers from memory: only the post and the projected posts are read.
+        with self.assertNumQueries(4):
+            self.related(third)
+
+    def test_deleted_posts_leave_the_index(self):
+        """ Soft deleted posts are dropped at once, and left out of a fresh load, the limit fills from live posts. """
+        first, second, third, fourth, fifth = self.posts
+        self.assertEqual(self.related(first, limit=2), [third.id, second.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            for post in (second, third):
+                self.assertEqual(self.client.delete(f'/api/posts/{post.id}/').status_code, 204)
+        self.assertEqual(self.related(first, limit=2), [fifth.id, fourth.id])
+        related_index.clear()
+        self.assertEqual(self.related(first, limit=2), [fifth.id, fourth.id])
+        # Other processes apply the logged deletes once their sync interval has passed.
+        related_index.clear()
+        self.related(first)
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.delete(f'/api/posts/{fifth.id}/')
+        with override_settings(RELATED_POSTS_SYNC_INTERVAL=0):
+            self.assertEqual(self.related(first, limit=2), [fourth.id])
+
+    def test_sync_interval(self):
+        """ Changes made by other processes show up once the sync interval has passed. """
+        first, _, _, fourth, _ = self.posts
+        self.related(first)
+        self.tag(fourth, 'hyperloglog')
+        self.tag(fourth, 'django')
+        self.assertNotEqual(self.related(first)[0], fourth.id)
+        with override_settings(RELATED_POSTS_SYNC_INTERVAL=0):
+            self.assertEqual(self.related(first)[0], fourth.id)
+
+
+@skipUnless(importlib.util.find_spec('numpy'), 'Duplicate detection needs numpy.')
+class DuplicateDetectionTests(TestCase):
+    """ Created and updated posts are indexed by MinHash and checked against the LSH buckets. """
+    CONTENT = ' '.join(f'word{index}' for index in range(200))
+
+    def setUp(self):
+        """ An original post, a copier and a moderator. """
+        self.author = create_user('author')
+        self.copier = create_user('copier')
+        self.moderator = create_user('moderator', is_staff=True)
+        self.original = Post.objects.create(posted_by=self.author, title='Original', content=self.CONTENT)
+        check_duplicates(self.original)
+
+    def create(self, user, content):
+        """ Creates a post through the api, returns its id. """
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/posts/', {'title': 'Copy', 'content': content}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def test_signature_estimates_jaccard(self):
+        """ The share of equal MinHash values is close to the Jaccard similarity of the shingles. """
+        edited = self.CONTENT.replace('word100 ', 'edited ').replace('word150 ', 'edited ')
+        shingles, edited_shingles = get_shingles(self.CONTENT), get_shingles(edited)
+        jaccard = len(shingles & edited_shingles) / len(shingles | edited_shingles)
+        estimate = estimate_similarity(compute_signature(self.CONTENT), compute_signature(edited))
+        self.assertAlmostEqual(estimate, jaccard, delta=0.12)
+        self.assertIsNone(compute_signature('  ...  '))
+
+    def test_copy_is_reported(self):
+        """ A lightly edited copy is reported automatically, the author of the original can report it too. """
+        copy_id = self.create(self.copier, self.CONTENT.replace('word10 ', 'edited '))
+        report = Report.objects.get(post_id=copy_id)
+        self.assertEqual((report.type, report.reported_by), ('duplicate', None))
+        self.create(self.copier, ' '.join(f'other{index}' for index in range(200)))
+        check_duplicates(Post.objects.get(pk=copy_id))
+        self.assertEqual(Report.objects.count(), 1)
+
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.post('/api/reports/', {'post': copy_id, 'type': 'duplicate', 'reported_by': self.author.id},
+                               format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['reported_by']['id'], self.author.id)
+        client.force_authenticate(self.moderator)
+        response = client.patch(f'/api/review_reports/{report.id}/', {'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Post.objects.get(pk=copy_id).isBlocked)
+        self.assertIsNone(ReportSerializer(report).data['reported_by'])
+
+    def test_moderators_see_duplicates(self):
+        """ posts/<id>/duplicates/ lists the near-duplicates, for staff only, and follows updates. """
+        copy_id = self.create(self.copier, self.CONTENT)
+        client = APIClient()
+        client.force_authenticate(self.copier)
+        self.assertEqual(client.get(f'/api/posts/{copy_id}/duplicates/').status_code, 403)
+        client.force_authenticate(self.moderator)
+        response = client.get(f'/api/posts/{self.original.id}/duplicates/')
+        self.assertEqual(response.data, [{'id': copy_id, 'title': 'Copy', 'similarity': 1.0}])
+
+        client.force_authenticate(self.copier)
+        rewritten = ' '.join(f'rewritten{index}' for index in range(200))
+        self.assertEqual(client.patch(f'/api/posts/{copy_id}/', {'content': rewritten}, format='json').status_code, 200)
+        client.force_authenticate(self.moderator)
+        self.assertEqual(client.get(f'/api/posts/{self.original.id}/duplicates/').data, [])
+
+
+class TagAutocompleteTests(TestCase):
+    """ Tags are suggested by prefix from an in-memory index, most used first. """
+
+    def setUp(self):
+        """ Tags used by a few posts, with an empty index. """
+        self.author = create_user('author')
+        self.posts = create_posts(self.author, 4)
+        tag_index.clear()
+        self.addCleanup(tag_index.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tags = {name: Tag.objects.create(name=name) for name in ('Python', 'pytest', 'pyramid', 'django')}
+            for name, uses in (('Python', 3), ('pytest', 2), ('pyramid', 1), ('django', 4)):
+                for post in self.posts[:uses]:
+                    AssignedTag.objects.create(post=post, tag=self.tags[name])
+
+    def suggest(self, **params):
+        """ The suggested (name, count). """
+        response = self.client.get('/api/tags/autocomplete/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(item['name'], item['count']) for item in response.data]
+
+    def test_ranking(self):
+        """ Tags starting with the prefix, case insensitive, most used first. """
+        self.assertEqual(self.suggest(q='py'), [('Python', 3), ('pytest', 2), ('pyramid', 1)])
+        self.assertEqual(self.suggest(q='PYT', limit=1), [('Python', 3)])
+        self.assertEqual(self.suggest(q='rust'), [])
+        self.assertEqual(self.suggest(q=''), [])
+        self.assertEqual(Tag.objects.get(name='django').usage_count, 4)
+
+    def test_signals_update_the_index(self):
+        """ Created tags and assignments are applied in memory, without reloading. """
+        self.suggest(q='py')
+        with self.captureOnCommitCallbacks(execute=True):
+            pydantic = Tag.objects.create(name='pydantic')
+            for post in self.posts:
+                AssignedTag.objects.create(post=post, tag=pydantic)
+            AssignedTag.objects.filter(tag=self.tags['Python']).first().delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(tag_index.suggest('py', 10), [('pydantic', 4), ('pytest', 2), ('Python', 2), ('pyramid', 1)])
+        self.assertEqual(Tag.objects.get(pk=self.tags['Python'].pk).usage_count, 2)
+
+    @override_settings(TAG_AUTOCOMPLETE_MAX=3)
+    def test_cached_prefixes_match_a_reload(self):
+        """ Moving names within the cached tops gives the tops computed from scratch. """
+        random.seed(49)
+        names = [f'{first}{second}' for first in 'ab' for second in 'abcdef']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tags.update({name: Tag.objects.create(name=name) for name in names})
+        prefixes = ['', 'a', 'b', 'aa', 'bf']
+        for _ in range(60):
+            for prefix in prefixes:
+                tag_index.suggest(prefix, 3)
+            tag_index.count(self.tags[random.choice(names)].pk, random.choice([1, 1, 2, -1]))
+        cached = {prefix: tag_index.suggest(prefix, 3) for prefix in prefixes}
+        tag_index.top = {}
+        self.assertEqual({prefix: tag_index.suggest(prefix, 3) for prefix in prefixes}, cached)
+
+    def test_reload_outside_the_lock(self):
+        """ Lookups during a reload use the previous arrays, changes made meanwhile are replayed. """
+        self.assertEqual(tag_index.suggest('py', 1), [('Python', 3)])
+        started, release = threading.Event(), threading.Event()
+
+        def read_tags():
+            started.set()
+            release.wait(5)
+            return iter([(tag.pk, name, 10 if name == 'pyramid' else 0) for name, tag in self.tags.items()])
+
+        tag_index.loaded_at -= settings.TAG_AUTOCOMPLETE_MAX_AGE
+        with mock.patch.object(Tag.objects, 'values_list') as values_list:
+            values_list.return_value.iterator.side_effect = read_tags
+            reload = threading.Thread(target=tag_index.suggest, args=('py', 1))
+            reload.start()
+            self.assertTrue(started.wait(5))
+            self.assertEqual(tag_index.suggest('py', 1), [('Python', 3)])
+            tag_index.count(self.tags['pytest'].pk, 20)
+            self.assertEqual(tag_index.suggest('py', 1), [('pytest', 22)])
+            release.set()
+            reload.join(5)
+        self.assertEqual(values_list.call_count, 1)
+        self.assertEqual(tag_index.suggest('py', 3), [('pytest', 20), ('pyramid', 10), ('Python', 0)])
+
+
+class ReplyPaginationTests(TestCase):
+    """ Top-level comments embed a preview of their replies, the rest is paged by keyset. """
+
+    @classmethod
+    def setUpTestData(cls):
+        """ A comment with more replies than the preview holds, and one with a single reply. """
+        cls.user = create_user('replier')
+        cls.post = Post.objects.create(posted_by=cls.user, title='Threads', content='')
+        cls.busy = Comment.objects.create(post=cls.post, owner=cls.user, content='Busy')
+        cls.replies = [
+            Comment.objects.create(post=cls.post, owner=cls.user, content=f'Reply {index}', parent=cls.busy)
+            for index in range(REPLY_PREVIEW_SIZE + 2)
+        ]
+        cls.quiet = Comment.objects.create(post=cls.post, owner=cls.user, content='Quiet')
+        Comment.objects.create(post=cls.post, owner=cls.user, content='Only reply', parent=cls.quiet)
+
+    def setUp(self):
+        """ An authenticated client. """
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_preview_and_replies_endpoint(self):
+        """ The reply_cursor continues on comment/<id>/replies/ right after the preview. """
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/post_comment/?post={self.post.id}', HTTP_ACCEPT='application/json')
+        busy, quiet = response.json()
+        self.assertEqual(busy['reply_count'], REPLY_PREVIEW_SIZE + 2)
+        self.assertEqual([reply['id'] for reply in busy['reply']],
+                         [reply.id for reply in self.replies[:REPLY_PREVIEW_SIZE]])
+        self.assertIsNone(quiet['reply_cursor'])
+
+        response = self.client.get(f'/api/comment/{self.busy.id}/replies/', {'cursor': busy['reply_cursor']})
+        self.assertEqual([reply['id'] for reply in response.json()['results']],
+                         [reply.id for reply in self.replies[REPLY_PREVIEW_SIZE:]])
+
+    def test_projection_parity(self):
+        """ The window-function previews match the serializer ones. """
+        context = {'request': Request(APIRequestFactory().get('/api/')), 'format': None, 'view': None}
+        queryset = Comment.objects.filter(parent=None)
+        self.assertEqual(
+            JSONRenderer().render(CommentSerializer(queryset, many=True, context=context).data),
+            JSONRenderer().render(CommentProjection(context).project(queryset)),
+        )
+
+
+class VoteSummaryTests(TestCase):
+    """ The vote summaries match whether they are counted from the votes or the rollups. """
+
+    def setUp(self):
+        """ Votes cast, flipped and withdrawn on a post. """
+        voters = [create_user(f'voter{index}') for index in range(4)]
+        self.post = Post.objects.create(posted_by=voters[0], title='Summarized', content='')
+        for voter in voters:
+            self.post.upvote(voter)
+        self.post.downvote(voters[1])
+        self.post.unvote(voters[2])
+        self.client = APIClient()
+        self.client.force_authenticate(voters[0])
+
+    def summary(self, bucket):
+        """ Fetches the summary of the post. """
+        response = self.client.get('/api/votes/summary/', {'post': self.post.id, 'bucket': bucket},
+                                   HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_rollups_match_votes(self):
+        """ The rollups follow created, flipped and deleted votes. """
+        for bucket in ['hour', 'day']:
+            with self.subTest(bucket=bucket):
+                with self.settings(VOTE_SUMMARY_USE_ROLLUP=False):
+                    expected = self.summary(bucket)
+                self.assertEqual([(row['upvotes'], row['downvotes']) for row in expected], [(2, 1)])
+                self.assertEqual(self.summary(bucket), expected)
+
+    def test_rebuild(self):
+        """ Rebuilt rollups give the same summary. """
+        expected = self.summary('hour')
+        call_command('rebuild_vote_rollups', stdout=StringIO())
+        self.assertEqual(self.summary('hour'), expected)
+
+
+class SoftDeleteTests(TestCase):
+    """ Deleted posts are hidden at once and their rows purged in chunks afterwards. """
+
+    def setUp(self):
+        """ A post with a comment tree, votes, a report and a tag. """
+        self.author = create_user('author')
+        self.readers = [create_user(f'reader{index}') for index in range(3)]
+        self.post = Post.objects.create(posted_by=self.author, title='Deleted', content='')
+        self.tag = Tag.objects.create(name='python')
+        AssignedTag.objects.create(post=self.post, tag=self.tag)
+        parent = None
+        for index in range(5):
+            parent = Comment.objects.create(post=self.post, owner=self.readers[0], parent=parent, content=f'Reply {index}')
+        for index, reader in enumerate(self.readers):
+            Vote.objects.create(post=self.post, user=reader, upvote=index > 0)
+        Report.objects.create(post=self.post, reported_by=self.readers[0])
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_delete_hides_the_post(self):
+        """ The post and its rows leave the read paths, the stats and the feed, and a purge is queued. """
+        cursor = self.client.get('/api/changes/').json()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/api/posts/{self.post.id}/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/posts/{self.post.id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/posts/').data, [])
+        self.assertEqual(self.client.get('/api/comment/').data, [])
+        self.assertEqual(self.client.get('/api/votes/', {'post': self.post.id}).data, [])
+        self.assertEqual(self.client.get('/api/votes/summary/', {'post': self.post.id}).data['results'], [])
+        self.assertEqual(self.client.delete(f'/api/posts/{self.post.id}/').status_code, 404)
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual((stats.post_count, stats.total_votes, stats.comment_count), (0, 0, 0))
+        feed = self.client.get('/api/changes/', {'since': cursor}, HTTP_ACCEPT='application/json').json()
+        self.assertEqual([(change['feed'], change['action']) for change in feed['changes']],
+                         [('posts', 'delete'), ('assigned_tags', 'delete')])
+        self.assertEqual(Comment.objects.count(), 5)
+        self.assertEqual(Job.objects.get().name, purge_deleted_post.task_name)
+        out = StringIO()
+        call_command('reconcile_counts', '--dry-run', stdout=out)
+        self.assertIn('Found 0 drifted AuthorStats.total_votes', out.getvalue())
+
+    def test_purge_in_chunks(self):
+        """ The rows go in bounded chunks, the reply chain included, with their logs and tag usage. """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/posts/{self.post.id}/')
+        tag_index.clear()
+        self.addCleanup(tag_index.clear)
+        progress = []
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted = purge_post(self.post.id, chunk_size=2, progress=lambda *args: progress.append(args[1:]))
+        self.assertEqual(deleted, 1 + 1 + 5 + 3 + 1 + 1)
+        self.assertIn((Comment, 4, 5), progress)
+        self.assertEqual(max(purged for model, purged, _ in progress if model is Comment), 5)
+        self.assertFalse(Post.all_objects.filter(pk=self.post.id).exists())
+        self.assertFalse(Comment.objects.exists() or Vote.objects.exists() or Report.objects.exists())
+        self.assertEqual(Tag.objects.get().usage_count, 0)
+        self.assertEqual(ChangeLog.objects.filter(feed='comments', deleted=True).count(), 5)
+        self.assertEqual(purge_post(self.post.id), 0)
+
+    def test_replies_stay_on_their_post(self):
+        """ Replies to another post or on a deleted post are refused, legacy ones are purged with their parent. """
+        other = Post.objects.create(posted_by=self.readers[1], title='Other', content='')
+        parent = Comment.objects.filter(post=self.post).first()
+        response = self.client.post('/api/comment/', {'post': other.id, 'parent': parent.id, 'content': 'Off'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.data)
+
+        legacy = Comment.objects.create(post=other, owner=self.readers[1], parent=parent, content='Legacy')
+        Comment.objects.create(post=other, owner=self.readers[2], parent=legacy, content='Nested')
+        self.client.delete(f'/api/posts/{self.post.id}/')
+        response = self.client.post('/api/comment/', {'post': self.post.id, 'content': 'Late'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/comment/', {'post': other.id, 'parent': parent.id, 'content': 'Late'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+        purge_post(self.post.id, chunk_size=2)
+        self.assertFalse(Post.all_objects.filter(pk=self.post.id).exists())
+        self.assertFalse(Comment.objects.filter(post=other).exists())
+        other.refresh_from_db()
+        self.assertEqual(other.comment_count, 0)
+
+    def test_stale_save_keeps_the_post_deleted(self):
+        """ Saving an instance loaded before the delete doesn't bring the post back. """
+        stale = Post.objects.get(pk=self.post.pk)
+        self.client.delete(f'/api/posts/{self.post.id}/')
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertEqual(Post.all_objects.get(pk=self.post.pk).title, 'Renamed')
+
+    def test_purge_job(self):
+        """ The queued job purges the post, live posts are left alone. """
+        live = Post.objects.create(posted_by=self.author, title='Live', content='')
+        purge_deleted_post(post_id=live.id)
+        self.client.delete(f'/api/posts/{self.post.id}/')
+        purge_deleted_post(post_id=self.post.id)
+        self.assertEqual(list(Post.all_objects.values_list('title', flat=True)), ['Live'])
+
+
+class ChangeFeedTests(TestCase):
+    """ The changes/ feed returns compacted deltas after a cursor. """
+
+    def setUp(self):
+        """ A post and an authenticated client, with the cursor taken before any write. """
+        self.user = create_user('syncer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cursor = self.client.get('/api/changes/').json()['cursor']
+        self.post = Post.objects.create(posted_by=self.user, title='Synced', content='')
+
+    def changes(self, since):
+        """ Fetches the changes after the cursor. """
+        response = self.client.get('/api/changes/', {'since': since}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_compacted_changes(self):
+        """ An object changed many times appears once, with its last state, in write order. """
+        comment = Comment.objects.create(post=self.post, owner=self.user, content='First')
+        comment_id = comment.id
+        self.post.title = 'Synced again'
+        self.post.save()
+        comment.delete()
+
+        feed = self.changes(self.cursor)
+        self.assertEqual([(change['feed'], change['id'], change['action']) for change in feed['changes']],
+                         [('posts', self.post.id, 'upsert'), ('comments', comment_id, 'delete')])
+        self.assertEqual(feed['changes'][0]['data']['title'], 'Synced again')
+        self.assertEqual(self.changes(feed['cursor'])['changes'], [])
+
+    def test_rolled_back_writes_are_not_logged(self):
+        """ The log entry shares the transaction of the write. """
+        cursor = self.changes(self.cursor)['cursor']
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(post=self.post, user=self.user)
+            Vote.objects.create(post=self.post, user=self.user)
+        self.assertEqual(self.changes(cursor)['changes'], [])
+
+
+@override_settings(LIVE_COUNTS_INTERVAL=0.05)
+class LiveCountsTests(TestCase):
+    """ The ASGI app streams the counts of posts as Server-Sent Events. """
+
+    @classmethod
+    def setUpTestData(cls):
+        """ A post, voters and a knox token. """
+        cls.voters = [create_user(f'live{index}') for index in range(3)]
+        cls.post = Post.objects.create(posted_by=cls.voters[0], title='Live', content='')
+        cls.token = AuthToken.objects.create(cls.voters[0])[1]
+
+    def vote(self):
+        """ A burst of votes, committed. """
+        with self.captureOnCommitCallbacks(execute=True):
+            for voter in self.voters:
+                self.post.upvote(voter)
+
+    async def stream(self, query_string, during):
+        """ Runs the stream until ``during`` completes, returns the sent messages. """
+        messages, inbox = [], asyncio.Queue()
+        scope = {'type': 'http', 'method': 'GET', 'path': LIVE_COUNTS_PATH, 'headers': [],
+                 'query_string': query_string.encode()}
+
+        async def send(message):
+            messages.append(message)
+
+        task = asyncio.ensure_future(application(scope, inbox.get, send))
+        await asyncio.sleep(0.1)
+        await during()
+        await asyncio.sleep(0.2)
+        inbox.put_nowait({'type': 'http.disconnect'})
+        await task
+        return messages
+
+    async def test_burst_is_coalesced(self):
+        """ The current counts come first, then one event for the whole burst. """
+        async def during():
+            await sync_to_async(self.vote)()
+
+        messages = await self.stream(f'ids={self.post.id}&token={self.token}', during)
+        self.assertEqual(messages[0]['status'], 200)
+        events = [message['body'] for message in messages[1:] if message['body'] != b': keepalive\n\n']
+        self.assertEqual(events, [
+            format_event({'id': self.post.id, 'total_votes': 0, 'comment_count': 0}),
+            format_event({'id': self.post.id, 'total_votes': 3, 'comment_count': 0}),
+        ])
+
+    async def test_invalid_token(self):
+        """ Streams need a valid knox token. """
+        scope = {'type': 'http', 'method': 'GET', 'path': LIVE_COUNTS_PATH, 'headers': [],
+                 'query_string': f'ids={self.post.id}&token=invalid'.encode()}
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await application(scope, asyncio.Queue().get, send)
+        self.assertEqual(messages[0]['status'], 401)
@@ -0,0 +1,122 @@
+"""
+Post view counting, buffered in memory so that reading a post stays a read.
+
+``retrieve`` records the view in the process wide ``view_buffer``: one counter and
+one HyperLogLog sketch of the viewers per post. A background thread flushes the
+buffer every VIEW_TRACKING_FLUSH_INTERVAL seconds, or early once
+VIEW_TRACKING_MAX_PENDING posts are waiting, in a single transaction: an UPDATE
+adding the buffered views to ``view_count``, then the buffered sketch merged into
+the stored one and ``unique_viewers`` re-estimated when it changed.
+
+Views buffered by a process which is killed before its next flush are lost, a
+graceful exit flushes them.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+
+from blog_posts.hyperloglog import HyperLogLog
+from blog_posts.models import Post
+from blog_posts.utils import in_chunks
+
+logger = logging.getLogger(__name__)
+
+
+def get_viewer_key(request):
+    """ Identifies the viewer of a request for the unique viewers sketch. """
+    if request.user.is_authenticated:
+        return f'user-{request.user.pk}'
+    return f'ip-{request.META.get("REMOTE_ADDR", "")}'
+
+
+def write_views(views, sketches):
+    """ Adds buffered views and viewer sketches to the posts, in one transaction. """
+    with transaction.atomic():
+        # Incrementing first locks the rows, concurrent flushes then merge the sketches in turn.
+        for post_id, count in views.items():
+            Post.objects.filter(pk=post_id).update(view_count=F('view_count') + count)
+        for chunk in in_chunks(list(sketches)):
+            for post_id, stored in Post.objects.filter(pk__in=chunk).values_list('pk', 'viewers_sketch'):
+                sketch = HyperLogLog.from_bytes(bytes(stored or b''))
+                if sketch.merge(sketches[post_id]):
+                    Post.objects.filter(pk=post_id).update(viewers_sketch=sketch.to_bytes(),
+                                                           unique_viewers=sketch.count())
+
+
+class ViewBuffer:
+    """
+    Per-process buffer of post views. ``record()`` is called by the request threads,
+    ``flush()`` by the flushing thread, started with the first view.
+    """
+
+    def __init__(self):
+        """ Nothing buffered and no flushing thread yet. """
+        self.lock = threading.Lock()
+        self.views = defaultdict(int)
+        self.sketches = {}
+        self.wake = threading.Event()
+        self.thread = None
+
+    def record(self, post_id, viewer_key):
+        """ Counts a view of the post by the viewer. """
+        with self.lock:
+            self.views[post_id] += 1
+            if post_id not in self.sketches:
+                self.sketches[post_id] = HyperLogLog()
+            self.sketches[post_id].add(viewer_key)
+            pending = len(self.views)
+        if pending >= settings.VIEW_TRACKING_MAX_PENDING:
+            self.wake.set()
+        self.start()
+
+    def flush(self):
+        """ Writes the buffered views, returns the number of posts updated. """
+        with self.lock:
+            views, self.views = self.views, defaultdict(int)
+            sketches, self.sketches = self.sketches, {}
+        if not views:
+            return 0
+        try:
+            write_views(views, sketches)
+        except DatabaseError:
+            logger.exception('Flushing the views of %s posts failed, keeping them for the next flush', len(views))
+            self.restore(views, sketches)
+            return 0
+        return len(views)
+
+    def restore(self, views, sketches):
+        """ Puts back views which could not be written. """
+        with self.lock:
+            for post_id, count in views.items():
+                self.views[post_id] += count
+                if post_id in self.sketches:
+                    self.sketches[post_id].merge(sketches[post_id])
+                else:
+                    self.sketches[post_id] = sketches[post_id]
+
+    def start(self):
+        """ Starts the flushing thread, unless it runs or VIEW_TRACKING_FLUSH_INTERVAL disables it. """
+        if not settings.VIEW_TRACKING_FLUSH_INTERVAL or (self.thread is not None and self.thread.is_alive()):
+            return
+        with self.lock:
+            if self.thread is None:
+                atexit.register(self.flush)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='view-tracking', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        """ Flushes every interval, or as soon as too many posts are pending. """
+        while True:
+            self.wake.wait(settings.VIEW_TRACKING_FLUSH_INTERVAL)
+            self.wake.clear()
+            close_old_connections()
+            self.flush()
+
+
+view_buffer = ViewBuffer()
@@ -2,9 +2,11 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from blog_posts.views import (CommentViewSet, PostCommentViewSet, PostViewSet,
+from blog_posts.views import (AuthorSummaryViewSet, ChangeViewSet,
+                              CommentViewSet, ExportViewSet,
+                              PostCommentViewSet, PostViewSet,
                               ReportPostViewSet, ReviewReportViewSet,
-                              VotePostViewSet)
+                              TagViewSet, VotePostViewSet)
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSet, basename='post')
@@ -13,6 +15,10 @@ router.register(r'post_comment', PostCommentViewSet , basename='comment')
 router.register(r'reports', ReportPostViewSet, basename='report')
 router.register(r'review_reports', ReviewReportViewSet, basename='review_report')
 router.register(r'votes', VotePostViewSet, basename='vote')
+router.register(r'export', ExportViewSet, basename='export')
+router.register(r'changes', ChangeViewSet, basename='change')
+router.register(r'users', AuthorSummaryViewSet, basename='author')
+router.register(r'tags', TagViewSet, basename='tag')
 
 urlpatterns = [
     path('', include(router.urls)),
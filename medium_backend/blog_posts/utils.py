@@ -1,7 +1,13 @@
 """ Functions to be used in the views """
+import math
+
+from django.db.models import F
+from django.db.models.functions import Greatest
 from rest_framework import filters, request
 
-from blog_posts.constant import DEFAULT_POST_SEAERCH_FIELDS, STATUS_CHOICES
+from blog_posts.constant import (DEFAULT_POST_SEAERCH_FIELDS, EXCERPT_LENGTH,
+                                 IN_CLAUSE_CHUNK_SIZE, STATUS_CHOICES,
+                                 WORDS_PER_MINUTE)
 
 
 def vaidate_report_status(report_status):
@@ -15,3 +21,35 @@ class DynamicSearchFilter(filters.SearchFilter):
     def get_search_fields(self, view, request):
         """ Dynamically search fields based on parameter passed in request """
         return request.GET.getlist('search_fields', DEFAULT_POST_SEAERCH_FIELDS)
+
+
+def in_chunks(values, size=IN_CLAUSE_CHUNK_SIZE):
+    """ Yields successive slices of ``values`` holding at most ``size`` items. """
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def get_text_stats(content):
+    """ Returns the excerpt, word count and reading time in minutes of a post content. """
+    words = content.split()
+    excerpt = ' '.join(words)
+    if len(excerpt) > EXCERPT_LENGTH:
+        excerpt = excerpt[:EXCERPT_LENGTH - 1]
+        excerpt = (excerpt.rsplit(' ', 1)[0] if ' ' in excerpt else excerpt) + '…'
+    return excerpt, len(words), math.ceil(len(words) / WORDS_PER_MINUTE)
+
+
+def get_vote_state(upvote):
+    """ Returns 'up', 'down' or 'none' for the upvote flag of a vote, None without a vote. """
+    if upvote is None:
+        return 'none'
+    return 'up' if upvote else 'down'
+
+
+def increment(model, pk, field, delta, floor=0):
+    """
+    Atomically adds ``delta`` to a counter column, in SQL so concurrent writers
+    never lose an update. Counters never go below ``floor``, unless it is None.
+    """
+    value = F(field) + delta
+    model.objects.filter(pk=pk).update(**{field: value if floor is None else Greatest(value, floor)})
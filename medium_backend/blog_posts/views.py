@@ -1,28 +1,73 @@
 """ Views Definition for the Blog Posts """
-from django.db import IntegrityError
-from rest_framework import generics, mixins, status, viewsets
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, mixins, serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
-from blog_posts.constant import POST_REQ_FIELDS
-from blog_posts.models import AssignedTag, Comment, Post, Report, Tag, Vote
+from blog_posts.autocomplete import tag_index
+from blog_posts.bulk import bulk_create_posts
+from blog_posts.changes import (CHANGE_FEEDS, get_head, read_changes,
+                                wait_for_changes)
+from blog_posts.constant import (AUTHOR_RECENT_POSTS, CHANGES_MAX_WAIT,
+                                 EXPORT_CHUNK_SIZE, EXPORT_FORMATS,
+                                 EXPORT_MAX_CHUNK_SIZE, POST_BATCH_MAX_SIZE,
+                                 POST_REQ_FIELDS, RELATED_POSTS_SIZE,
+                                 TAG_AUTOCOMPLETE_SIZE)
+from blog_posts.duplicates import (check_duplicates, find_duplicates,
+                                   get_stored_signature)
+from blog_posts.exports import (CONTENT_TYPES, EXPORTS, parse_since,
+                                stream_export)
+from blog_posts.models import (AssignedTag, AuthorStats, Comment, Post,
+                               Report, Tag, Vote)
+from blog_posts.pagination import ReplyCursorPagination
 from blog_posts.permissions import (CommentOwnerOrReadOnly,
                                     PostOwnerOrReadOnly, ReportOwnerOrReadOnly)
-from blog_posts.serializer import (CommentSerializer, PostSerializer,
-                                   ReportSerializer, VoteSerializer)
+from blog_posts.projections import (CommentProjection, PostProjection,
+                                    ProjectedListModelMixin, VoteProjection)
+from blog_posts.purge import soft_delete_post
+from blog_posts.related import related_index
+from blog_posts.serializer import (AuthorSummarySerializer, CommentSerializer,
+                                   PostBatchItemSerializer, PostSerializer,
+                                   ReplySerializer, ReportSerializer,
+                                   VoteSerializer)
+from blog_posts.summaries import (VOTE_SUMMARY_BUCKETS, summarize_rollups,
+                                  summarize_votes)
+from blog_posts.tasks import purge_deleted_post
+from blog_posts.tracking import get_viewer_key, view_buffer
 from blog_posts.utils import DynamicSearchFilter, vaidate_report_status
+from medium_backend.fieldsets import SparseFieldsetViewMixin
 
 
 # Create your views here.
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ProjectedListModelMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     ''' API endpoint that allows posts to be viewed, created, updated or deleted. '''
-    queryset = Post.objects.all()
+    queryset = Post.objects.defer('viewers_sketch')
     filter_backends = (DynamicSearchFilter,)
     serializer_class = PostSerializer
+    projection_class = PostProjection
+    sparse_required_columns = ('posted_by',)
     permission_classes = [IsAuthenticated, PostOwnerOrReadOnly]
+    throttle_scopes = {'upvote': 'vote', 'downvote': 'vote', 'unvote': 'vote'}
     lookup_field = 'pk'
 
+    def get_queryset(self):
+        """ Annotates the vote of the current user on the posts, for the my_vote field. """
+        queryset = super().get_queryset()
+        if 'my_vote' in self.get_serializer().fields:
+            queryset = Post.annotate_my_vote(queryset, getattr(self.request, 'user', None))
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        """ Returns the post and counts the view, in the buffer flushed by blog_posts.tracking. """
+        instance = self.get_object()
+        view_buffer.record(instance.pk, get_viewer_key(request))
+        return Response(self.get_serializer(instance).data)
+
     def create(self, request, *args, **kwargs):
         ''' Create a new post associated with the user. '''
         # if some field is missing, return error
@@ -45,6 +90,7 @@ class PostViewSet(viewsets.ModelViewSet):
         if request.data.get('tags'):
             for tag in request.data['tags']:
                 AssignedTag.objects.create(post=post, tag=Tag.objects.get(name=tag))
+        check_duplicates(post)
 
         return Response(PostSerializer(post).data, status=status.HTTP_201_CREATED)
     
@@ -71,7 +117,54 @@ class PostViewSet(viewsets.ModelViewSet):
             for tag in self.get_object().assigned_tags.all():
                 tag.delete()
         return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        """ Saves the post and checks its new content for duplicates. """
+        check_duplicates(serializer.save())
+
+    def perform_destroy(self, instance):
+        """
+        Soft deletes the post, hidden at once whatever its size. Its comments, votes and
+        other rows are deleted in the background by the purge_deleted_post job.
+        """
+        with transaction.atomic():
+            if soft_delete_post(instance):
+                purge_deleted_post.enqueue_on_commit(key=f'purge-post-{instance.pk}', post_id=instance.pk)
     
+    @action(detail=False, methods=['post'])
+    def batch(self, request, *args, **kwargs):
+        """
+        Create many posts at once from a list of {title, content, tags}.
+        All items are validated first, the valid ones are then bulk inserted.
+        """
+        items = request.data.get('posts') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'posts': 'Expected a non-empty list of posts.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > POST_BATCH_MAX_SIZE:
+            return Response({'posts': f'At most {POST_BATCH_MAX_SIZE} posts per batch.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results, valid = [], []
+        for index, item in enumerate(items):
+            serializer = PostBatchItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results.append({'index': index, 'errors': serializer.errors})
+
+        post_ids = bulk_create_posts(request.user, [data for _, data in valid])
+        results.extend({'index': index, 'id': post_id} for (index, _), post_id in zip(valid, post_ids))
+        results.sort(key=lambda result: result['index'])
+
+        if not valid:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(valid) < len(items):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response({'created': len(post_ids), 'failed': len(items) - len(post_ids), 'results': results},
+                        status=response_status)
+
     @action(detail=True)
     def upvote(self, request, *args, **kwargs):
         """ Upvote the post action. """
@@ -90,14 +183,41 @@ class PostViewSet(viewsets.ModelViewSet):
         post = self.get_object()
         return Response(post.unvote(request.user))
 
+    @action(detail=True, permission_classes=[IsAuthenticated, IsAdminUser])
+    def duplicates(self, request, *args, **kwargs):
+        """ Moderators: the near-duplicates of the post, most similar first, from the LSH index. """
+        post = self.get_object()
+        duplicates = find_duplicates(post.pk, get_stored_signature(post.pk))
+        titles = dict(Post.objects.filter(pk__in=[post_id for post_id, _ in duplicates]).values_list('pk', 'title'))
+        return Response([{'id': post_id, 'title': titles[post_id], 'similarity': similarity}
+                         for post_id, similarity in duplicates])
+
+    @action(detail=True)
+    def related(self, request, *args, **kwargs):
+        """
+        Posts sharing the most, and the rarest, tags with the post, best first, scored
+        by the in-memory index of blog_posts.related. ``?limit=`` up to RELATED_POSTS_MAX.
+        """
+        post = self.get_object()
+        try:
+            limit = min(int(request.query_params.get('limit', RELATED_POSTS_SIZE)), settings.RELATED_POSTS_MAX)
+        except ValueError:
+            raise serializers.ValidationError({'limit': 'Must be an integer.'})
+        related = related_index.get_related(post.pk, max(limit, 0))
+        posts = Post.annotate_my_vote(Post.objects.filter(pk__in=[post_id for post_id, _ in related]), request.user)
+        data = {item['id']: item for item in PostProjection(self.get_serializer_context()).project(posts)}
+        return Response([{**data[post_id], 'score': score} for post_id, score in related if post_id in data])
 
-class CommentViewSet(viewsets.ModelViewSet):
+
+class CommentViewSet(ProjectedListModelMixin, viewsets.ModelViewSet):
     """
     This viewset automatically provides list and detail, create, update actions for Comment Model.
     """
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.of_live_posts()
     serializer_class = CommentSerializer
+    projection_class = CommentProjection
     permission_classes = [IsAuthenticated, CommentOwnerOrReadOnly]
+    throttle_scopes = {'create': 'comment'}
     lookup_field = 'id'
 
     def perform_create(self, serializer):
@@ -106,18 +226,27 @@ class CommentViewSet(viewsets.ModelViewSet):
         """
         serializer.save(owner=self.request.user)
 
+    @action(detail=True, pagination_class=ReplyCursorPagination)
+    def replies(self, request, *args, **kwargs):
+        """ Page through the replies of a comment, ?cursor= continues from the reply_cursor. """
+        queryset = self.get_object().children().select_related('owner')
+        page = self.paginate_queryset(queryset)
+        serializer = ReplySerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
 
-class PostCommentViewSet(viewsets.GenericViewSet, mixins.ListModelMixin):
+class PostCommentViewSet(ProjectedListModelMixin, viewsets.GenericViewSet, mixins.ListModelMixin):
     """ This viewset list all the comments of the post passed in the query params. """
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.of_live_posts()
     serializer_class = CommentSerializer
+    projection_class = CommentProjection
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """
         This view should return a list of all the comments of the post.
         """
-        queryset = Comment.objects.all()
+        queryset = Comment.objects.of_live_posts()
         post_id = self.request.query_params.get('post', None)
         if post_id:
             queryset = queryset.filter(post__id=int(post_id), parent = None)
@@ -128,9 +257,10 @@ class ReportPostViewSet(viewsets.ModelViewSet):
     """
     Viewset providing all create, list, update and detail actions for Report Model.
     """
-    queryset = Report.objects.all()
+    queryset = Report.objects.of_live_posts()
     serializer_class = ReportSerializer
     permission_classes = [IsAuthenticated, ReportOwnerOrReadOnly]
+    throttle_scopes = {'create': 'report'}
     lookup_field = 'id'
 
     def create(self, request, *args, **kwargs):
@@ -156,7 +286,7 @@ class ReportPostViewSet(viewsets.ModelViewSet):
 
 class ReviewReportViewSet(viewsets.GenericViewSet, mixins.UpdateModelMixin):
     """ Allow admin to review the report """
-    queryset = Report.objects.all()
+    queryset = Report.objects.of_live_posts()
     serializer_class = ReportSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
     lookup_field = 'id'
@@ -175,10 +305,11 @@ class ReviewReportViewSet(viewsets.GenericViewSet, mixins.UpdateModelMixin):
         return Response(instance.status, status=status.HTTP_200_OK)
 
 
-class VotePostViewSet(viewsets.GenericViewSet, mixins.ListModelMixin):
+class VotePostViewSet(ProjectedListModelMixin, viewsets.GenericViewSet, mixins.ListModelMixin):
     """ Allow user to vote on the post """
-    queryset = Vote.objects.all()
+    queryset = Vote.objects.of_live_posts()
     serializer_class = VoteSerializer
+    projection_class = VoteProjection
     permission_classes = [IsAuthenticated]
     http_method_names = ['get']
 
@@ -186,12 +317,177 @@ class VotePostViewSet(viewsets.GenericViewSet, mixins.ListModelMixin):
         """
         This view should return a list of all the votes for the post passed in the query params.
         """
-        queryset = Vote.objects.all()
+        queryset = Vote.objects.of_live_posts()
         post_id = self.request.query_params.get('post', None)
         if post_id:
             queryset = queryset.filter(post=int(post_id))
         return queryset
 
+    @action(detail=False)
+    def summary(self, request, *args, **kwargs):
+        """
+        Up and down votes of a post per hour or day of voting.
+        ?post=<id>&bucket=hour|day
+        """
+        try:
+            post_id = int(request.query_params['post'])
+        except (KeyError, ValueError):
+            return Response({'post': 'A post id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in VOTE_SUMMARY_BUCKETS:
+            content = {'bucket': f'Invalid bucket. Choose from {", ".join(VOTE_SUMMARY_BUCKETS)}.'}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+
+        summarize = summarize_rollups if settings.VOTE_SUMMARY_USE_ROLLUP else summarize_votes
+        # The votes of a soft deleted post stay until it is purged.
+        rows = summarize(post_id, bucket) if Post.objects.filter(pk=post_id).exists() else []
+        period_field = serializers.DateTimeField()
+        return Response({
+            'post': post_id,
+            'bucket': bucket,
+            'results': [
+                {'period': period_field.to_representation(row['period']),
+                 'upvotes': row['upvotes'], 'downvotes': row['downvotes']}
+                for row in rows
+            ],
+        })
+
     def retrieve(self, request, *args, **kwargs):
         """ Block the retrieve action """
         return Response({"message" :"Method Not Allowed"}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Allow admin to stream whole tables as NDJSON or CSV.
+
+    List:
+        Return the available exports.
+
+    Retrieve:
+        Stream an export, ?output=ndjson|csv&since=<ISO datetime on modified>&chunk_size=<rows, at most 10000>
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    lookup_field = 'name'
+
+    def list(self, request, *args, **kwargs):
+        """ List the available exports and formats. """
+        return Response({'exports': list(EXPORTS), 'formats': EXPORT_FORMATS})
+
+    def retrieve(self, request, name=None, *args, **kwargs):
+        """ Stream the rows of the export, reading the table in chunks. """
+        if name not in EXPORTS:
+            return Response({'error': f'Unknown export {name}.'}, status=status.HTTP_404_NOT_FOUND)
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            content = {'error': f'Invalid output format. Choose from {", ".join(EXPORT_FORMATS)}.'}
+            return Response(content, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            since = parse_since(request.query_params['since']) if request.query_params.get('since') else None
+            chunk_size = int(request.query_params.get('chunk_size', EXPORT_CHUNK_SIZE))
+        except ValueError as err:
+            return Response({'error': str(err)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            stream_export(name, export_format, since=since,
+                          chunk_size=min(max(chunk_size, 1), EXPORT_MAX_CHUNK_SIZE)),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{name}.{export_format}"'
+        return response
+
+
+class ChangeViewSet(viewsets.ViewSet):
+    """
+    Delta feed of the writes to posts, comments, votes, reports and assigned tags.
+
+    List:
+        ?since=<cursor> returns the changes after the cursor, compacted to the last
+        change of each object, and the cursor to continue from. Without since, only
+        returns the current cursor, to start syncing after a full download.
+        ?wait=<seconds> long polls until a change arrives, ?feeds=posts,comments
+        restricts the feeds. Reports are only listed to admins.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request, *args, **kwargs):
+        """ Return the compacted changes after the since cursor. """
+        feeds = [feed for feed in CHANGE_FEEDS if request.user.is_staff or feed != 'reports']
+        if request.query_params.get('feeds'):
+            requested = request.query_params['feeds'].split(',')
+            unknown = sorted(set(requested) - set(feeds))
+            if unknown:
+                return Response({'feeds': f'Unknown feeds: {", ".join(unknown)}.'}, status=status.HTTP_400_BAD_REQUEST)
+            feeds = [feed for feed in feeds if feed in requested]
+        if 'since' not in request.query_params:
+            return Response({'cursor': get_head(), 'has_more': False, 'changes': []})
+        try:
+            since = int(request.query_params['since'])
+            wait = min(float(request.query_params.get('wait', 0)), CHANGES_MAX_WAIT)
+        except ValueError as err:
+            return Response({'error': str(err)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if wait > 0:
+            wait_for_changes(since, feeds, wait)
+        return Response(read_changes(since, feeds))
+
+
+class AuthorSummaryViewSet(viewsets.GenericViewSet):
+    """
+    Summary:
+        Return the profile of a user with the number of posts, total votes and
+        comments they received, and their latest posts.
+    """
+    queryset = AuthorStats.objects.select_related('user', 'user__profile')
+    serializer_class = AuthorSummarySerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'user__username'
+    lookup_url_kwarg = 'username'
+    lookup_value_regex = '[^/]+'
+
+    def get_object(self):
+        """
+        The stats row of the user, created when missing: users loaded with loaddata
+        get none from the signals, its counts are then filled by reconcile_counts.
+        Only an unknown username is a 404.
+        """
+        username = self.kwargs[self.lookup_url_kwarg]
+        stats = self.get_queryset().filter(user__username=username).first()
+        if stats is None:
+            AuthorStats.objects.get_or_create(user=get_object_or_404(User, username=username))
+            stats = self.get_queryset().get(user__username=username)
+        self.check_object_permissions(self.request, stats)
+        return stats
+
+    @action(detail=True)
+    def summary(self, request, *args, **kwargs):
+        """ Serve the author page from their stats row and one page of their posts. """
+        stats = self.get_object()
+        posts = Post.objects.filter(posted_by_id=stats.user_id).order_by('-created')
+        posts = Post.annotate_my_vote(posts, request.user)[:AUTHOR_RECENT_POSTS]
+        data = self.get_serializer(stats).data
+        data['recent_posts'] = PostProjection(self.get_serializer_context()).project(posts)
+        return Response(data)
+
+
+class TagViewSet(viewsets.ViewSet):
+    """
+    Summary:
+        Suggest tags for what the user has typed so far.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=False)
+    def autocomplete(self, request, *args, **kwargs):
+        """
+        The most used tags starting with ``?q=``, case insensitive, from the in-memory
+        prefix index of blog_posts.autocomplete. ``?limit=`` up to TAG_AUTOCOMPLETE_MAX.
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', TAG_AUTOCOMPLETE_SIZE)), settings.TAG_AUTOCOMPLETE_MAX)
+        except ValueError:
+            raise serializers.ValidationError({'limit': 'Must be an integer.'})
+        prefix = request.query_params.get('q', '').strip()
+        if not prefix:
+            return Response([])
+        return Response([{'name': name, 'count': count} for name, count in tag_index.suggest(prefix, max(limit, 0))])
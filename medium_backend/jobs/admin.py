@@ -0,0 +1,11 @@
+""" Admin panel for the jobs module """
+from django.contrib import admin
+
+from jobs.models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'key', 'status', 'attempts', 'run_at', 'locked_by')
+    list_filter = ('status', 'name')
+
+admin.site.register(Job, JobAdmin)
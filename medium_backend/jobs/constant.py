@@ -0,0 +1,12 @@
+""" Constants of the jobs app """
+PENDING = 'pending'
+RUNNING = 'running'
+FAILED = 'failed'
+STATUS_CHOICES = [
+    (PENDING, 'Pending'),
+    (RUNNING, 'Running'),
+    (FAILED, 'Failed'),
+]
+# Jobs holding a key are unique among these statuses.
+ACTIVE_STATUSES = [PENDING, RUNNING]
+WORKER_MODES = ['thread', 'process']
@@ -0,0 +1,60 @@
+""" Runs a pool of job workers """
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.constant import WORKER_MODES
+from jobs.queue import work
+
+
+def run_process_worker(worker_name, stop, burst, poll_interval):
+    """ Entry point of a worker process, stopped through the shared event only. """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    work(worker_name, stop, burst=burst, poll_interval=poll_interval)
+
+
+class Command(BaseCommand):
+    """ python manage.py run_workers --workers 4 --mode process [--burst] """
+    help = 'Runs queued jobs with a pool of worker threads or processes until interrupted.'
+
+    def add_arguments(self, parser):
+        """ Pool size and kind, polling and stop conditions. """
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--mode', choices=WORKER_MODES, default='thread')
+        parser.add_argument('--poll-interval', type=float, help='Seconds between polls of an empty queue.')
+        parser.add_argument('--burst', action='store_true', help='Stop once the queue is empty.')
+
+    def handle(self, *args, **options):
+        """ Starts the workers, stops them gracefully on SIGINT/SIGTERM after their current job. """
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        if options['mode'] == 'process':
+            # Children must not share the connections of the parent.
+            connections.close_all()
+            stop = multiprocessing.Event()
+            workers = [
+                multiprocessing.Process(target=run_process_worker, name=f'{prefix}:{index}',
+                                        args=(f'{prefix}:{index}', stop, options['burst'], options['poll_interval']))
+                for index in range(options['workers'])
+            ]
+        else:
+            stop = threading.Event()
+            workers = [
+                threading.Thread(target=work, name=f'{prefix}:{index}', args=(f'{prefix}:{index}', stop),
+                                 kwargs={'burst': options['burst'], 'poll_interval': options['poll_interval']})
+                for index in range(options['workers'])
+            ]
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+        self.stdout.write(f'Starting {len(workers)} {options["mode"]} workers.')
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped.'))
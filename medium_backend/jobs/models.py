@@ -0,0 +1,36 @@
+""" Models declaration for the jobs app """
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django_extensions.db.models import TimeStampedModel
+
+from jobs.constant import ACTIVE_STATUSES, PENDING, STATUS_CHOICES
+
+
+class Job(TimeStampedModel):
+    """
+    A task call waiting to run, or failed for good. Succeeded jobs are deleted.
+    """
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    key = models.CharField(max_length=200, null=True, blank=True,
+                           help_text='deduplicates the pending and running jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta(TimeStampedModel.Meta):
+        """
+        Meta class for the job key uniqueness and the index of the workers polling.
+        """
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=Q(status__in=ACTIVE_STATUSES), name='unique_active_job_key'),
+        ]
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f'{self.name} ({self.status}, attempt {self.attempts}/{self.max_attempts})'
@@ -0,0 +1,132 @@
+"""
+Durable job queue kept in the database, for side effects which don't belong in the request.
+
+Tasks are plain functions registered with ``@task``, called with JSON serializable
+keyword arguments. Workers started by ``manage.py run_workers`` claim due jobs with a
+conditional UPDATE, which works on every database without row locks: of two workers
+claiming the same job, only one matches the pending row. A failed job is retried with
+exponential backoff, then kept as failed. Jobs of a worker which died are claimed
+again once their lock is older than JOBS_LOCK_TIMEOUT.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.constant import ACTIVE_STATUSES, FAILED, PENDING, RUNNING
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """
+    Registers a function as a task, by default under its dotted path.
+    ``func.enqueue(**kwargs)`` and ``func.enqueue_on_commit(**kwargs)`` queue a call.
+    """
+    if func is None:
+        return partial(task, name=name, max_attempts=max_attempts)
+    func.task_name = name or f'{func.__module__}.{func.__name__}'
+    func.max_attempts = max_attempts
+    func.enqueue = partial(enqueue, func)
+    func.enqueue_on_commit = partial(enqueue_on_commit, func)
+    TASKS[func.task_name] = func
+    return func
+
+
+def enqueue(func, key=None, run_at=None, **kwargs):
+    """
+    Queues a call of the task. With a ``key``, returns the pending or running job
+    holding the same key instead of queueing a duplicate.
+
+    Inside a transaction, the job is only visible to the workers once it commits and
+    is discarded if it rolls back.
+    """
+    job = Job(
+        name=func.task_name, kwargs=kwargs, key=key, run_at=run_at or timezone.now(),
+        max_attempts=func.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.filter(key=key, status__in=ACTIVE_STATUSES).first()
+    return job
+
+
+def enqueue_on_commit(func, key=None, run_at=None, **kwargs):
+    """ Queues the call once the current transaction commits, right away without one. """
+    transaction.on_commit(partial(enqueue, func, key=key, run_at=run_at, **kwargs))
+
+
+def get_backoff(attempts):
+    """ Seconds to wait before the next attempt: exponential, capped, with jitter. """
+    delay = min(settings.JOBS_BACKOFF_BASE * 2 ** (attempts - 1), settings.JOBS_BACKOFF_MAX)
+    return delay * random.uniform(0.75, 1.25)
+
+
+def claim_job(worker_name):
+    """ Claims the next due job for the worker, None when there is none. """
+    now = timezone.now()
+    due = Q(status=PENDING, run_at__lte=now) | Q(
+        status=RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    )
+    for job_id in Job.objects.filter(due).order_by('run_at').values_list('id', flat=True)[:10]:
+        claimed = Job.objects.filter(due, id=job_id).update(
+            status=RUNNING, locked_by=worker_name, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """ Runs a claimed job: deletes it on success, schedules a retry or fails it on error. """
+    try:
+        func = TASKS[job.name]
+        func(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            retry_at = timezone.now() + timedelta(seconds=get_backoff(job.attempts))
+            logger.warning('Job %s %s failed, retry %s at %s', job.id, job.name, job.attempts, retry_at)
+            Job.objects.filter(id=job.id).update(status=PENDING, run_at=retry_at, locked_by='', locked_at=None,
+                                                 last_error=error)
+        else:
+            logger.error('Job %s %s failed after %s attempts', job.id, job.name, job.attempts)
+            Job.objects.filter(id=job.id).update(status=FAILED, locked_by='', last_error=error)
+        return False
+    Job.objects.filter(id=job.id).delete()
+    return True
+
+
+def work(worker_name, stop, burst=False, poll_interval=None):
+    """
+    Runs jobs until ``stop`` (an Event) is set, or the queue is empty with ``burst``.
+    Returns the number of jobs run.
+    """
+    poll_interval = settings.JOBS_POLL_INTERVAL if poll_interval is None else poll_interval
+    done = 0
+    while not stop.is_set():
+        close_old_connections()
+        job = claim_job(worker_name)
+        if job is None:
+            if burst:
+                break
+            stop.wait(poll_interval)
+            continue
+        run_job(job)
+        done += 1
+    close_old_connections()
+    return done
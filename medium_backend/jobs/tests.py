@@ -0,0 +1,78 @@
+""" Tests for the jobs queue """
+import threading
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.constant import FAILED, PENDING
+from jobs.models import Job
+from jobs.queue import task, work
+
+calls = []
+
+
+@task(max_attempts=2)
+def record(value):
+    """ Records its calls. """
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    """ Always fails. """
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    """ Enqueueing, deduplication, retries and workers. """
+
+    def setUp(self):
+        """ No recorded call. """
+        calls.clear()
+
+    def run_workers(self):
+        """ Runs a worker until the queue is empty. """
+        return work('test-worker', threading.Event(), burst=True)
+
+    def test_run_and_delete(self):
+        """ A succeeded job runs once and leaves the queue. """
+        record.enqueue(value=1)
+        self.assertEqual(self.run_workers(), 1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_key_deduplicates_active_jobs(self):
+        """ A key is unique among the pending and running jobs only. """
+        first = record.enqueue(key='same', value=1)
+        self.assertEqual(record.enqueue(key='same', value=2).id, first.id)
+        self.run_workers()
+        record.enqueue(key='same', value=3)
+        self.run_workers()
+        self.assertEqual(calls, [1, 3])
+
+    def test_enqueue_on_commit(self):
+        """ The job is only queued when the transaction commits. """
+        with self.captureOnCommitCallbacks() as callbacks:
+            record.enqueue_on_commit(value=1)
+            self.assertFalse(Job.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Job.objects.count(), 1)
+
+    @override_settings(JOBS_BACKOFF_BASE=60)
+    def test_retry_with_backoff_then_fail(self):
+        """ A failing job is retried later, then kept as failed. """
+        job = explode.enqueue()
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (PENDING, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        later = job.run_at + timezone.timedelta(seconds=1)
+        with mock.patch('jobs.queue.timezone.now', return_value=later), self.assertLogs('jobs.queue', 'ERROR'):
+            self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (FAILED, 2))
@@ -0,0 +1,2 @@
+# Connects the connection_created receivers before the first database connection.
+from medium_backend import db  # noqa: F401
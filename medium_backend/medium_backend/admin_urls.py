@@ -0,0 +1,6 @@
+""" URLs of the admin site, imported on its first request with LAZY_URLCONF """
+from django.contrib import admin
+
+app_name = 'admin'
+
+urlpatterns = admin.site.get_urls()
@@ -2,6 +2,8 @@
 ASGI config for medium_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The Server-Sent Events stream of live post counts is only served by this entrypoint,
+as a plain ASGI app in front of Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
@@ -13,4 +15,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medium_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the apps are loaded by get_asgi_application().
+from blog_posts.live import LIVE_COUNTS_PATH, live_counts  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """ Serves the live counts stream natively, everything else through Django. """
+    if scope['type'] == 'http' and scope['path'] == LIVE_COUNTS_PATH:
+        return await live_counts(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,142 @@
+"""
+Database routing between the primary and its read replicas, and connection setup.
+
+Reads of safe requests go to a random replica from ``DATABASE_REPLICAS``, everything
+else to the primary. A request which wrote, whatever its method (the vote actions are
+GETs), reads from the primary from then on, and its client sticks to the primary for
+``REPLICA_STICKY_SECONDS`` so it always reads its own writes.
+
+Every new SQLite connection is tuned with the ``SQLITE_PRAGMAS`` setting.
+"""
+import contextvars
+import hashlib
+import random
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRIMARY_DB = 'default'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+STICKY_CACHE_PREFIX = 'replica-sticky'
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+_request_writes = contextvars.ContextVar('request_writes', default=None)
+_query_counts = Counter()
+_write_counts = Counter()
+_query_counts_lock = threading.Lock()
+
+
+class PrimaryReplicaRouter:
+    """ Routes reads to the replicas while the current request allows it, writes to the primary. """
+
+    def db_for_read(self, model, **hints):
+        """ A random replica for reads of safe, non sticky requests which haven't written yet. """
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if replicas and _use_replica.get() and not has_written():
+            return random.choice(replicas)
+        return PRIMARY_DB
+
+    def db_for_write(self, model, **hints):
+        """ Writes always go to the primary. """
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """ The replicas hold the same data as the primary. """
+        return True
+
+
+def has_written():
+    """ Whether the current request wrote to the primary. """
+    writes = _request_writes.get()
+    return bool(writes and writes[PRIMARY_DB])
+
+
+def get_sticky_key(request):
+    """ Cache key identifying the client, by its token or its session. """
+    credentials = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return f'{STICKY_CACHE_PREFIX}:{hashlib.sha256(credentials.encode()).hexdigest()}'
+
+
+class ReplicaRoutingMiddleware:
+    """ Allows the replicas for safe requests, unless the client wrote recently. """
+
+    def __init__(self, get_response):
+        """ One-time configuration and initialization. """
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """ Flags the request as replica safe and pins the client once it wrote. """
+        if not getattr(settings, 'DATABASE_REPLICAS', []):
+            return self.get_response(request)
+
+        from django.core.cache import cache
+
+        sticky_key = get_sticky_key(request)
+        safe = request.method in SAFE_METHODS
+        token = _use_replica.set(safe and not (sticky_key and cache.get(sticky_key)))
+        writes_token = _request_writes.set(Counter())
+        try:
+            response = self.get_response(request)
+            wrote = has_written()
+        finally:
+            _request_writes.reset(writes_token)
+            _use_replica.reset(token)
+
+        if (wrote or not safe) and sticky_key and response.status_code < 400:
+            cache.set(sticky_key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+
+def count_queries(execute, sql, params, many, context):
+    """ Execute wrapper counting the queries, and the writes, sent to each database alias. """
+    alias = context['connection'].alias
+    write = sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+    with _query_counts_lock:
+        _query_counts[alias] += 1
+        if write:
+            _write_counts[alias] += 1
+    writes = _request_writes.get()
+    if write and writes is not None:
+        writes[alias] += 1
+    return execute(sql, params, many, context)
+
+
+def get_query_counts():
+    """ Returns the number of queries per database alias since the last reset. """
+    with _query_counts_lock:
+        return dict(_query_counts)
+
+
+def get_write_counts():
+    """ Returns the number of writes (INSERT, UPDATE, DELETE) per database alias since the last reset. """
+    with _query_counts_lock:
+        return dict(_write_counts)
+
+
+def reset_query_counts():
+    """ Resets the per alias query and write counters. """
+    with _query_counts_lock:
+        _query_counts.clear()
+        _write_counts.clear()
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    """ Counts the queries of every new connection. """
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """ Applies the SQLITE_PRAGMAS setting (WAL, busy_timeout, ...) to every new SQLite connection. """
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
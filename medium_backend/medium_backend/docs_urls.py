@@ -0,0 +1,11 @@
+""" URLs of the api docs, imported on their first request with LAZY_URLCONF """
+from django.urls import path
+
+from medium_backend.schema import SchemaUIView, schema_json
+
+app_name = 'docs'
+
+urlpatterns = [
+    path('swagger.json', schema_json, name='schema-json'),
+    path('', SchemaUIView.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+]
@@ -0,0 +1,84 @@
+""" Sparse fieldsets: ?fields= / ?exclude= trimming of serializers and the queried columns """
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def _split(value):
+    """ Splits a comma separated query parameter. """
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+
+def get_sparse_fields(request, available):
+    """
+    Returns the names of ``available`` kept by the ?fields= and ?exclude= parameters.
+
+    Only read requests are trimmed, writes always work on the whole serializer.
+    """
+    available = list(available)
+    if request is None or request.method not in SAFE_METHODS:
+        return available
+
+    fields = _split(request.query_params.get(FIELDS_PARAM))
+    exclude = _split(request.query_params.get(EXCLUDE_PARAM))
+    unknown = sorted(set(fields + exclude) - set(available))
+    if unknown:
+        raise ValidationError({FIELDS_PARAM: f'Unknown fields: {", ".join(unknown)}.'})
+    return [name for name in available if (not fields or name in fields) and name not in exclude]
+
+
+class SparseFieldsetMixin:
+    """
+    ModelSerializer mixin dropping the fields not requested by ?fields= / ?exclude=.
+
+    ``Meta.sparse_columns`` maps a field to the model columns it reads, for the fields
+    which are not plain model columns (nested relations, properties, reverse relations).
+    """
+    def __init__(self, *args, **kwargs):
+        """ Trims the fields once the context, and so the request, is known. """
+        super().__init__(*args, **kwargs)
+        kept = set(get_sparse_fields(self.context.get('request'), self.fields))
+        for name in list(self.fields):
+            if name not in kept:
+                self.fields.pop(name)
+
+    def get_sparse_columns(self):
+        """ Returns the model columns needed to represent the kept fields. """
+        sparse_columns = getattr(self.Meta, 'sparse_columns', {})
+        columns = []
+        for name, field in self.fields.items():
+            if name in sparse_columns:
+                columns.extend(sparse_columns[name])
+                continue
+            try:
+                model_field = self.Meta.model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete and not model_field.many_to_many:
+                columns.append(model_field.name)
+        return columns
+
+
+class SparseFieldsetViewMixin:
+    """
+    View mixin loading only the columns of the fields kept by the serializer.
+
+    Unrequested columns, like large text bodies, are deferred and never read.
+    ``sparse_required_columns`` lists the columns always loaded, e.g. for permissions.
+    """
+    sparse_required_columns = ()
+
+    def get_queryset(self):
+        """ Applies select_related()/only() matching the sparse fieldset on reads. """
+        queryset = super().get_queryset()
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return queryset
+
+        columns = self.get_serializer().get_sparse_columns()
+        related = {column.rsplit('__', 1)[0] for column in columns if '__' in column}
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(queryset.model._meta.pk.name, *self.sparse_required_columns, *columns)
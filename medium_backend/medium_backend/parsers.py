@@ -0,0 +1,27 @@
+""" JSON parsing shared by the apis, backed by orjson when it is installed """
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from medium_backend.renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """
+    Drop-in replacement for the DRF JSONParser using orjson.
+
+    orjson only reads UTF-8 and always rejects NaN/Infinity, other encodings or a
+    non strict configuration are still parsed by the stdlib json module.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """ Parses the incoming bytestream as JSON and returns the resulting data. """
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read() if stream is not None else b'')
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,54 @@
+""" JSON rendering shared by the apis, backed by orjson when it is installed """
+import json
+
+from django_countries.fields import Country
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+
+class JSONEncoder(encoders.JSONEncoder):
+    """ DRF JSONEncoder that also knows how to encode countries. """
+    def default(self, obj):
+        """ Encodes a country by its code, everything else like DRF does. """
+        if isinstance(obj, Country):
+            return obj.code
+        return super().default(obj)
+
+
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """
+    Serializes ``data`` to compact UTF-8 JSON bytes.
+
+    orjson only handles the native types itself, datetimes are passed through to the
+    JSONEncoder so both code paths produce the same strings for them.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for the DRF JSONRenderer using orjson for compact output.
+
+    Pretty printed or ascii-only output is still rendered by the stdlib json module.
+    """
+    encoder_class = JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """ Render `data` into JSON, returning a bytestring. """
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Keep the same strict javascript subset as the DRF renderer.
+        return dumps(data).replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
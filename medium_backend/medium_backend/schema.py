@@ -0,0 +1,159 @@
+"""
+OpenAPI schema of the apis, generated once per URLconf instead of on every request.
+
+drf_yasg walks every view and serializer to build the schema, which used to happen on
+each hit of the docs. The JSON document is now built once, kept in memory and on disk
+under SCHEMA_CACHE_DIR, and served with an ETag. Both are keyed by a fingerprint of the
+URLconf: its patterns, views, serializers and the source of their modules, so editing
+the api gives a new schema while restarts reuse the one on disk. Build it ahead of the
+first request with ``manage.py build_schema``.
+"""
+import hashlib
+import inspect
+import os
+import sys
+import tempfile
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import drf_yasg
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import URLResolver, get_resolver
+from django.views.decorators.http import condition, require_safe
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import OpenAPIRenderer, SwaggerJSONRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+API_INFO = openapi.Info(
+    title="Medium Swagger API Docs",
+    default_version='v1',
+    description="Test description",
+    terms_of_service="https://www.google.com/policies/terms/",
+)
+
+CachedSchema = namedtuple('CachedSchema', ['fingerprint', 'etag', 'content'])
+
+
+def iter_patterns(patterns, prefix=''):
+    """ Yields the full route and the pattern of every endpoint of the URLconf. """
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns, prefix + str(pattern.pattern))
+        else:
+            yield prefix + str(pattern.pattern), pattern
+
+
+def get_urlconf_fingerprint(resolver):
+    """ Hash of the endpoints of the URLconf and of the source of the modules behind them. """
+    digest = hashlib.sha256(drf_yasg.__version__.encode())
+    modules = set()
+    for route, pattern in iter_patterns(resolver.url_patterns):
+        view = getattr(pattern.callback, 'cls', pattern.callback)
+        serializer_class = getattr(view, 'serializer_class', None)
+        digest.update(f'{route} {view.__module__}.{view.__qualname__} '
+                      f'{getattr(pattern.callback, "actions", None)} {serializer_class}\n'.encode())
+        modules.update(cls.__module__ for cls in (view, serializer_class) if cls is not None)
+    for module in sorted(modules):
+        try:
+            digest.update(Path(inspect.getfile(sys.modules[module])).read_bytes())
+        except (KeyError, TypeError, OSError):
+            continue
+    return digest.hexdigest()[:16]
+
+
+def build_schema():
+    """ Generates the schema of the public apis as JSON bytes, like the drf_yasg views do. """
+    # The views are introspected with an anonymous request, the empty url keeps its
+    # host out of the schema so it is valid for every host serving it.
+    request = Request(APIRequestFactory().get('/'))
+    schema = OpenAPISchemaGenerator(API_INFO, url='').get_schema(request=request, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def get_schema_path(fingerprint):
+    """ File of the schema of a URLconf. """
+    return Path(settings.SCHEMA_CACHE_DIR) / f'openapi-{fingerprint}.json'
+
+
+def write_schema(path, content):
+    """ Writes the file atomically, so concurrent readers never see half of it. """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(content)
+    os.replace(temporary, path)
+    # Schemas of older URLconfs, running processes hold theirs in memory already.
+    for stale in path.parent.glob('openapi-*.json'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+class SchemaCache:
+    """ The schema of the current URLconf, loaded from disk or built at most once per URLconf. """
+
+    def __init__(self):
+        """ Nothing loaded until the first request. """
+        self.lock = threading.Lock()
+        self.resolver = None
+        self.schema = None
+
+    def get(self, rebuild=False):
+        """ Returns the CachedSchema, rebuilding it when the URLconf changed or with ``rebuild``. """
+        # get_resolver() is memoized until the URL caches are cleared, a new resolver
+        # is the only way the URLconf can change in a running process.
+        resolver = get_resolver()
+        schema = self.schema
+        if not rebuild and schema is not None and self.resolver is resolver:
+            return schema
+        with self.lock:
+            if not rebuild and self.schema is not None and self.resolver is resolver:
+                return self.schema
+            fingerprint = get_urlconf_fingerprint(resolver)
+            path = get_schema_path(fingerprint)
+            if rebuild or not path.exists():
+                write_schema(path, build_schema())
+            content = path.read_bytes()
+            self.schema = CachedSchema(fingerprint, f'"{hashlib.sha256(content).hexdigest()[:32]}"', content)
+            self.resolver = resolver
+            return self.schema
+
+    def clear(self):
+        """ Forgets the schema held in memory, the file stays. """
+        with self.lock:
+            self.resolver = self.schema = None
+
+
+schema_cache = SchemaCache()
+
+
+@require_safe
+@condition(etag_func=lambda request: schema_cache.get().etag)
+def schema_json(request):
+    """ Serves the cached OpenAPI schema, 304 when the client has it already. """
+    response = HttpResponse(schema_cache.get().content, content_type='application/json')
+    # Cached by the clients, but revalidated with the ETag on every use.
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+class SchemaUIView(get_schema_view(API_INFO, public=True, permission_classes=[permissions.AllowAny])):
+    """
+    Swagger UI page loading the schema from ``schema_json`` (SWAGGER_SETTINGS['SPEC_URL']).
+    The page itself only needs the title and version, the schema isn't generated for it.
+    """
+
+    def get(self, request, version='', format=None):
+        """ Renders the page, or the cached schema for ?format=openapi. """
+        if isinstance(request.accepted_renderer, (OpenAPIRenderer, SwaggerJSONRenderer)):
+            return schema_json(request._request)
+        if request.accepted_renderer.format not in ('swagger', 'redoc'):
+            return super().get(request, version, format)
+        return Response(openapi.Swagger(info=API_INFO, _prefix='/', paths=openapi.Paths({})))
@@ -48,10 +48,12 @@ INSTALLED_APPS = [
     'knox',
     'user_accounts',
     'blog_posts',
+    'jobs',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'medium_backend.db.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,9 +90,56 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('MEDIUM_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Applied to every new SQLite connection by medium_backend.db.apply_sqlite_pragmas.
+# WAL lets readers run alongside a writer and busy_timeout makes writers wait for
+# the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('MEDIUM_SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.environ.get('MEDIUM_SQLITE_SYNCHRONOUS', 'normal'),
+    'busy_timeout': int(os.environ.get('MEDIUM_SQLITE_BUSY_TIMEOUT', 10000)),
+    'mmap_size': int(os.environ.get('MEDIUM_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('MEDIUM_SQLITE_CACHE_SIZE', -32000)),
+}
+
+# Read replicas, e.g. MEDIUM_REPLICA_DATABASES=replica1.sqlite3,replica2.sqlite3
+# Replication itself happens outside of Django, tests mirror the primary.
+for index, replica_name in enumerate(filter(None, os.environ.get('MEDIUM_REPLICA_DATABASES', '').split(','))):
+    DATABASES[f'replica{index + 1}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / replica_name,
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['medium_backend.db.PrimaryReplicaRouter']
+
+# The throttles and the replica stickiness live in the cache, it has to be shared by
+# every worker process in production, e.g. MEDIUM_REDIS_URL=redis://localhost:6379/0
+# (needs the redis package). Falls back to the per-process memory cache.
+if os.environ.get('MEDIUM_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['MEDIUM_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a client keeps reading from the primary after its own write.
+REPLICA_STICKY_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -139,8 +188,95 @@ REST_FRAMEWORK = {
    'DEFAULT_AUTHENTICATION_CLASSES': (
          'knox.auth.TokenAuthentication',
    ),
+   'DEFAULT_RENDERER_CLASSES': (
+         'medium_backend.renderers.FastJSONRenderer',
+         'rest_framework.renderers.BrowsableAPIRenderer',
+   ),
+   'DEFAULT_PARSER_CLASSES': (
+         'medium_backend.parsers.FastJSONParser',
+         'rest_framework.parsers.FormParser',
+         'rest_framework.parsers.MultiPartParser',
+   ),
+   'DEFAULT_THROTTLE_CLASSES': (
+         'medium_backend.throttling.ScopedTokenBucketThrottle',
+   ),
+   # Bucket size / refill period per scope, views map their actions to a scope
+   # with `throttle_scopes`.
+   'DEFAULT_THROTTLE_RATES': {
+         'vote': os.environ.get('MEDIUM_THROTTLE_VOTE', '60/min'),
+         'report': os.environ.get('MEDIUM_THROTTLE_REPORT', '10/hour'),
+         'comment': os.environ.get('MEDIUM_THROTTLE_COMMENT', '30/min'),
+         'login': os.environ.get('MEDIUM_THROTTLE_LOGIN', '10/min'),
+   },
+}
+
+# Serve votes/summary/ from the hourly rollups kept by the vote signals instead of
+# counting the votes themselves. Rebuild them with `manage.py rebuild_vote_rollups`.
+VOTE_SUMMARY_USE_ROLLUP = bool(int(os.environ.get('MEDIUM_VOTE_SUMMARY_USE_ROLLUP', 1)))
+
+# Live counts streamed by the ASGI app (blog_posts.live): at most one event per post
+# every LIVE_COUNTS_INTERVAL seconds, and a keepalive comment on idle connections.
+LIVE_COUNTS_INTERVAL = float(os.environ.get('MEDIUM_LIVE_COUNTS_INTERVAL', 1))
+LIVE_COUNTS_KEEPALIVE = 15
+
+# Post views are buffered per process (blog_posts.tracking) and flushed every
+# VIEW_TRACKING_FLUSH_INTERVAL seconds, or early once that many posts are pending.
+# An interval of 0 disables the flushing thread, view_buffer.flush() is then explicit.
+VIEW_TRACKING_FLUSH_INTERVAL = float(os.environ.get('MEDIUM_VIEW_TRACKING_FLUSH_INTERVAL', 5))
+VIEW_TRACKING_MAX_PENDING = 1000
+
+# Related posts are scored from a per-process tag index (blog_posts.related), which
+# applies the logged tag changes at most every RELATED_POSTS_SYNC_INTERVAL seconds.
+# The top RELATED_POSTS_MAX posts are kept per post.
+RELATED_POSTS_SYNC_INTERVAL = float(os.environ.get('MEDIUM_RELATED_POSTS_SYNC_INTERVAL', 30))
+RELATED_POSTS_MAX = 20
+
+# Created and updated posts are checked for near-duplicates (blog_posts.duplicates):
+# posts whose estimated shingle similarity reaches the threshold. With auto reporting,
+# a duplicate of another author's post is reported for review, as an automatic report.
+DUPLICATE_SIMILARITY_THRESHOLD = float(os.environ.get('MEDIUM_DUPLICATE_SIMILARITY_THRESHOLD', 0.8))
+DUPLICATE_AUTO_REPORT = bool(int(os.environ.get('MEDIUM_DUPLICATE_AUTO_REPORT', 1)))
+
+# Tag suggestions are served from a per-process prefix index (blog_posts.autocomplete),
+# kept current by the signals of its own process and reloaded after TAG_AUTOCOMPLETE_MAX_AGE
+# seconds for the writes of the others. The top TAG_AUTOCOMPLETE_MAX tags are kept per prefix.
+TAG_AUTOCOMPLETE_MAX_AGE = float(os.environ.get('MEDIUM_TAG_AUTOCOMPLETE_MAX_AGE', 300))
+TAG_AUTOCOMPLETE_MAX = 50
+
+# Background jobs run by `manage.py run_workers` (jobs.queue), durations in seconds.
+JOBS_POLL_INTERVAL = 1
+JOBS_MAX_ATTEMPTS = 5
+JOBS_BACKOFF_BASE = 10
+JOBS_BACKOFF_MAX = 3600
+# Running jobs locked for longer are considered abandoned by a dead worker and run again.
+JOBS_LOCK_TIMEOUT = 600
+
+SWAGGER_SETTINGS = {
+    'DEFAULT_INFO': 'medium_backend.schema.API_INFO',
+    # The UI loads the schema cached by medium_backend.schema instead of generating it.
+    'SPEC_URL': 'docs:schema-json',
 }
+# Generated schemas, one file per URLconf fingerprint (`manage.py build_schema`).
+SCHEMA_CACHE_DIR = os.environ.get('MEDIUM_SCHEMA_CACHE_DIR', BASE_DIR / 'var' / 'schema')
+
+# Defers the import of the admin and docs URLconfs, with drf_yasg and the admin views,
+# to their first request, so workers serving the api start faster. On in production.
+LAZY_URLCONF = bool(int(os.environ.get('MEDIUM_LAZY_URLCONF', not DEBUG)))
+# Cold start budget of a worker in milliseconds, checked by `manage.py profile_startup`.
+STARTUP_TIME_BUDGET_MS = float(os.environ.get('MEDIUM_STARTUP_TIME_BUDGET_MS', 1500))
+
+# Password reset emails, sent by the job workers. SMTP unless MEDIUM_EMAIL_BACKEND says
+# otherwise, e.g. django.core.mail.backends.console.EmailBackend in development.
+EMAIL_BACKEND = os.environ.get('MEDIUM_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.environ.get('MEDIUM_EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('MEDIUM_EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('MEDIUM_EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('MEDIUM_EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = bool(int(os.environ.get('MEDIUM_EMAIL_USE_TLS', 0)))
+DEFAULT_FROM_EMAIL = os.environ.get('MEDIUM_DEFAULT_FROM_EMAIL', 'no-reply@medium.local')
 
 REST_KNOX = {
        'TOKEN_TTL': timedelta(hours=2),  # default time 2h
 }
+# Live tokens kept per user, logging in evicts the oldest ones beyond it.
+KNOX_MAX_TOKENS_PER_USER = int(os.environ.get('MEDIUM_KNOX_MAX_TOKENS_PER_USER', 5))
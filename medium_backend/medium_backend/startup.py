@@ -0,0 +1,73 @@
+"""
+Cold start profiling of the worker entrypoints, used by ``manage.py profile_startup``.
+
+A worker is ready once it imported its WSGI/ASGI entrypoint, which sets Django up, and
+loaded the URLconf on its first request. Both happen here in a fresh interpreter, timed
+from the outside, and once more under ``python -X importtime`` for the per-module
+breakdown.
+"""
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+ENTRYPOINTS = ('wsgi', 'asgi')
+
+ImportTime = namedtuple('ImportTime', ['module', 'depth', 'self_us', 'cumulative_us'])
+
+PROBE = (
+    "import {module}\n"
+    "from django.urls import resolve\n"
+    "resolve({path!r})\n"
+)
+
+
+def run_probe(entrypoint, path, environ=None, importtime=False):
+    """ Starts a worker like interpreter, returns its wall time in seconds and its stderr. """
+    if entrypoint not in ENTRYPOINTS:
+        raise ImproperlyConfigured(f'Unknown entrypoint {entrypoint}, one of {", ".join(ENTRYPOINTS)}.')
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, **(environ or {})}
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c',
+               PROBE.format(module=f'medium_backend.{entrypoint}', path=path)]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    duration = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f'Startup of {entrypoint} failed:\n{result.stderr[-2000:]}')
+    return duration, result.stderr
+
+
+def measure_startup(entrypoint, path, environ=None, repeat=3):
+    """ Best wall time in seconds of ``repeat`` cold starts. """
+    return min(run_probe(entrypoint, path, environ)[0] for _ in range(repeat))
+
+
+def parse_importtime(output):
+    """ ImportTime of every module imported, in import order. """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # header
+        imports.append(ImportTime(name.strip(), (len(name) - len(name.lstrip()) - 1) // 2,
+                                  int(self_us), int(cumulative_us)))
+    return imports
+
+
+def profile_imports(entrypoint, path, environ=None):
+    """ ImportTime of the modules imported by a cold start. """
+    return parse_importtime(run_probe(entrypoint, path, environ, importtime=True)[1])
+
+
+def group_by_package(imports):
+    """ Own import time of each top level package, in microseconds, slowest first. """
+    packages = defaultdict(int)
+    for entry in imports:
+        packages[entry.module.partition('.')[0]] += entry.self_us
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,254 @@
+""" Tests for the project wide modules of medium_backend """
+import datetime
+import decimal
+import importlib.util
+import json
+import os
+import sqlite3
+import tempfile
+import uuid
+from io import BytesIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase, override_settings
+from django.urls import include, path
+from django.utils.translation import gettext_lazy
+from django_countries.fields import Country
+from knox.models import AuthToken
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+
+from blog_posts.models import Post, Vote
+from medium_backend.db import get_query_counts, get_write_counts, reset_query_counts
+from medium_backend.parsers import FastJSONParser
+from medium_backend.renderers import FastJSONRenderer, orjson
+from medium_backend.schema import build_schema, schema_cache, schema_json
+from medium_backend.startup import profile_imports
+
+# URLconf without the blog_posts apis, for SchemaCacheTests.
+urlpatterns = [
+    path('api/', include('user_accounts.urls')),
+    path('swagger.json', schema_json),
+]
+
+
+@skipUnless(importlib.util.find_spec('orjson'), 'Compares the orjson path to the stdlib one.')
+class FastJSONTests(TestCase):
+    """ The orjson renderer and parser behave like their stdlib json fallbacks. """
+    DATA = {
+        'datetime': datetime.datetime(2022, 9, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'naive': datetime.datetime(2022, 9, 1, 12, 30),
+        'date': datetime.date(2022, 9, 1),
+        'time': datetime.time(8, 5, 3),
+        'decimal': decimal.Decimal('3.25'),
+        'lazy': gettext_lazy('Pending'),
+        'country': Country('PK'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'text': 'Ünïcode \u2028 line',
+        'nested': [{'id': 1, 'none': None, 'flag': True, 'ratio': 0.1}],
+        1: 'integer key',
+    }
+
+    def render(self, data, **kwargs):
+        """ Renders with the orjson path and the stdlib fallback, checks they agree and returns the bytes. """
+        rendered = FastJSONRenderer().render(data, **kwargs)
+        with mock.patch('medium_backend.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data, **kwargs), rendered)
+        return rendered
+
+    def test_renderer_parity(self):
+        """ Same bytes for datetimes, decimals, lazy strings, countries and UUIDs, pretty printed or not. """
+        rendered = self.render(self.DATA)
+        self.assertEqual(json.loads(rendered), {
+            'datetime': '2022-09-01T12:30:15.123456Z', 'naive': '2022-09-01T12:30:00', 'date': '2022-09-01',
+            'time': '08:05:03', 'decimal': 3.25, 'lazy': 'Pending', 'country': 'PK',
+            'uuid': '12345678-1234-5678-1234-567812345678', 'text': 'Ünïcode \u2028 line',
+            'nested': [{'id': 1, 'none': None, 'flag': True, 'ratio': 0.1}], '1': 'integer key',
+        })
+        self.assertIn(b'\\u2028', rendered)
+        self.assertEqual(self.render(None), b'')
+        pretty = self.render(self.DATA, accepted_media_type='application/json; indent=2')
+        self.assertEqual(json.loads(pretty), json.loads(rendered))
+
+    def parse(self, body):
+        """ Parses with the orjson path and the stdlib fallback, checks they agree and returns the data. """
+        data = FastJSONParser().parse(BytesIO(body))
+        with mock.patch('medium_backend.parsers.orjson', None):
+            self.assertEqual(FastJSONParser().parse(BytesIO(body)), data)
+        return data
+
+    def test_parser_parity(self):
+        """ Same data from both paths, malformed bodies raise a ParseError from both. """
+        self.assertEqual(self.parse('{"title": "Ünïcode", "tags": ["a", 1, 2.5, null, true]}'.encode()),
+                         {'title': 'Ünïcode', 'tags': ['a', 1, 2.5, None, True]})
+        for body in [b'{"title": ', b'{"a": NaN}', b"{'a': 1}", b'\xff\xfe']:
+            for fast in (True, False):
+                with self.subTest(body=body, fast=fast), self.assertRaises(ParseError):
+                    with mock.patch('medium_backend.parsers.orjson', orjson if fast else None):
+                        FastJSONParser().parse(BytesIO(body))
+
+    def test_malformed_body_is_a_bad_request(self):
+        """ The apis answer a malformed JSON body with a 400. """
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('author', 'author@example.com', 'password'))
+        for fast in (True, False):
+            with self.subTest(fast=fast), mock.patch('medium_backend.parsers.orjson', orjson if fast else None):
+                response = client.post('/api/posts/batch/', b'{"posts": [', content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('JSON parse error', response.json()['detail'])
+        self.assertEqual(Post.objects.count(), 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TestCase):
+    """ Reads of safe requests go to the replica, until the client writes. """
+
+    @classmethod
+    def setUpTestData(cls):
+        """ A post and the token of its author, copied to the replica. """
+        cls.author = User.objects.create_user('author', 'author@example.com', 'password')
+        cls.token = AuthToken.objects.create(cls.author)[1]
+        cls.post = Post.objects.create(posted_by=cls.author, title='Replicated', content='Body')
+
+    def setUp(self):
+        """
+        A SQLite file holding a copy of the primary as the replica1 alias, then a post
+        it doesn't have yet, as if replication lagged behind.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        name = os.path.join(directory.name, 'replica.sqlite3')
+        connection.ensure_connection()
+        replica = sqlite3.connect(name)
+        # A dump rather than a backup, which would wait for the transaction of the test.
+        replica.executescript('\n'.join(connection.connection.iterdump()))
+        replica.close()
+        connections.settings['replica1'] = {**connection.settings_dict, 'NAME': name}
+        self.addCleanup(self.remove_replica)
+
+        self.lagging_post = Post.objects.create(posted_by=self.author, title='Lagging', content='Body')
+        cache.clear()
+        self.addCleanup(cache.clear)
+        reset_query_counts()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def remove_replica(self):
+        """ Closes and forgets the replica1 alias. """
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.settings['replica1']
+
+    def listed_titles(self):
+        """ Titles of the posts listed by the api. """
+        response = self.client.get('/api/posts/?fields=title', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return sorted(post['title'] for post in response.json())
+
+    def test_safe_requests_read_from_the_replica(self):
+        """ The lagging post isn't listed, every query went to the replica. """
+        self.assertEqual(self.listed_titles(), ['Replicated'])
+        self.assertEqual(self.listed_titles(), ['Replicated'])
+        self.assertGreater(get_query_counts().get('replica1', 0), 0)
+        self.assertEqual(get_query_counts().get('default', 0), 0)
+        self.assertEqual(get_write_counts(), {})
+
+    def test_get_which_writes_pins_the_client(self):
+        """ The vote actions are GETs which write: the client then reads its writes from the primary. """
+        response = self.client.get(f'/api/posts/{self.post.pk}/upvote/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Vote.objects.filter(post=self.post, user=self.author, upvote=True).exists())
+        self.assertGreater(get_write_counts().get('default', 0), 0)
+        self.assertNotIn('replica1', get_write_counts())
+
+        reset_query_counts()
+        self.assertEqual(self.listed_titles(), ['Lagging', 'Replicated'])
+        self.assertNotIn('replica1', get_query_counts())
+
+    def test_unsafe_requests_use_the_primary(self):
+        """ A failed write neither reads from the replica nor pins the client. """
+        response = self.client.post('/api/comment/', {'post': self.lagging_post.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('replica1', get_query_counts())
+        self.assertEqual(self.listed_titles(), ['Replicated'])
+
+
+class SQLitePragmaTests(TestCase):
+    """ New SQLite connections are tuned with the SQLITE_PRAGMAS setting. """
+    SYNCHRONOUS = {'off': 0, 'normal': 1, 'full': 2, 'extra': 3}
+
+    def read_pragmas(self):
+        """ Opens a new connection to a database file and reads the pragmas back. """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(directory.name, 'db.sqlite3')},
+                                  alias='pragmas')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            return {name: cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in settings.SQLITE_PRAGMAS}
+
+    def test_configured_pragmas(self):
+        """ The journal mode, synchronous, busy_timeout, mmap_size and cache_size of the settings. """
+        expected = {**settings.SQLITE_PRAGMAS,
+                    'synchronous': self.SYNCHRONOUS[settings.SQLITE_PRAGMAS['synchronous'].lower()]}
+        self.assertEqual(self.read_pragmas(), expected)
+
+    def test_overridden_pragmas(self):
+        """ WAL and the other values of an override. """
+        pragmas = {'journal_mode': 'wal', 'synchronous': 'full', 'busy_timeout': 1234,
+                   'mmap_size': 1024 * 1024, 'cache_size': -2000}
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            self.assertEqual(self.read_pragmas(), {**pragmas, 'synchronous': 2})
+
+
+class SchemaCacheTests(TestCase):
+    """ The OpenAPI schema is generated once per URLconf and revalidated with its ETag. """
+
+    def setUp(self):
+        """ An empty schema directory. """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(SCHEMA_CACHE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        schema_cache.clear()
+        self.addCleanup(schema_cache.clear)
+
+    def test_generated_once(self):
+        """ Later hits, and restarts, reuse the schema; the UI page doesn't generate it. """
+        with mock.patch('medium_backend.schema.build_schema', wraps=build_schema) as build:
+            response = self.client.get('/swagger.json')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('/posts/', response.json()['paths'])
+            self.assertEqual(self.client.get('/swagger.json', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            self.assertEqual(self.client.get('/').status_code, 200)
+            schema_cache.clear()
+            self.assertEqual(self.client.get('/swagger.json').content, response.content)
+        self.assertEqual(build.call_count, 1)
+
+    def test_rebuilt_when_the_urlconf_changes(self):
+        """ A different URLconf has its own schema. """
+        etag = self.client.get('/swagger.json')['ETag']
+        with override_settings(ROOT_URLCONF=__name__):
+            response = self.client.get('/swagger.json')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotIn('/posts/', response.json()['paths'])
+
+
+class LazyURLConfTests(TestCase):
+    """ With LAZY_URLCONF, workers only import the docs once they are requested. """
+
+    def imported_modules(self, lazy, path):
+        """ Modules imported by a cold started worker serving ``path``. """
+        return {entry.module for entry in profile_imports('wsgi', path, {'MEDIUM_LAZY_URLCONF': lazy})}
+
+    def test_docs_are_deferred(self):
+        """ An api request doesn't import drf_yasg's generator, a docs request does. """
+        self.assertIn('drf_yasg.generators', self.imported_modules('0', '/api/posts/'))
+        self.assertNotIn('drf_yasg.generators', self.imported_modules('1', '/api/posts/'))
+        self.assertIn('drf_yasg.generators', self.imported_modules('1', '/swagger.json'))
@@ -0,0 +1,121 @@
+"""
+Token bucket throttling kept in Django's cache, shared by every worker process.
+
+The bucket is stored as its "theoretical arrival time" (GCRA): the time, in
+milliseconds, at which the bucket will be full again. Taking a token pushes it one
+refill interval forward, which is a single atomic ``cache.incr()`` whatever the
+backend. A request is allowed while that time stays within one period from now.
+
+Extra cache operations only happen on transitions: the first request of a client
+(``add``), a bucket found full again after idling (``set``) and a denied request,
+whose token is given back (``decr``) so hammering the api does not push the
+client's next allowed request further out.
+"""
+import time
+
+from django.core.cache import cache as default_cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle allowing bursts of ``num_requests`` refilled over ``duration`` seconds.
+
+    The rate uses the DRF format ('30/min') and is looked up by ``scope`` in the
+    DEFAULT_THROTTLE_RATES setting, unless ``rate`` is set on the class.
+    """
+    cache = default_cache
+    timer = time.time
+    cache_format = 'token-bucket:%(scope)s:%(ident)s'
+    scope = None
+    rate = None
+    # Keys outlive an idle bucket by this many periods before the cache drops them.
+    key_ttl_periods = 10
+
+    def get_scope(self, request, view):
+        """ Returns the scope of the request, None to not throttle it. """
+        return self.scope
+
+    def get_rate(self, scope):
+        """ Returns the rate string configured for the scope. """
+        if self.rate:
+            return self.rate
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[scope]
+        except KeyError:
+            raise ImproperlyConfigured(f"No default throttle rate set for '{scope}' scope")
+
+    def parse_rate(self, rate):
+        """ Returns the (number of requests, period in seconds) of a rate string. """
+        num, period = rate.split('/')
+        return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+    def get_cache_key(self, scope, request, view):
+        """ Buckets are per user, or per client address for anonymous requests. """
+        if request.user and request.user.is_authenticated:
+            ident = f'user-{request.user.pk}'
+        else:
+            ident = f'ip-{self.get_ident(request)}'
+        return self.cache_format % {'scope': scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        """ Takes a token from the bucket of the request's scope and client. """
+        self.wait_ms = None
+        scope = self.get_scope(request, view)
+        if scope is None:
+            return True
+        rate = self.get_rate(scope)
+        if rate is None:
+            return True
+
+        num_requests, duration = self.parse_rate(rate)
+        period = duration * 1000
+        interval = max(period // num_requests, 1)
+        key = self.get_cache_key(scope, request, view)
+        timeout = duration * self.key_ttl_periods
+        now = int(self.timer() * 1000)
+
+        arrival = self.take_token(key, interval, now, timeout)
+        if arrival is None:
+            return True
+        if arrival - interval < now:
+            # The bucket refilled completely while idle, start over from a full one.
+            self.cache.set(key, now + interval, timeout)
+            return True
+        if arrival - now > period:
+            self.cache.decr(key, interval)
+            self.wait_ms = arrival - now - period
+            return False
+        return True
+
+    def take_token(self, key, interval, now, timeout):
+        """ Returns the arrival time after taking a token, None for a new bucket. """
+        try:
+            return self.cache.incr(key, interval)
+        except ValueError:
+            if self.cache.add(key, now + interval, timeout):
+                return None
+            # Created by a concurrent request in between.
+            return self.cache.incr(key, interval)
+
+    def wait(self):
+        """ Seconds until the bucket holds a token again. """
+        if self.wait_ms is None:
+            return None
+        return self.wait_ms / 1000
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Token bucket throttle whose scope is picked per view action.
+
+    Views map their actions to scopes with ``throttle_scopes``, e.g.
+    ``{'upvote': 'vote', 'create': 'comment'}``. Other actions are not throttled
+    and cost no cache operation.
+    """
+
+    def get_scope(self, request, view):
+        """ Returns the scope of the view action. """
+        return getattr(view, 'throttle_scopes', {}).get(getattr(view, 'action', None))
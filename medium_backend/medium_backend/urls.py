@@ -15,29 +15,24 @@ Including another URLconf
 """
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib import admin
 from django.urls import include, path
 
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
 
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Medium Swagger API Docs",
-      default_version='v1',
-      description="Test description",
-      terms_of_service="https://www.google.com/policies/terms/",
-   ),
-   public=True,
-   permission_classes=[permissions.AllowAny],
-)
+def include_lazily(module, namespace):
+    """
+    include() of a namespaced URLconf which, with LAZY_URLCONF, is only imported once a
+    request is routed to it or one of its URLs is reversed.
+    """
+    if not settings.LAZY_URLCONF:
+        return include(module, namespace)
+    return module, namespace, namespace
+
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('admin/', include_lazily('medium_backend.admin_urls', 'admin')),
     path('api/', include('user_accounts.urls')),
     path('api/', include('blog_posts.urls')),
-    path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+    path('', include_lazily('medium_backend.docs_urls', 'docs')),
 ]
 
 if settings.DEBUG:
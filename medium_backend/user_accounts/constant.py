@@ -13,3 +13,8 @@ GENDER_CHOICES = (
 )
 CNIC_REGEX = re.compile("\d{5}\-\d{7}\-\d{1}")
 CONTACT_NO_REGEX = re.compile("\+\d{12}$")
+
+PASSWORD_RESET_SUBJECT = 'Reset your Medium password'
+PASSWORD_RESET_MESSAGE = ('Hi {username},\n\n'
+                          'Set a new password by posting it with the token of this link: {url}\n\n'
+                          'You can ignore this email if you did not ask for a password reset.')
@@ -0,0 +1,31 @@
+''' Deletes the expired knox tokens in batches '''
+from django.core.management.base import BaseCommand
+
+from user_accounts.tokens import get_token_stats, purge_expired_tokens
+
+
+class Command(BaseCommand):
+    """ python manage.py purge_expired_tokens --batch-size 1000 --pause 0.05 [--stats] """
+    help = 'Purges expired knox tokens in short batches and reports the token table size.'
+
+    def add_arguments(self, parser):
+        """ Batch size, pause between batches, report only. """
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+        parser.add_argument('--stats', action='store_true', help='Only report the token table size.')
+
+    def handle(self, *args, **options):
+        """ Reports the table size before and after the purge, and the purge throughput. """
+        self.write_stats('tokens', get_token_stats())
+        if options['stats']:
+            return
+        stats = purge_expired_tokens(
+            batch_size=max(options['batch_size'], 1), pause=options['pause'],
+            on_batch=lambda deleted: self.stdout.write(f'  ... {deleted} deleted'),
+        )
+        self.write_stats('purge', stats)
+        self.write_stats('tokens', get_token_stats())
+
+    def write_stats(self, label, stats):
+        """ One line of key=value metrics. """
+        self.stdout.write(f'{label}: ' + ' '.join(f'{name}={value}' for name, value in stats.items()))
@@ -2,6 +2,7 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers, validators
 
+from medium_backend.fieldsets import SparseFieldsetMixin
 from user_accounts.models import Profile
 
 
@@ -63,7 +64,7 @@ class ChangePasswordSerializer(serializers.Serializer):
     new_password = serializers.CharField(required=True)
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializes the data of a profile.
     """
@@ -76,3 +77,6 @@ class ProfileSerializer(serializers.ModelSerializer):
         model = Profile
         fields = ['user', 'full_name', 'cnic', 'contact_number', 'address', 'gender', 'country', 'profile_pic', 'bio']
         read_only_fields = ('user',)
+        sparse_columns = {
+            'user': ('user__id', 'user__username', 'user__email'),
+        }
@@ -2,22 +2,18 @@
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.urls import reverse
 from django_rest_passwordreset.signals import reset_password_token_created
 
 from user_accounts.models import Profile
+from user_accounts.tasks import send_password_reset
 
 
 @receiver(reset_password_token_created)
 def password_reset_token_created(sender, instance, reset_password_token, *args, **kwargs):
     """
-    Display Password reset token on console after creation
+    Queues the email of the password reset token, once the token is committed.
     """
-    reset_password_token = "{}?token={}".format(reverse('password_reset:reset-password-request'),
-                                                reset_password_token.key)
-    print("*"*65)
-    print("reset_password_token: {}".format(reset_password_token))
-    print("*"*65, '\n')
+    send_password_reset.enqueue_on_commit(token_id=reset_password_token.pk)
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -0,0 +1,35 @@
+''' Background jobs of the user accounts app '''
+import logging
+
+from django.core.mail import send_mail
+from django.urls import reverse
+from django_rest_passwordreset.models import ResetPasswordToken
+
+from jobs.queue import task
+from user_accounts import tokens
+from user_accounts.constant import PASSWORD_RESET_MESSAGE, PASSWORD_RESET_SUBJECT
+
+logger = logging.getLogger(__name__)
+
+
+@task
+def send_password_reset(token_id):
+    """
+    Emails the password reset token to its user, run by the job workers. The job only
+    holds the token id, tokens used or expired meanwhile are not sent.
+    """
+    token = ResetPasswordToken.objects.select_related('user').filter(pk=token_id).first()
+    if token is None:
+        logger.info('Password reset token %s is gone, not sent', token_id)
+        return
+    url = '{}?token={}'.format(reverse('forgot_password:reset-password-confirm'), token.key)
+    send_mail(PASSWORD_RESET_SUBJECT, PASSWORD_RESET_MESSAGE.format(username=token.user.username, url=url),
+              None, [token.user.email])
+
+
+@task
+def purge_expired_tokens(batch_size=1000):
+    """
+    Deletes the expired knox tokens in batches, see the purge_expired_tokens command
+    """
+    tokens.purge_expired_tokens(batch_size=batch_size)
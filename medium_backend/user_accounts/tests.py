@@ -1,3 +1,143 @@
-from django.test import TestCase
+""" Tests for the user_accounts api """
+from contextlib import redirect_stdout
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_rest_passwordreset.models import ResetPasswordToken
+from knox.models import AuthToken
+from rest_framework.test import APIClient
+
+from jobs.models import Job
+from jobs.queue import run_job
+from user_accounts.models import Profile
+
+
+@override_settings(KNOX_MAX_TOKENS_PER_USER=2)
+class TokenLifecycleTests(TestCase):
+    """ Logins keep a bounded number of tokens, expired ones are purged. """
+
+    def setUp(self):
+        """ A user able to log in. """
+        cache.clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+
+    def login(self):
+        """ Logs in through the api and returns the token. """
+        response = APIClient().post('/api/login/', {'username': 'reader', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['token']
+
+    def test_login_evicts_oldest_tokens(self):
+        """ Only the newest tokens stay valid. """
+        tokens = [self.login() for _ in range(3)]
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 2)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {tokens[0]}')
+        self.assertEqual(client.get(f'/api/users/{self.user.id}/').status_code, 401)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {tokens[-1]}')
+        self.assertEqual(client.get(f'/api/users/{self.user.id}/').status_code, 200)
+
+    def test_purge_expired_tokens(self):
+        """ The purge deletes the expired tokens only, in batches. """
+        for _ in range(5):
+            AuthToken.objects.create(self.user, expiry=timedelta(seconds=-1))
+        AuthToken.objects.create(self.user)
+        out = StringIO()
+        call_command('purge_expired_tokens', batch_size=2, stdout=out)
+        self.assertIn('purge: deleted=5 batches=3', out.getvalue())
+        self.assertEqual(AuthToken.objects.count(), 1)
+
+
+class ProfileFieldsetTests(TestCase):
+    """ ?fields= / ?exclude= trim the profiles and the columns read for them. """
+
+    def setUp(self):
+        """ A user with a filled in profile. """
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        Profile.objects.filter(user=self.user).update(full_name='Reader', address='Somewhere', bio='A long bio')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        """ Gets the url, returns the response data and the SQL of the profile query. """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        profile_queries = [query['sql'] for query in queries if 'FROM "user_accounts_profile"' in query['sql']]
+        self.assertEqual(len(profile_queries), 1)
+        return response.data, profile_queries[0]
+
+    def test_fields(self):
+        """ Only the requested fields are rendered, and only their columns are read. """
+        data, sql = self.get('/api/profile/reader/?fields=full_name,user')
+        self.assertEqual(data, {'full_name': 'Reader',
+                                'user': {'id': self.user.id, 'username': 'reader', 'email': 'reader@example.com'}})
+        self.assertIn('"user_accounts_profile"."full_name"', sql)
+        self.assertIn('"auth_user"."username"', sql)
+        for column in ('bio', 'address', 'cnic', 'profile_pic'):
+            self.assertNotIn(f'"user_accounts_profile"."{column}"', sql)
+        self.assertNotIn('"auth_user"."password"', sql)
+
+    def test_exclude(self):
+        """ Excluded fields are dropped from the list, their columns deferred. """
+        data, sql = self.get('/api/profile/?exclude=bio,address')
+        self.assertEqual(len(data), 1)
+        self.assertNotIn('bio', data[0])
+        self.assertEqual(data[0]['full_name'], 'Reader')
+        self.assertNotIn('"user_accounts_profile"."bio"', sql)
+        self.assertNotIn('"user_accounts_profile"."address"', sql)
+        self.assertIn('"user_accounts_profile"."cnic"', sql)
+
+    def test_unknown_fields_and_writes(self):
+        """ Unknown fields are refused, writes return every field. """
+        response = self.client.get('/api/profile/reader/?fields=full_name,salary')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'fields': 'Unknown fields: salary.'})
+        response = self.client.patch('/api/profile/reader/?fields=bio', {'bio': 'Shorter'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['bio'], response.data['address']), ('Shorter', 'Somewhere'))
+
+
+class PasswordResetTests(TestCase):
+    """ The reset token is emailed by a job which only holds its id. """
+
+    def setUp(self):
+        """ A user who forgot their password. """
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+
+    def test_token_is_emailed(self):
+        """ The token is in the email, not in the job nor on stdout, and resets the password. """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post('/api/forgot-password/', {'email': 'reader@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        token = ResetPasswordToken.objects.get(user=self.user)
+        job = Job.objects.get()
+        self.assertEqual(job.kwargs, {'token_id': token.pk})
+        output = StringIO()
+        with redirect_stdout(output):
+            run_job(job)
+        self.assertNotIn(token.key, output.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+        self.assertIn(f'?token={token.key}', mail.outbox[0].body)
+
+        response = APIClient().post('/api/forgot-password/confirm/', {'token': token.key, 'password': 'N3w-passw0rd!'})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('N3w-passw0rd!'))
+
+    def test_used_token_is_not_sent(self):
+        """ A token gone before the job runs is skipped. """
+        with self.captureOnCommitCallbacks(execute=True):
+            APIClient().post('/api/forgot-password/', {'email': 'reader@example.com'}, format='json')
+        ResetPasswordToken.objects.all().delete()
+        run_job(Job.objects.get())
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(Job.objects.exists())
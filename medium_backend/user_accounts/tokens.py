@@ -0,0 +1,70 @@
+''' Knox token lifecycle: capped tokens per user and purge of the expired ones '''
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from knox.models import AuthToken
+
+logger = logging.getLogger(__name__)
+
+
+def issue_token(user):
+    """
+    Creates a knox token for the user, then evicts their expired tokens and the
+    oldest ones beyond KNOX_MAX_TOKENS_PER_USER. Returns the token string.
+    """
+    with transaction.atomic():
+        token = AuthToken.objects.create(user)[1]
+        tokens = AuthToken.objects.filter(user=user)
+        evicted = list(tokens.order_by('-created').values_list('digest', flat=True)[settings.KNOX_MAX_TOKENS_PER_USER:])
+        tokens.filter(digest__in=evicted).delete()
+        tokens.filter(expiry__lt=timezone.now()).delete()
+    return token
+
+
+def get_token_stats():
+    """ Size of the token table: total and expired tokens, users holding them and the most per user. """
+    per_user = AuthToken.objects.order_by().values('user').annotate(tokens=Count('digest'))
+    users = per_user.aggregate(users=Count('user'), max_per_user=Max('tokens'))
+    return {
+        'total': AuthToken.objects.count(),
+        'expired': AuthToken.objects.filter(expiry__lt=timezone.now()).count(),
+        'users': users['users'],
+        'max_per_user': users['max_per_user'] or 0,
+    }
+
+
+def purge_expired_tokens(batch_size=1000, pause=0, on_batch=None):
+    """
+    Deletes the expired tokens in batches, each one in its own short transaction so
+    logins and token lookups are never blocked for long. Returns the purge stats.
+
+    No ORDER BY: the scan stops at the first ``batch_size`` expired rows, which are
+    the oldest ones at the start of the table.
+    """
+    start, deleted, batches = time.perf_counter(), 0, 0
+    now = timezone.now()
+    while True:
+        with transaction.atomic():
+            digests = list(AuthToken.objects.filter(expiry__lt=now).order_by()
+                           .values_list('digest', flat=True)[:batch_size])
+            if not digests:
+                break
+            deleted += AuthToken.objects.filter(digest__in=digests).delete()[0]
+        batches += 1
+        if on_batch is not None:
+            on_batch(deleted)
+        if pause:
+            time.sleep(pause)
+    elapsed = time.perf_counter() - start
+    stats = {
+        'deleted': deleted,
+        'batches': batches,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(deleted / elapsed, 1) if elapsed else 0,
+    }
+    logger.info('Purged expired knox tokens: %s', stats)
+    return stats
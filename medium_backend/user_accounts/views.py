@@ -1,15 +1,16 @@
 from django.contrib.auth.models import User
-from knox.models import AuthToken
 from rest_framework import generics, mixins, status, viewsets
 from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
+from medium_backend.fieldsets import SparseFieldsetViewMixin
 from user_accounts.models import Profile
 from user_accounts.permissions import IsNonAuthenticated, IsOwnerOrReadOnly
 from user_accounts.serializer import (ChangePasswordSerializer,
                                       ProfileSerializer, RegisterSerializer,
                                       UserSerializer)
+from user_accounts.tokens import issue_token
 from user_accounts.utils import (validate_cnic, validate_contact_number,
                                  validate_gender)
 
@@ -39,6 +40,7 @@ class LoginViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin):
     """
     serializer_class = AuthTokenSerializer
     permission_classes = (AllowAny, IsNonAuthenticated)
+    throttle_scopes = {'create': 'login'}
 
     def create(self, request):
         """
@@ -47,7 +49,7 @@ class LoginViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        token = AuthToken.objects.create(user)[1]
+        token = issue_token(user)
         return Response({
             'user': UserSerializer(user, context=self.get_serializer_context()).data,
             'token': token
@@ -92,7 +94,7 @@ class ChangePasswordViewSet(viewsets.GenericViewSet, mixins.UpdateModelMixin):
         return Response({'success': 'Password changed successfully.'}, status=status.HTTP_200_OK)
 
 
-class ProfileViewSet(viewsets.ModelViewSet):
+class ProfileViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed, created, updated or deleted.
     """
@@ -101,6 +103,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
     lookup_field = 'user__username'
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    sparse_required_columns = ('user',)
 
     def create(self, request, *args, **kwargs):
         """